@@ -46,5 +46,16 @@ def create_app():
     
     # 启动调度器
     scheduler.start()
+
+    # 按测试用例的保留策略定期清理过期结果
+    from .services.retention_service import RetentionService
+    scheduler.add_job(
+        func=RetentionService.run_gc,
+        args=[app],
+        trigger='interval',
+        seconds=nameconfig.RETENTION_GC_INTERVAL,
+        id='retention_gc',
+        replace_existing=True
+    )
     
     return app
\ No newline at end of file
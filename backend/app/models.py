@@ -12,6 +12,8 @@ class TestCase(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     enable_profiling = db.Column(db.Boolean, default=False)
     profiling_config = db.Column(db.JSON)
+    # 结果保留策略 {keep_last, keep_days, keep_baselines}，为空时使用 nameconfig 中的默认值
+    retention_policy = db.Column(db.JSON)
     results = db.relationship('TestResult', backref='test_case', lazy=True)
 
 class TestResult(db.Model):
@@ -27,6 +29,11 @@ class TestResult(db.Model):
     flamegraph_path = db.Column(db.Text)
     result_dir = db.Column(db.Text)
     has_profile = db.Column(db.Boolean, default=False)
+    # 被固定为该测试用例基线的结果
+    is_baseline = db.Column(db.Boolean, default=False)
+    # 与基线比较的结论：regression / improvement / no_change / insufficient / no_baseline
+    verdict = db.Column(db.String(20))
+    comparison = db.Column(db.JSON)
 
     def to_dict(self):
         return {
@@ -38,7 +45,9 @@ class TestResult(db.Model):
             'perf_data': self.perf_data,
             'benchmark_data': self.benchmark_data,
             'flamegraph_path': self.flamegraph_path,
-            'result_dir': self.result_dir
+            'result_dir': self.result_dir,
+            'is_baseline': self.is_baseline,
+            'verdict': self.verdict
         }
 
 class ScheduledTask(db.Model):
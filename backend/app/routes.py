@@ -1,39 +1,88 @@
-from flask import Blueprint, request, jsonify, make_response
+from flask import Blueprint, request, jsonify, make_response, Response, stream_with_context
 from .models import TestCase, TestResult, ScheduledTask
 from .services.perf_service import PerfService
 from . import db, scheduler
 from .services.report_service import ReportService
+from .services.metrics_service import MetricsService
+from .services.baseline_service import REFERENCE_COLUMNS, BaselineService
+from .services.retention_service import ACTIVE_STATUSES, RetentionService, container_path
+from utils import artifact_store, perf_record
+from utils.log_tail import read_log_delta
 from .utils.test_client import TestClient
 from datetime import datetime, timedelta
 from flask_cors import cross_origin
 import os
+import mimetypes
+from pathlib import Path
 from flask import current_app
 from . import sock
 import json
+import threading
 
 api_bp = Blueprint('api', __name__)
 
 test_client = TestClient()
 
 active_connections = set()
+# 结果 id -> 订阅了该结果实时数据的连接
+subscriptions = {}
+# agent 推送按 result_dir 标识，缓存 result_dir -> 结果 id
+live_result_ids = {}
+# WebSocket 处理线程和各请求线程都会修改以上集合，遍历时先在锁内复制
+connections_lock = threading.Lock()
 
 @sock.route('/ws/test-status')
 def test_status_socket(ws):
-    """WebSocket 连接处理"""
-    active_connections.add(ws)
+    """WebSocket 连接处理
+
+    客户端可发送 {"action": "subscribe"|"unsubscribe", "test_id": 结果id}
+    订阅运行中测试的日志增量和采样数据。
+    """
+    with connections_lock:
+        active_connections.add(ws)
+    watched = set()
     try:
         while True:
-            # 保持连接活跃
-            ws.receive()
+            message = ws.receive()
+            handle_socket_message(ws, message, watched)
     except Exception:
         pass
     finally:
-        active_connections.remove(ws)
+        with connections_lock:
+            active_connections.discard(ws)
+            for result_id in watched:
+                unsubscribe(result_id, ws)
+
+def handle_socket_message(ws, message, watched):
+    """处理客户端发来的订阅消息，无法解析的消息忽略"""
+    try:
+        data = json.loads(message)
+        result_id = int(data['test_id'])
+    except (TypeError, ValueError, KeyError):
+        return
+    with connections_lock:
+        if data.get('action') == 'subscribe':
+            subscriptions.setdefault(result_id, set()).add(ws)
+            watched.add(result_id)
+        elif data.get('action') == 'unsubscribe':
+            unsubscribe(result_id, ws)
+            watched.discard(result_id)
+
+def unsubscribe(result_id, ws):
+    """取消订阅，没有订阅者的结果从字典中移除；调用方持有 connections_lock"""
+    connections = subscriptions.get(result_id)
+    if connections is None:
+        return
+    connections.discard(ws)
+    if not connections:
+        del subscriptions[result_id]
 
 def notify_clients(data):
     """向所有连接的客户端发送更新"""
+    with connections_lock:
+        connections = list(active_connections)
     dead_connections = set()
-    for ws in active_connections:
+    for ws in connections:
         try:
             current_app.logger.info(f"Sending data to client: {data}")
             ws.send(json.dumps(data))
@@ -41,7 +90,64 @@ def notify_clients(data):
             dead_connections.add(ws)
     
     # 清理断开的连接
-    active_connections.difference_update(dead_connections)
+    with connections_lock:
+        active_connections.difference_update(dead_connections)
+
+def notify_subscribers(result_id, data):
+    """只向订阅了该结果的客户端发送实时数据"""
+    with connections_lock:
+        connections = list(subscriptions.get(result_id, ()))
+    if not connections:
+        return
+    message = json.dumps(data)
+    dead_connections = set()
+    for ws in connections:
+        try:
+            ws.send(message)
+        except Exception:
+            dead_connections.add(ws)
+    with connections_lock:
+        for ws in dead_connections:
+            unsubscribe(result_id, ws)
+
+def resolve_live_result(result_dir):
+    """根据 agent 上报的 result_dir 查找结果 id"""
+    with connections_lock:
+        result_id = live_result_ids.get(result_dir)
+    if result_id is None:
+        result = TestResult.query.filter_by(result_dir=result_dir).first()
+        if result is None:
+            return None
+        result_id = result.id
+        with connections_lock:
+            live_result_ids[result_dir] = result_id
+    return result_id
+
+def validate_profiling_config(config):
+    """保存前检查 perf record 配置，非法时返回错误信息"""
+    tools = (config or {}).get('tools') or []
+    if 'perf' not in ([tools] if isinstance(tools, str) else tools):
+        return None
+    try:
+        perf_record.resolve_profile(config)
+    except ValueError as e:
+        return str(e)
+    return None
+
+@api_bp.route('/perf-profiles', methods=['GET'])
+def get_perf_profiles():
+    """可选的 perf record 配置及各项的取值范围"""
+    return jsonify({
+        'code': 200,
+        'data': {
+            'profiles': perf_record.PROFILES,
+            'default': perf_record.DEFAULT_PROFILE,
+            'call_graphs': perf_record.CALL_GRAPHS,
+            'scopes': perf_record.SCOPES,
+            'events': perf_record.EVENTS
+        },
+        'message': '获取成功'
+    })
 
 @api_bp.route('/test-cases', methods=['GET','POST'])
 def create_test_case():
@@ -55,18 +161,23 @@ def create_test_case():
             'parameters': case.parameters,
             'created_at': case.created_at.isoformat() if case.created_at else None,
             'enable_profiling': case.enable_profiling,
-            'profiling_config': case.profiling_config
+            'profiling_config': case.profiling_config,
+            'retention_policy': case.retention_policy
         } for case in cases])
         
     elif request.method == 'POST':
         data = request.json
+        error = validate_profiling_config(data.get('profiling_config'))
+        if error:
+            return jsonify({'error': error, 'message': '性能分析配置错误'}), 400
         test_case = TestCase(
             name=data['name'],
             description=data.get('description'),
             command=data['command'],
             parameters=data.get('parameters', {}),
             enable_profiling=data.get('enable_profiling', False),
-            profiling_config=data.get('profiling_config', {})
+            profiling_config=data.get('profiling_config', {}),
+            retention_policy=data.get('retention_policy')
         )
         db.session.add(test_case)
         db.session.commit()
@@ -79,7 +190,8 @@ def create_test_case():
             'created_at': test_case.created_at.isoformat(),
             'message': '创建成功',
             'enable_profiling': test_case.enable_profiling,
-            'profiling_config': test_case.profiling_config
+            'profiling_config': test_case.profiling_config,
+            'retention_policy': test_case.retention_policy
         }), 201
 
 
@@ -96,12 +208,13 @@ def delete_test_case(id):
                 pass  # 如果任务不存在，忽略错误
             db.session.delete(task)
         
-        # 删除测试结果
-        TestResult.query.filter_by(test_case_id=id).delete()
+        # 删除测试结果，结果目录在后台删除
+        paths = RetentionService.delete_results(TestResult.query.filter_by(test_case_id=id).all())
         
         # 删除测试用例
         db.session.delete(test_case)
         db.session.commit()
+        RetentionService.remove_dirs(paths)
         
         return jsonify({
             'message': '删除成功',
@@ -118,6 +231,9 @@ def delete_test_case(id):
 def update_test_case(id):
     test_case = TestCase.query.get_or_404(id)
     data = request.json
+    error = validate_profiling_config(data.get('profiling_config'))
+    if error:
+        return jsonify({'error': error, 'message': '性能分析配置错误'}), 400
     
     try:
         test_case.name = data.get('name', test_case.name)
@@ -126,6 +242,7 @@ def update_test_case(id):
         test_case.parameters = data.get('parameters', test_case.parameters)
         test_case.enable_profiling = data.get('enable_profiling', test_case.enable_profiling)
         test_case.profiling_config = data.get('profiling_config', test_case.profiling_config)
+        test_case.retention_policy = data.get('retention_policy', test_case.retention_policy)
         
         db.session.commit()
         
@@ -137,7 +254,8 @@ def update_test_case(id):
             'parameters': test_case.parameters,
             'message': '更新成功',
             'enable_profiling': test_case.enable_profiling,
-            'profiling_config': test_case.profiling_config
+            'profiling_config': test_case.profiling_config,
+            'retention_policy': test_case.retention_policy
         })
     except Exception as e:
         db.session.rollback()
@@ -188,6 +306,8 @@ def get_test_results():
                 'start_time': result.start_time.isoformat() if result.start_time else None,
                 'end_time': result.end_time.isoformat() if result.end_time else None,
                 'status': result.status,
+                'verdict': result.verdict,
+                'is_baseline': bool(result.is_baseline),
                 'flamegraph_path': result.flamegraph_path
             } for result in results],
             'message': '获取成功'
@@ -209,27 +329,39 @@ def get_test_result_details(id):
         # 获取性能数据
         perf_data = {}
         
-        # 获取日志
+        # 获取日志（第一段），其余部分通过 /logs?offset= 增量获取
         logs = []
+        log_offset = 0
+        log_eof = True
         if result.result_dir:
-            container_path = result.result_dir.replace(
+            result_path = result.result_dir.replace(
                 '/root/flask-vue', 
                 '/usr/src/app'
             )
         
-            log_path = os.path.join(container_path, 'output.log')
-            if os.path.exists(log_path):
-                with open(log_path, 'r') as f:
-                    logs = f.read().splitlines()
+            log_path = os.path.join(result_path, 'output.log')
+            logs, log_offset, log_eof = read_log_delta(log_path, 0)
             
-            perf_path = os.path.join(container_path, 'performance.json')
-            if os.path.exists(perf_path):
-                with open(perf_path, 'r') as f:
-                    perf_data = json.load(f)
-        
-        current_app.logger.info(f"<<<<<<<<<<<perf_data: {perf_data}")
+            # 可选的时间范围（epoch 毫秒）与最大点数，长时间运行的测试只返回抽样后的序列
+            perf_data = MetricsService.load_series(
+                result_path,
+                start_ms=request.args.get('from', type=int),
+                end_ms=request.args.get('to', type=int),
+                max_points=request.args.get('max_points', 2000, type=int)
+            )
 
         
+        # CPU、内存取被测进程树在被测步骤区间内的统计值，宿主机整体使用率只作参考；
+        # 旧结果没有区间摘要，宿主机列退回整段序列的平均值
+        reference_values = {
+            column: BaselineService.reference_value(result.perf_data, column)
+            for column in REFERENCE_COLUMNS
+        }
+        if reference_values['host_cpu'] is None:
+            reference_values['host_cpu'] = calculate_average(perf_data.get('cpu_data', []))
+        if reference_values['host_memory'] is None:
+            reference_values['host_memory'] = calculate_average(perf_data.get('memory_data', []))
+
         # 构造返回数据
         response_data = {
             'code': 200,
@@ -239,22 +371,19 @@ def get_test_result_details(id):
 
                 'disk_io_data': perf_data.get('disk_io_data', []),
                 'network_io_data': perf_data.get('network_io_data', []),
-                'benchmark_data': [
-                    {
-                        'metric': 'CPU平均使用率',
-                        'current': calculate_average(perf_data.get('cpu_data', [])),
-                        'baseline': 50,
-                        'diff': calculate_diff(calculate_average(perf_data.get('cpu_data', [])), 50)
-                    },
-                    {
-                        'metric': '内存平均使用',
-                        'current': calculate_average(perf_data.get('memory_data', [])),
-                        'baseline': 500,
-                        'diff': calculate_diff(calculate_average(perf_data.get('memory_data', [])), 500)
-                    }
-
-                ],
+                'process_data': perf_data.get('process_data', []),
+                'sampler_data': perf_data.get('sampler_data', []),
+                'benchmark_data': BaselineService.benchmark_rows(result, reference_values),
+                'verdict': result.verdict,
+                'is_baseline': bool(result.is_baseline),
+                'steps': MetricsService.step_summaries(result.perf_data),
+                'placement': (result.perf_data or {}).get('placement'),
+                'counters': (result.perf_data or {}).get('counters'),
+                'counter_comparison': (result.comparison or {}).get('counters'),
+                'iteration_data': result.benchmark_data,
                 'logs': logs,  # 添加日志到详情中
+                'log_offset': log_offset,
+                'log_eof': log_eof,
                 'flamegraph_path': result.flamegraph_path
             },
             'message': '获取成功'
@@ -271,6 +400,7 @@ def get_test_result_details(id):
                 'memory_data': [],
                 'disk_io_data': [],
                 'network_io_data': [],
+                'process_data': [],
                 'benchmark_data': [],
                 'logs': [],
                 'flamegraph_path': None
@@ -290,7 +420,8 @@ def execute_test_case(id):
             test_id=id,
             command=test_case.command,
             enable_profiling=test_case.enable_profiling,
-            profiling_config=test_case.profiling_config
+            profiling_config=test_case.profiling_config,
+            parameters=test_case.parameters
         )
         
         if 'error' in response:
@@ -303,12 +434,14 @@ def execute_test_case(id):
         result = TestResult(
             test_case_id=id,
             start_time=datetime.now(),
-            status='running',
+            status=response.get('status', 'running'),
             result_dir=response['result_dir'],
             has_profile = test_case.enable_profiling
         )
         db.session.add(result)
         db.session.commit()
+        with connections_lock:
+            live_result_ids[result.result_dir] = result.id
         
         notify_clients({
                 'type': 'new_result',
@@ -334,8 +467,9 @@ def get_test_logs(id):
     try:
         result = TestResult.query.get_or_404(id)
         
-        # 从测试服务器获取日志
-        response = test_client.get_logs(result.test_case_id, result.result_dir)
+        # 从测试服务器获取日志，offset 为上次返回的字节偏移，只取增量
+        offset = request.args.get('offset', 0, type=int)
+        response = test_client.get_logs(result.test_case_id, result.result_dir, offset)
         
         # 如果测试已完成，更新状态
         if response.get('status') == 'completed':
@@ -347,8 +481,12 @@ def get_test_logs(id):
             'code': 200,
             'data': {
                 'logs': response.get('logs', []),
+                'offset': response.get('offset', offset),
+                'eof': response.get('eof', True),
                 'status': result.status,
-                'end_time': result.end_time.isoformat() if result.end_time else None
+                'end_time': result.end_time.isoformat() if result.end_time else None,
+                'verdict': result.verdict,
+                'comparison': result.comparison
             }
         })
     except Exception as e:
@@ -363,24 +501,14 @@ def delete_test_result(id):
     try:
         result = TestResult.query.get_or_404(id)
         
-        # 将宿主机路径转换为容器内路径
-        container_path = result.result_dir.replace(
-            '/root/flask-vue',
-            '/usr/src/app'
-        ) if result.result_dir else None
-        
-        # 删除结果目录（如果存在）
-        if container_path and os.path.exists(container_path):
-            import shutil
-            shutil.rmtree(container_path)
-        
         response = test_client.kill_test_processes(result.result_dir)
         if response['status'] == 'error':
             return jsonify({'message': response['message']}), 500
 
-        # 删除数据库记录
-        db.session.delete(result)
+        # 删除数据库记录，结果目录在后台删除
+        paths = RetentionService.delete_results([result])
         db.session.commit()
+        RetentionService.remove_dirs(paths)
         
         return jsonify({
             'code': 200,
@@ -393,6 +521,186 @@ def delete_test_result(id):
             'message': str(e)
         }), 500
 
+@api_bp.route('/test-results/bulk-delete', methods=['POST'])
+@cross_origin()
+def bulk_delete_test_results():
+    """批量删除结果，请求体为 {ids: [...]} 或 {test_case_id, before}（before 为 ISO 时间，删除之前开始的结果）"""
+    try:
+        data = request.json or {}
+        if data.get('ids'):
+            results = TestResult.query.filter(TestResult.id.in_(data['ids'])).all()
+        elif data.get('test_case_id') and data.get('before'):
+            results = TestResult.query.filter(
+                TestResult.test_case_id == data['test_case_id'],
+                TestResult.start_time < datetime.fromisoformat(data['before'])
+            ).all()
+        else:
+            return jsonify({'code': 400, 'message': '需要 ids 或 test_case_id 和 before'}), 400
+
+        deleted, failed = [], []
+        for result in results:
+            if result.status in ACTIVE_STATUSES:
+                response = test_client.kill_test_processes(result.result_dir)
+                if response['status'] == 'error':
+                    failed.append({'id': result.id, 'message': response['message']})
+                    continue
+            deleted.append(result)
+        ids = [result.id for result in deleted]
+        paths = RetentionService.delete_results(deleted)
+        db.session.commit()
+        RetentionService.remove_dirs(paths)
+
+        return jsonify({
+            'code': 200,
+            'message': f'已删除 {len(ids)} 条结果',
+            'deleted': ids,
+            'failed': failed
+        })
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'code': 500,
+            'message': str(e)
+        }), 500
+
+@api_bp.route('/test-results/gc', methods=['POST'])
+@cross_origin()
+def run_result_gc():
+    """立即按保留策略清理结果，可以用 test_case_id 限定测试用例"""
+    try:
+        test_case_id = (request.json or {}).get('test_case_id')
+        deleted = RetentionService.collect(test_case_id)
+        return jsonify({
+            'code': 200,
+            'message': f'已清理 {sum(deleted.values())} 条结果',
+            'deleted': deleted
+        })
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'code': 500,
+            'message': str(e)
+        }), 500
+
+@api_bp.route('/artifacts', methods=['GET'])
+@cross_origin()
+def get_artifact():
+    """读取结果目录中的文件，压缩保存的产物边解压边返回
+
+    path 为宿主机路径（profiling_results.json 中记录的路径），只允许访问 results 目录。
+    """
+    path = request.args.get('path', '')
+    results_root = str(Path("performance-tests/results").resolve())
+    real_path = os.path.realpath(container_path(path))
+    if os.path.commonpath([real_path, results_root]) != results_root:
+        return jsonify({'message': '路径不在结果目录中'}), 403
+    if not artifact_store.exists(real_path):
+        return jsonify({'message': '文件不存在'}), 404
+
+    mimetype = mimetypes.guess_type(real_path)[0] or 'text/plain'
+    if mimetype.startswith('text/') or mimetype == 'application/json':
+        mimetype += '; charset=utf-8'
+    return Response(
+        stream_with_context(artifact_store.iter_chunks(real_path)),
+        mimetype=mimetype,
+        headers={'Cache-Control': 'no-cache'}
+    )
+
+@api_bp.route('/test-cases/<int:id>/counters', methods=['GET'])
+@cross_origin()
+def get_counter_history(id):
+    """测试用例历次成功运行的 perf stat 计数器，按时间正序"""
+    try:
+        TestCase.query.get_or_404(id)
+        limit = request.args.get('limit', 50, type=int)
+        results = TestResult.query.filter(
+            TestResult.test_case_id == id,
+            TestResult.status == 'success'
+        ).order_by(TestResult.start_time.desc()).limit(limit).all()
+
+        history = []
+        for result in reversed(results):
+            counters = (result.perf_data or {}).get('counters')
+            if not counters:
+                continue
+            history.append({
+                'result_id': result.id,
+                'start_time': result.start_time.isoformat() if result.start_time else None,
+                'verdict': result.verdict,
+                'events': counters.get('events') or {},
+                'derived': counters.get('derived') or {}
+            })
+
+        return jsonify({
+            'code': 200,
+            'data': history,
+            'message': '获取成功'
+        })
+    except Exception as e:
+        return jsonify({
+            'code': 500,
+            'data': [],
+            'message': str(e)
+        }), 500
+
+@api_bp.route('/test-results/<int:id>/baseline', methods=['POST', 'DELETE'])
+@cross_origin()
+def pin_test_result_baseline(id):
+    """POST 把结果固定为测试用例的基线，DELETE 取消固定，恢复滚动基线"""
+    try:
+        result = TestResult.query.get_or_404(id)
+        if request.method == 'POST':
+            if result.status != 'success':
+                return jsonify({
+                    'code': 400,
+                    'message': '只能把成功的测试结果设为基线'
+                }), 400
+            BaselineService.pin(result)
+        else:
+            result.is_baseline = False
+        db.session.commit()
+
+        return jsonify({
+            'code': 200,
+            'data': {'id': result.id, 'is_baseline': result.is_baseline},
+            'message': '设置成功'
+        })
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'code': 500,
+            'message': str(e)
+        }), 500
+
+@api_bp.route('/test-results/stream', methods=['POST'])
+def stream_test_progress():
+    """接收 agent 推送的日志增量和采样数据，转发给订阅的客户端"""
+    data = request.get_json(silent=True) or {}
+    with connections_lock:
+        watched = set(subscriptions)
+    if not watched:
+        return jsonify({'code': 200})
+    for event in data.get('events', []):
+        result_id = resolve_live_result(event.get('result_dir'))
+        if result_id is None or result_id not in watched:
+            continue
+        if event.get('offset') is not None:
+            notify_subscribers(result_id, {
+                'type': 'live_logs',
+                'test_id': result_id,
+                'logs': event.get('logs', []),
+                'start_offset': event.get('start_offset'),
+                'offset': event['offset'],
+                'truncated': event.get('truncated', False)
+            })
+        if event.get('samples'):
+            notify_subscribers(result_id, {
+                'type': 'live_metrics',
+                'test_id': result_id,
+                'samples': event['samples']
+            })
+    return jsonify({'code': 200})
+
 @api_bp.route('/test-results/update-status', methods=['POST'])
 def update_test_status():
     try:
@@ -420,12 +728,12 @@ def update_test_status():
                 f"time_diff: {abs((r.start_time - start_timestamp).total_seconds())} seconds"
             )
         
-        # 查找对应时间戳的测试结果
+        # 查找对应时间戳的测试结果（排队中的测试开始运行时也会上报）
         result = TestResult.query.filter(
             TestResult.test_case_id == test_case_id,
             TestResult.start_time >= start_timestamp - timedelta(seconds=5),
             TestResult.start_time <= start_timestamp + timedelta(seconds=5),
-            TestResult.status == 'running'
+            TestResult.status.in_(['running', 'queued'])
         ).order_by(TestResult.start_time.desc()).first()
         
         if result:
@@ -440,19 +748,34 @@ def update_test_status():
             if perf_data:  # 新增：更新性能数据
                 result.perf_data = perf_data
                 current_app.logger.info(f"Updated performance data for test {result.id}")
-            
+            if data.get('benchmark_data'):
+                # 迭代模式下每次迭代的耗时、CPU 时间、峰值 RSS 及统计
+                result.benchmark_data = data['benchmark_data']
             db.session.commit()
+            if result.status == 'success':
+                # 与历史基线比较，结论随状态更新一起推送；比较失败不影响状态更新
+                try:
+                    BaselineService.evaluate(result)
+                    db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    current_app.logger.error(f"Baseline comparison failed for result {result.id}: {e}", exc_info=True)
             
             # 通知所有客户端状态更新，包含性能数据
             notify_data = {
                 'type': 'update_status',
                 'test_id': result.id,
                 'status': result.status,
-                'end_time': result.end_time.isoformat() if result.end_time else None
+                'end_time': result.end_time.isoformat() if result.end_time else None,
+                'verdict': result.verdict,
+                'comparison': result.comparison
             }
 
             
             notify_clients(notify_data)
+            if result.status not in ('running', 'queued'):
+                with connections_lock:
+                    live_result_ids.pop(result.result_dir, None)
             
             return jsonify({
                 'code': 200,
@@ -479,12 +802,6 @@ def calculate_average(data_list):
     values = [item.get('value', 0) for item in data_list]
     return sum(values) / len(values)
 
-# 辅助函数：计算差异百分比
-def calculate_diff(current, baseline):
-    if baseline == 0:
-        return 0
-    return ((current - baseline) / baseline) * 100
-
 @api_bp.route('/test-results/<int:result_id>/profile', methods=['GET'])
 def get_test_profile(result_id):
     """获取测试的性能分析数据"""
@@ -503,7 +820,8 @@ def get_test_profile(result_id):
         profile_data = {
             'result_dir': result_dir,
             'has_profile': result.has_profile,
-            'profile_results': {}
+            'profile_results': {},
+            'artifacts': {}
         }
         current_app.logger.info(f"==========profiling_dir: {result_dir}===========")
         
@@ -513,11 +831,141 @@ def get_test_profile(result_id):
             if os.path.exists(results_file):
                 with open(results_file, 'r') as f:
                     profile_data['profile_results'] = json.load(f)
+            # 火焰图等产物在 agent 后台生成，各产物的状态为 pending / ready / failed
+            artifacts_file = os.path.join(result_dir, 'artifacts.json')
+            if os.path.exists(artifacts_file):
+                with open(artifacts_file, 'r') as f:
+                    profile_data['artifacts'] = json.load(f)
         
         return jsonify(profile_data)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@api_bp.route('/test-results/<int:result_id>/diff-flamegraph', methods=['GET'])
+@cross_origin()
+def get_diff_flamegraph(result_id):
+    """与另一次结果（base）对比的差分火焰图，红色表示本次占比增加
+
+    step 为被测步骤序号，默认第一个被测步骤。
+    """
+    try:
+        result = TestResult.query.get_or_404(result_id)
+        base_id = request.args.get('base', type=int)
+        if base_id is None:
+            # 没有指定时与比较基线中最近的一次结果对比
+            base_ids = (result.comparison or {}).get('baseline_ids') or []
+            base_id = base_ids[0] if base_ids else None
+        if base_id is None:
+            return jsonify({'code': 400, 'message': '缺少对比的测试结果'}), 400
+        base = TestResult.query.get_or_404(base_id)
+        if not result.result_dir or not base.result_dir:
+            return jsonify({'code': 400, 'message': '测试结果没有结果目录'}), 400
+
+        step = request.args.get('step', 1, type=int)
+        response = test_client.diff_flamegraph(
+            base.result_dir,
+            result.result_dir,
+            f"command_{step}",
+            request.args.get('limit', 50, type=int)
+        )
+        if response.get('status') != 'success':
+            return jsonify({
+                'code': 500,
+                'message': response.get('error') or response.get('message')
+            }), 500
+
+        return jsonify({
+            'code': 200,
+            'data': {
+                'base_id': base.id,
+                'svg': response['svg'],
+                'before_samples': response['before_samples'],
+                'after_samples': response['after_samples'],
+                'frames': response['frames'],
+                'table': response['table']
+            },
+            'message': '获取成功'
+        })
+    except Exception as e:
+        return jsonify({'code': 500, 'message': str(e)}), 500
+
+@api_bp.route('/test-results/<int:result_id>/profile/annotate', methods=['GET'])
+@cross_origin()
+def get_profile_annotate(result_id):
+    """热点符号的 perf annotate，逐行给出样本百分比
+
+    symbol 为空时返回最热的符号；top 为热点符号数，all=1 时允许注解不在热点列表中的符号。
+    """
+    try:
+        result = TestResult.query.get_or_404(result_id)
+        if not result.result_dir or not result.has_profile:
+            return jsonify({'code': 400, 'message': '测试结果没有性能分析数据'}), 400
+
+        step = request.args.get('step', 1, type=int)
+        response = test_client.annotate_symbol(
+            result.result_dir,
+            f"command_{step}",
+            request.args.get('symbol') or None,
+            request.args.get('top', type=int),
+            request.args.get('all', 0, type=int) == 1
+        )
+        if response.get('status') != 'success':
+            return jsonify({
+                'code': 500,
+                'message': response.get('error') or response.get('message')
+            }), 500
+
+        return jsonify({
+            'code': 200,
+            'data': {
+                'symbols': response['symbols'],
+                'annotation': response['annotation']
+            },
+            'message': '获取成功'
+        })
+    except Exception as e:
+        return jsonify({'code': 500, 'message': str(e)}), 500
+
+@api_bp.route('/test-results/<int:result_id>/profile/live', methods=['GET'])
+@cross_origin()
+def get_profile_live(result_id):
+    """连续分析模式的火焰图，运行中也可以获取
+
+    start/end 为相对 perf 启动的秒数，都为空时返回当前累计的火焰图，否则为该时间范围内各窗口合并的火焰图。
+    """
+    try:
+        result = TestResult.query.get_or_404(result_id)
+        if not result.result_dir or not result.has_profile:
+            return jsonify({'code': 400, 'message': '测试结果没有性能分析数据'}), 400
+
+        step = request.args.get('step', 1, type=int)
+        response = test_client.live_flamegraph(
+            result.result_dir,
+            f"command_{step}",
+            request.args.get('start', type=float),
+            request.args.get('end', type=float)
+        )
+        if response.get('status') != 'success':
+            return jsonify({
+                'code': 500,
+                'message': response.get('error') or response.get('message')
+            }), 500
+
+        index = response['index'] or {}
+        return jsonify({
+            'code': 200,
+            'data': {
+                'svg': response['svg'],
+                'samples': response['samples'],
+                'selected': response['windows'],
+                'windows': index.get('windows', []),
+                'running': index.get('running', False)
+            },
+            'message': '获取成功'
+        })
+    except Exception as e:
+        return jsonify({'code': 500, 'message': str(e)}), 500
+
 @api_bp.route('/api/scheduled-tasks', methods=['GET'])
 def get_scheduled_tasks():
     tasks = ScheduledTask.query.all()
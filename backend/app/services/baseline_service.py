@@ -0,0 +1,265 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path("performance-tests").resolve()))
+import nameconfig
+from utils import stats
+from ..models import TestResult
+from .metrics_service import MetricsService
+
+# 参与回归判定的指标，均为越小越好
+METRICS = {
+    'wall_time': '耗时(s)',
+    'cpu_time': 'CPU时间(s)',
+    'max_rss': '峰值RSS(MB)'
+}
+# perf stat 计数器中用于解释差异的派生指标和原始事件，不参与判定
+COUNTER_DERIVED = ('ipc', 'branch_miss_rate', 'cache_miss_rate', 'llc_miss_rate')
+COUNTER_EVENTS = ('cycles', 'instructions', 'context-switches', 'page-faults')
+MB = 1024 * 1024
+# 只做展示、不参与判定的指标 {列名: (名称, 统计值, 换算单位)}
+# CPU、内存取被测进程树的采样；宿主机整体的使用率只作为参考
+REFERENCE_COLUMNS = {
+    'proc_cpu_percent': ('进程树CPU使用率(%)', 'mean', 1),
+    'proc_rss': ('进程树峰值RSS(MB)', 'max', MB),
+    'proc_pss': ('进程树峰值PSS(MB)', 'max', MB),
+    'host_cpu': ('宿主机CPU使用率(%，参考)', 'mean', 1),
+    'host_memory': ('宿主机内存使用率(%，参考)', 'mean', 1)
+}
+
+
+class BaselineService:
+    @staticmethod
+    def result_samples(result):
+        """取结果中第一个被测步骤的样本 {指标: [值, ...]}
+
+        迭代模式下每次迭代一个值，单次执行时只有一个值；没有可用数据时返回空字典。
+        非迭代的性能分析运行中被测步骤在 perf/valgrind 下执行，耗时不可比，不返回样本。
+        """
+        benchmark_data = result.benchmark_data or {}
+        for step in benchmark_data.get('steps', []):
+            if step.get('iterations'):
+                return {
+                    metric: [it[metric] for it in step['iterations']]
+                    for metric in METRICS
+                }
+        for step in (result.perf_data or {}).get('steps', []):
+            if step.get('kind') != 'measure' or step.get('status') != 'success':
+                continue
+            rusage = step.get('rusage')
+            if rusage:
+                return {metric: [rusage[metric]] for metric in METRICS}
+        return {}
+
+    @staticmethod
+    def baseline_results(result):
+        """返回 (基线结果列表, 来源)
+
+        测试用例有固定基线时使用该结果，否则取之前最近若干次成功运行作为滚动基线。
+        """
+        pinned = TestResult.query.filter(
+            TestResult.test_case_id == result.test_case_id,
+            TestResult.is_baseline.is_(True),
+            TestResult.id != result.id
+        ).first()
+        if pinned:
+            return [pinned], 'pinned'
+        previous = TestResult.query.filter(
+            TestResult.test_case_id == result.test_case_id,
+            TestResult.status == 'success',
+            TestResult.start_time < result.start_time
+        ).order_by(TestResult.start_time.desc()).limit(nameconfig.BASELINE_WINDOW).all()
+        return previous, 'rolling'
+
+    @staticmethod
+    def compare_metric(current, baseline, alpha, threshold_pct):
+        """比较单个指标的当前样本与基线样本
+
+        两边都有多个样本时使用 Mann-Whitney U 检验；只有一边是单次测量时，
+        看该值是否落在另一边的 t 预测区间之外。差异显著且中位数变化超过阈值才判定。
+        """
+        current_median = stats.median(current)
+        baseline_median = stats.median(baseline)
+        entry = {
+            'current': current_median,
+            'baseline': baseline_median,
+            'diff_pct': calculate_diff_pct(current_median, baseline_median),
+            'n_current': len(current),
+            'n_baseline': len(baseline),
+            'method': None,
+            'p_value': None,
+            'significant': False,
+            'verdict': 'insufficient'
+        }
+        if len(current) > 1 and len(baseline) > 1:
+            entry['method'] = 'mann_whitney_u'
+            _, entry['p_value'] = stats.mann_whitney_u(current, baseline)
+            entry['significant'] = entry['p_value'] < alpha
+        elif len(current) == 1 and len(baseline) > 1:
+            entry['method'] = 'prediction_interval'
+            low, high = stats.prediction_test(current[0], baseline, 1 - alpha)
+            entry['significant'] = not low <= current[0] <= high
+        elif len(baseline) == 1 and len(current) > 1:
+            entry['method'] = 'prediction_interval'
+            low, high = stats.prediction_test(baseline[0], current, 1 - alpha)
+            entry['significant'] = not low <= baseline[0] <= high
+        else:
+            return entry
+
+        diff_pct = entry['diff_pct']
+        if entry['significant'] and diff_pct is not None and abs(diff_pct) >= threshold_pct:
+            entry['verdict'] = 'regression' if diff_pct > 0 else 'improvement'
+        else:
+            entry['verdict'] = 'no_change'
+        return entry
+
+    @staticmethod
+    def compare(result):
+        """把结果与基线比较，返回比较详情（含总体结论 verdict）"""
+        alpha = nameconfig.REGRESSION_ALPHA
+        threshold_pct = nameconfig.REGRESSION_THRESHOLD_PCT
+        baselines, source = BaselineService.baseline_results(result)
+        comparison = {
+            'verdict': 'no_baseline',
+            'source': source,
+            'baseline_ids': [b.id for b in baselines],
+            'alpha': alpha,
+            'threshold_pct': threshold_pct,
+            'metrics': {},
+            'reference': {},
+            'counters': BaselineService.compare_counters(result, baselines)
+        }
+
+        current_samples = BaselineService.result_samples(result)
+        baseline_samples = {}
+        for baseline in baselines:
+            for metric, values in BaselineService.result_samples(baseline).items():
+                baseline_samples.setdefault(metric, []).extend(values)
+
+        for metric in METRICS:
+            current = current_samples.get(metric)
+            baseline = baseline_samples.get(metric)
+            if current and baseline:
+                comparison['metrics'][metric] = BaselineService.compare_metric(
+                    current, baseline, alpha, threshold_pct
+                )
+
+        for column in REFERENCE_COLUMNS:
+            values = [BaselineService.reference_value(b.perf_data, column) for b in baselines]
+            values = [v for v in values if v is not None]
+            comparison['reference'][column] = sum(values) / len(values) if values else None
+
+        verdicts = [entry['verdict'] for entry in comparison['metrics'].values()]
+        if 'regression' in verdicts:
+            comparison['verdict'] = 'regression'
+        elif 'improvement' in verdicts:
+            comparison['verdict'] = 'improvement'
+        elif 'no_change' in verdicts:
+            comparison['verdict'] = 'no_change'
+        elif baselines:
+            # 有基线但样本不足以判定（或本次/基线没有可比的样本）
+            comparison['verdict'] = 'insufficient'
+        return comparison
+
+    @staticmethod
+    def reference_value(perf_data, column):
+        """结果在被测步骤区间内的参考指标值，旧结果没有该摘要时返回 None"""
+        _, stat, _ = REFERENCE_COLUMNS[column]
+        return MetricsService.measured_stat(perf_data, column, stat)
+
+    @staticmethod
+    def counter_values(result):
+        """结果中的计数器 {名称: 值}，没有运行 perf stat 时返回空字典"""
+        counters = (result.perf_data or {}).get('counters') or {}
+        values = {}
+        for key in COUNTER_DERIVED:
+            values[key] = (counters.get('derived') or {}).get(key)
+        for key in COUNTER_EVENTS:
+            values[key] = (counters.get('events') or {}).get(key)
+        return {key: value for key, value in values.items() if value is not None}
+
+    @staticmethod
+    def compare_counters(result, baselines):
+        """当前计数器与基线运行均值的对比 {名称: {current, baseline, diff_pct}}"""
+        current = BaselineService.counter_values(result)
+        if not current:
+            return {}
+        history = [BaselineService.counter_values(b) for b in baselines]
+        compared = {}
+        for key, value in current.items():
+            values = [h[key] for h in history if key in h]
+            baseline = sum(values) / len(values) if values else None
+            compared[key] = {
+                'current': value,
+                'baseline': baseline,
+                'diff_pct': calculate_diff_pct(value, baseline)
+            }
+        return compared
+
+    @staticmethod
+    def evaluate(result):
+        """计算并保存结果的比较结论，调用方负责提交事务"""
+        comparison = BaselineService.compare(result)
+        result.comparison = comparison
+        result.verdict = comparison['verdict']
+        return comparison
+
+    @staticmethod
+    def pin(result):
+        """把结果设为所属测试用例的固定基线，同一用例之前的固定基线被取消"""
+        TestResult.query.filter(
+            TestResult.test_case_id == result.test_case_id,
+            TestResult.is_baseline.is_(True)
+        ).update({'is_baseline': False}, synchronize_session=False)
+        result.is_baseline = True
+
+    @staticmethod
+    def benchmark_rows(result, reference_values):
+        """详情页“基准线比较”表格的数据
+
+        reference_values 为当前结果的参考指标 {列名: 值}，见 REFERENCE_COLUMNS。
+        """
+        comparison = result.comparison
+        if comparison is None and result.status == 'success':
+            # 旧结果没有保存比较结论，按当前基线临时计算
+            comparison = BaselineService.compare(result)
+        comparison = comparison or {'metrics': {}, 'reference': {}}
+
+        rows = []
+        for metric, label in METRICS.items():
+            entry = comparison['metrics'].get(metric)
+            if not entry:
+                continue
+            scale = MB if metric == 'max_rss' else 1
+            rows.append({
+                'metric': label,
+                'current': round(entry['current'] / scale, 4),
+                'baseline': round(entry['baseline'] / scale, 4),
+                'diff': round_or_none(entry['diff_pct']),
+                'p_value': round_or_none(entry['p_value'], 4),
+                'verdict': entry['verdict']
+            })
+
+        for column, (label, _, scale) in REFERENCE_COLUMNS.items():
+            current = reference_values.get(column)
+            baseline = comparison['reference'].get(column)
+            if current is None and baseline is None:
+                continue
+            rows.append({
+                'metric': label,
+                'current': round_or_none(current / scale if current is not None else None, 4),
+                'baseline': round_or_none(baseline / scale if baseline is not None else None, 4),
+                'diff': round_or_none(calculate_diff_pct(current, baseline)),
+                'p_value': None,
+                'verdict': None
+            })
+        return rows
+
+
+def calculate_diff_pct(current, baseline):
+    if current is None or baseline is None or baseline == 0:
+        return None
+    return (current - baseline) / baseline * 100
+
+
+def round_or_none(value, digits=2):
+    return round(value, digits) if value is not None else None
@@ -0,0 +1,98 @@
+import json
+import math
+import os
+import sys
+from pathlib import Path
+sys.path.append(str(Path("performance-tests").resolve()))
+from utils.metrics_store import MetricsReader, has_metrics, metrics_dir
+
+PROCESS_FIELDS = [
+    'cpu_percent', 'cpu_user', 'cpu_system', 'minor_faults', 'major_faults',
+    'read_bytes', 'write_bytes', 'rss', 'pss', 'num_threads', 'num_fds', 'num_procs'
+]
+
+
+class MetricsService:
+    @staticmethod
+    def load_series(result_dir, start_ms=None, end_ms=None, max_points=2000):
+        """读取结果目录中的性能序列，返回前端图表使用的格式
+
+        新结果从 metrics 目录按时间范围切片并等间隔抽样；
+        旧结果仍读取 performance.json。
+        """
+        if not has_metrics(result_dir):
+            perf_path = os.path.join(result_dir, 'performance.json')
+            if os.path.exists(perf_path):
+                with open(perf_path, 'r') as f:
+                    return json.load(f)
+            return {}
+
+        with MetricsReader(metrics_dir(result_dir)) as reader:
+            start = reader.index_at(start_ms) if start_ms is not None else 0
+            stop = reader.index_at(end_ms) if end_ms is not None else len(reader)
+            step = max(math.ceil((stop - start) / max_points), 1) if max_points else 1
+
+            timestamps = reader.timestamps(start, stop, step)
+
+            def column(name):
+                return reader.column(name, start, stop, step)
+
+            def values(name):
+                return [{'timestamp': t, 'value': v} for t, v in zip(timestamps, column(name))]
+
+            def pairs(first, second, first_key, second_key):
+                return [
+                    {'timestamp': t, first_key: a, second_key: b}
+                    for t, a, b in zip(timestamps, column(first), column(second))
+                ]
+
+            process_columns = {field: column(f"proc_{field}") for field in PROCESS_FIELDS}
+            return {
+                'cpu_data': values('host_cpu'),
+                'memory_data': values('host_memory'),
+                'disk_io_data': pairs('disk_read_bytes', 'disk_write_bytes', 'read_bytes', 'write_bytes'),
+                'network_io_data': pairs('net_bytes_sent', 'net_bytes_recv', 'bytes_sent', 'bytes_recv'),
+                'process_data': [
+                    {'timestamp': t, **{field: process_columns[field][i] for field in PROCESS_FIELDS}}
+                    for i, t in enumerate(timestamps)
+                ],
+                'sampler_data': [
+                    {'timestamp': t, 'drift': d, 'overhead': o, 'missed': m}
+                    for t, d, o, m in zip(timestamps, column('drift'), column('overhead'), column('missed'))
+                ],
+                'total_samples': len(reader),
+                'step': step
+            }
+
+    @staticmethod
+    def measured_mean(perf_data, column):
+        """被测步骤区间内某列的均值，旧结果没有该摘要时返回 None"""
+        return MetricsService.measured_stat(perf_data, column, 'mean')
+
+    @staticmethod
+    def measured_stat(perf_data, column, stat):
+        """被测步骤区间内某列的统计值（mean / min / max / last），没有该摘要时返回 None"""
+        summary = ((perf_data or {}).get('columns') or {}).get(column)
+        return summary.get(stat) if summary else None
+
+    @staticmethod
+    def step_summaries(perf_data):
+        """测试步骤列表，附带每个步骤区间内被测进程的 CPU 均值和 RSS 峰值"""
+        steps = []
+        for step in (perf_data or {}).get('steps', []):
+            columns = (step.get('metrics') or {}).get('columns') or {}
+            cpu = columns.get('proc_cpu_percent')
+            rss = columns.get('proc_rss')
+            steps.append({
+                'index': step['index'],
+                'kind': step['kind'],
+                'command': step['command'],
+                'status': step.get('status'),
+                'duration': step.get('duration'),
+                'start_ms': step.get('start_ms'),
+                'end_ms': step.get('end_ms'),
+                'samples': (step.get('metrics') or {}).get('samples', 0),
+                'cpu_percent': cpu['mean'] if cpu else None,
+                'max_rss': rss['max'] if rss else None
+            })
+        return steps
@@ -86,22 +86,111 @@ class ReportService:
             story.append(memory_img)
             story.append(Spacer(1, 12))
 
-        # 基准线比较
-        if test_result.benchmark_data:
-            story.append(Paragraph("基准线比较", styles['Heading2']))
+        # 迭代统计
+        iteration_stats = (test_result.benchmark_data or {}).get('stats')
+        if iteration_stats:
+            story.append(Paragraph("迭代统计", styles['Heading2']))
             story.append(Spacer(1, 12))
-            
-            benchmark_data = [['指标', '当前值', '基准值', '差异']]
-            for metric, data in test_result.benchmark_data.items():
-                benchmark_data.append([
-                    metric,
-                    f"{data['current']:.2f}",
-                    f"{data['baseline']:.2f}",
-                    f"{data['diff']:.2f}%"
+
+            labels = {'wall_time': '耗时(s)', 'cpu_time': 'CPU时间(s)', 'max_rss': '峰值RSS(MB)'}
+            scales = {'wall_time': 1, 'cpu_time': 1, 'max_rss': 1024 * 1024}
+            stats_data = [['指标', '次数', '均值', '中位数', '标准差', '最小值', '置信区间']]
+            for metric, label in labels.items():
+                stat = iteration_stats.get(metric)
+                if not stat:
+                    continue
+                scale = scales[metric]
+                ci = '-'
+                if stat.get('ci_low') is not None:
+                    ci = f"[{stat['ci_low'] / scale:.4f}, {stat['ci_high'] / scale:.4f}]"
+                stats_data.append([
+                    label,
+                    stat['n'],
+                    f"{stat['mean'] / scale:.4f}",
+                    f"{stat['median'] / scale:.4f}",
+                    f"{stat['stddev'] / scale:.4f}",
+                    f"{stat['min'] / scale:.4f}",
+                    ci
                 ])
-            
-            benchmark_table = Table(benchmark_data, colWidths=[2*inch, 1.5*inch, 1.5*inch, 1*inch])
-            benchmark_table.setStyle(TableStyle([
+
+            stats_table = Table(stats_data)
+            stats_table.setStyle(TableStyle([
+                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+                ('FONTSIZE', (0, 0), (-1, 0), 12),
+                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+                ('GRID', (0, 0), (-1, -1), 1, colors.black)
+            ]))
+            story.append(stats_table)
+
+        # 基线比较
+        comparison = test_result.comparison
+        if comparison and comparison.get('metrics'):
+            story.append(Spacer(1, 20))
+            story.append(Paragraph("基线比较", styles['Heading2']))
+            story.append(Spacer(1, 12))
+            source = '固定基线' if comparison['source'] == 'pinned' else '滚动基线'
+            baseline_ids = ', '.join(str(i) for i in comparison['baseline_ids'])
+            story.append(Paragraph(
+                f"结论: {comparison['verdict']}（{source}，结果 {baseline_ids}，"
+                f"显著性水平 {comparison['alpha']}，阈值 {comparison['threshold_pct']}%）",
+                styles['Normal']
+            ))
+            story.append(Spacer(1, 12))
+
+            labels = {'wall_time': '耗时(s)', 'cpu_time': 'CPU时间(s)', 'max_rss': '峰值RSS(MB)'}
+            comparison_data = [['指标', '当前中位数', '基线中位数', '差异', 'p值', '结论']]
+            for metric, entry in comparison['metrics'].items():
+                scale = 1024 * 1024 if metric == 'max_rss' else 1
+                diff = f"{entry['diff_pct']:.2f}%" if entry['diff_pct'] is not None else '-'
+                p_value = f"{entry['p_value']:.4f}" if entry['p_value'] is not None else '-'
+                comparison_data.append([
+                    labels.get(metric, metric),
+                    f"{entry['current'] / scale:.4f}",
+                    f"{entry['baseline'] / scale:.4f}",
+                    diff,
+                    p_value,
+                    entry['verdict']
+                ])
+
+            comparison_table = Table(comparison_data)
+            comparison_table.setStyle(TableStyle([
+                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+                ('FONTSIZE', (0, 0), (-1, 0), 12),
+                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+                ('GRID', (0, 0), (-1, -1), 1, colors.black)
+            ]))
+            story.append(comparison_table)
+
+        # 硬件计数器
+        counters = (test_result.perf_data or {}).get('counters')
+        if counters:
+            story.append(Spacer(1, 20))
+            story.append(Paragraph("硬件计数器 (perf stat)", styles['Heading2']))
+            story.append(Spacer(1, 12))
+            counter_baselines = (test_result.comparison or {}).get('counters') or {}
+            counter_data = [['计数器', '当前值', '基线值', '差异']]
+            rows = list((counters.get('derived') or {}).items()) + list((counters.get('events') or {}).items())
+            for name, value in rows:
+                if value is None:
+                    continue
+                entry = counter_baselines.get(name) or {}
+                baseline = entry.get('baseline')
+                diff = entry.get('diff_pct')
+                counter_data.append([
+                    name,
+                    f"{value:,.4g}" if value < 1000 else f"{value:,.0f}",
+                    '-' if baseline is None else (f"{baseline:,.4g}" if baseline < 1000 else f"{baseline:,.0f}"),
+                    '-' if diff is None else f"{diff:.2f}%"
+                ])
+
+            counter_table = Table(counter_data)
+            counter_table.setStyle(TableStyle([
                 ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
                 ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
                 ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
@@ -110,7 +199,7 @@ class ReportService:
                 ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
                 ('GRID', (0, 0), (-1, -1), 1, colors.black)
             ]))
-            story.append(benchmark_table)
+            story.append(counter_table)
 
         # 生成PDF
         doc.build(story)
@@ -0,0 +1,139 @@
+import logging
+import os
+import shutil
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import sys
+from pathlib import Path
+sys.path.append(str(Path("performance-tests").resolve()))
+import nameconfig
+from .. import db
+from ..models import TestCase, TestResult
+
+logger = logging.getLogger(__name__)
+
+# 还在运行的结果不会被自动清理
+ACTIVE_STATUSES = ('pending', 'queued', 'running')
+TRASH_DIR = '.trash'
+
+# 结果目录在后台线程中删除，删除请求不必等待大目录的 rmtree
+_remover = ThreadPoolExecutor(max_workers=1, thread_name_prefix='result-gc')
+
+
+def container_path(result_dir):
+    """宿主机结果路径转换为容器内路径"""
+    return result_dir.replace('/root/flask-vue', '/usr/src/app') if result_dir else None
+
+
+class RetentionService:
+    @staticmethod
+    def policy(test_case):
+        """测试用例的保留策略，未设置的项使用 nameconfig 中的默认值"""
+        policy = {
+            'keep_last': nameconfig.RETENTION_KEEP_LAST,
+            'keep_days': nameconfig.RETENTION_KEEP_DAYS,
+            'keep_baselines': nameconfig.RETENTION_KEEP_BASELINES
+        }
+        for key, value in (test_case.retention_policy or {}).items():
+            if key in policy and value is not None:
+                policy[key] = value
+        return policy
+
+    @staticmethod
+    def expired_results(test_case, now=None):
+        """按保留策略应清理的结果
+
+        满足任一条件的结果保留：最近 keep_last 次、keep_days 天内、固定基线（keep_baselines）。
+        keep_last 和 keep_days 都为 0 时不清理。
+        """
+        policy = RetentionService.policy(test_case)
+        keep_last = int(policy['keep_last'] or 0)
+        keep_days = float(policy['keep_days'] or 0)
+        if not keep_last and not keep_days:
+            return []
+        cutoff = (now or datetime.now()) - timedelta(days=keep_days) if keep_days else None
+
+        results = TestResult.query.filter(
+            TestResult.test_case_id == test_case.id
+        ).order_by(TestResult.start_time.desc()).all()
+        expired = []
+        for index, result in enumerate(results):
+            if result.status in ACTIVE_STATUSES:
+                continue
+            if keep_last and index < keep_last:
+                continue
+            if cutoff is not None and result.start_time >= cutoff:
+                continue
+            if policy['keep_baselines'] and result.is_baseline:
+                continue
+            expired.append(result)
+        return expired
+
+    @staticmethod
+    def delete_results(results):
+        """删除结果记录，返回待删除的结果目录，调用方提交事务后再调用 remove_dirs"""
+        paths = []
+        for result in results:
+            path = container_path(result.result_dir)
+            if path:
+                paths.append(path)
+            db.session.delete(result)
+        return paths
+
+    @staticmethod
+    def remove_dirs(paths):
+        """删除结果目录
+
+        目录先改名移入同级的 .trash 目录（同一文件系统上是原子操作，前端立即看不到），
+        再由后台线程 rmtree。
+        """
+        for path in paths:
+            if not os.path.isdir(path):
+                continue
+            trash = os.path.join(os.path.dirname(os.path.normpath(path)), TRASH_DIR)
+            os.makedirs(trash, exist_ok=True)
+            target = os.path.join(trash, f"{os.path.basename(os.path.normpath(path))}-{uuid.uuid4().hex[:8]}")
+            try:
+                os.rename(path, target)
+            except OSError:
+                target = path
+            _remover.submit(shutil.rmtree, target, True)
+
+    @staticmethod
+    def empty_trash(results_root):
+        """清理上次进程退出前没删完的目录"""
+        trash = os.path.join(results_root, TRASH_DIR)
+        if os.path.isdir(trash):
+            for name in os.listdir(trash):
+                _remover.submit(shutil.rmtree, os.path.join(trash, name), True)
+
+    @staticmethod
+    def collect(test_case_id=None):
+        """按保留策略清理一个或全部测试用例的结果，返回 {测试用例ID: 删除数}"""
+        query = TestCase.query
+        if test_case_id is not None:
+            query = query.filter(TestCase.id == test_case_id)
+        deleted = {}
+        paths = []
+        for test_case in query.all():
+            expired = RetentionService.expired_results(test_case)
+            if expired:
+                paths.extend(RetentionService.delete_results(expired))
+                deleted[test_case.id] = len(expired)
+        db.session.commit()
+        RetentionService.remove_dirs(paths)
+        return deleted
+
+    @staticmethod
+    def run_gc(app):
+        """后台定时任务入口"""
+        with app.app_context():
+            try:
+                deleted = RetentionService.collect()
+                RetentionService.empty_trash(str(Path("performance-tests/results").resolve()))
+                if deleted:
+                    logger.info(f"Retention GC deleted results: {deleted}")
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Retention GC failed: {e}")
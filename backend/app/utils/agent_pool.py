@@ -0,0 +1,132 @@
+import itertools
+import logging
+import socket
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+import sys
+from pathlib import Path
+sys.path.append(str(Path("performance-tests").resolve()))
+from utils import framing
+
+logger = logging.getLogger(__name__)
+
+_request_ids = itertools.count(1)
+
+
+class ConnectError(Exception):
+    """请求未送达测试服务器，可以安全重试"""
+
+
+class ResponseError(Exception):
+    """请求已送达但没有拿到响应，不能盲目重试"""
+
+
+class AgentConnection:
+    """一条长连接，多个请求通过 id 复用同一个 socket"""
+
+    def __init__(self, host, port, connect_timeout):
+        try:
+            self.sock = socket.create_connection((host, port), timeout=connect_timeout)
+        except OSError as e:
+            raise ConnectError(f"connect to {host}:{port} failed: {e}") from e
+        self.sock.settimeout(None)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.send_lock = threading.Lock()
+        self.pending = {}
+        self.pending_lock = threading.Lock()
+        self.closed = False
+        self.reader = threading.Thread(
+            target=self._read_loop,
+            name=f"agent-conn-{host}:{port}",
+            daemon=True
+        )
+        self.reader.start()
+
+    def request(self, payload, timeout):
+        request_id = next(_request_ids)
+        future = Future()
+        with self.pending_lock:
+            if self.closed:
+                raise ConnectError("connection already closed")
+            self.pending[request_id] = future
+
+        try:
+            with self.send_lock:
+                framing.send_message(self.sock, {**payload, 'id': request_id})
+        except OSError as e:
+            # 帧没有完整发出，服务端不会执行该请求
+            self._fail(e)
+            raise ConnectError(f"send failed: {e}") from e
+
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError as e:
+            raise ResponseError(f"no response after {timeout} seconds") from e
+        except ConnectionError as e:
+            raise ResponseError(str(e)) from e
+        finally:
+            with self.pending_lock:
+                self.pending.pop(request_id, None)
+
+    def _read_loop(self):
+        error = None
+        try:
+            while True:
+                message = framing.recv_message(self.sock)
+                if message is None:
+                    break
+                with self.pending_lock:
+                    future = self.pending.pop(message.get('id'), None)
+                if future is not None:
+                    future.set_result(message.get('response'))
+        except Exception as e:
+            error = e
+        self._fail(error)
+
+    def _fail(self, error):
+        with self.pending_lock:
+            if self.closed:
+                return
+            self.closed = True
+            pending, self.pending = self.pending, {}
+        for future in pending.values():
+            future.set_exception(ConnectionError(f"connection lost: {error or 'closed by peer'}"))
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+    def close(self):
+        self._fail(None)
+
+
+class AgentConnectionPool:
+    """固定数量的长连接，按轮询分配请求，断开的连接在下次使用时重建"""
+
+    def __init__(self, host, port, size=2, connect_timeout=5):
+        self.host = host
+        self.port = port
+        self.connect_timeout = connect_timeout
+        self.slots = [None] * size
+        self.slot_locks = [threading.Lock() for _ in range(size)]
+        self._next_slot = itertools.count()
+
+    def _acquire(self):
+        index = next(self._next_slot) % len(self.slots)
+        with self.slot_locks[index]:
+            conn = self.slots[index]
+            if conn is None or conn.closed:
+                logger.debug(f"Opening agent connection #{index} to {self.host}:{self.port}")
+                conn = AgentConnection(self.host, self.port, self.connect_timeout)
+                self.slots[index] = conn
+            return conn
+
+    def request(self, payload, timeout):
+        return self._acquire().request(payload, timeout)
+
+    def close(self):
+        for index, lock in enumerate(self.slot_locks):
+            with lock:
+                if self.slots[index] is not None:
+                    self.slots[index].close()
+                    self.slots[index] = None
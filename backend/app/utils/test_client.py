@@ -1,6 +1,5 @@
-import socket
-import json
 import logging
+import threading
 import time
 from datetime import datetime  
 import requests
@@ -10,6 +9,7 @@ import sys
 from pathlib import Path
 sys.path.append(str(Path("performance-tests").resolve()))
 import nameconfig
+from .agent_pool import AgentConnectionPool, ConnectError, ResponseError
 
 # 配置日志
 logging.basicConfig(
@@ -19,36 +19,57 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 class TestClient:
-    def __init__(self, host='172.17.0.1', port=9999, timeout=5, max_retries=3):
+    def __init__(self, host='172.17.0.1', port=9999, timeout=5, max_retries=3,
+                 pool_size=2, health_interval=10):
         self.host = host #主机在docker容器中的ip地址，ifconfig docker0查看
         self.port = port
         self.timeout = timeout
         self.max_retries = max_retries
+        self.health_interval = health_interval
         self.api_url = f'http://{nameconfig.FLASK_APP_IP}:5000'  # 根据实际情况修改,docker inspect flask_app 查看下ip
         logger.info(f"TestClient initialized with host={host}, port={port}")
+
+        # 与测试服务器之间的长连接池
+        self.pool = AgentConnectionPool(host, port, size=pool_size, connect_timeout=timeout)
+        # 缓存的健康状态，由请求结果和后台探测共同更新
+        self.health_lock = threading.Lock()
+        self.health = {
+            'healthy': None,
+            'checked_at': None,
+            'error': None
+        }
         
         # 添加调度器
         self.scheduler = BackgroundScheduler()
         self.scheduler.start()
+        self.scheduler.add_job(
+            func=self.probe_health,
+            trigger='interval',
+            seconds=health_interval,
+            id='agent_health_probe',
+            replace_existing=True
+        )
     
-    def execute_test(self, test_id, command, enable_profiling, profiling_config):
-        """执行测试用例"""
+    def execute_test(self, test_id, command, enable_profiling, profiling_config, parameters=None):
+        """执行测试用例，parameters 中可以设置预热和迭代次数"""
         logger.debug(f"Executing test {test_id} with command: {command}")
         return self._send_request({
             'action': 'execute_test',
             'test_id': test_id,
             'command': command,
             'enable_profiling': enable_profiling,
-            'profiling_config': profiling_config
+            'profiling_config': profiling_config,
+            'parameters': parameters or {}
         })
     
-    def get_logs(self, test_id, result_dir):
-        """获取测试日志"""
-        logger.debug(f"Getting logs for test {test_id}")
+    def get_logs(self, test_id, result_dir, offset=0):
+        """获取测试日志，从字节偏移 offset 开始增量读取"""
+        logger.debug(f"Getting logs for test {test_id} from offset {offset}")
         return self._send_request({
             'action': 'get_logs',
             'test_id': test_id,
-            'result_dir': result_dir
+            'result_dir': result_dir,
+            'offset': offset
         })
     
     def kill_test_processes(self, result_dir):
@@ -58,27 +79,68 @@ class TestClient:
             'result_dir': result_dir
         })
     
+    def diff_flamegraph(self, before_dir, after_dir, profile_key='command_1', limit=50):
+        """请求测试服务器生成两次结果的差分火焰图，大文件需要更长的超时"""
+        logger.debug(f"Diff flame graph {before_dir} -> {after_dir} ({profile_key})")
+        return self._send_request({
+            'action': 'diff_flamegraph',
+            'before_dir': before_dir,
+            'after_dir': after_dir,
+            'profile_key': profile_key,
+            'limit': limit
+        }, timeout=60)
+    
+    def annotate_symbol(self, result_dir, profile_key='command_1', symbol=None, top=None, allow_any=False):
+        """请求测试服务器生成热点符号的 perf annotate，未缓存时需要运行 perf，超时更长"""
+        logger.debug(f"Annotate {symbol or 'hottest symbol'} in {result_dir} ({profile_key})")
+        return self._send_request({
+            'action': 'annotate_symbol',
+            'result_dir': result_dir,
+            'profile_key': profile_key,
+            'symbol': symbol,
+            'top': top,
+            'allow_any': allow_any
+        }, timeout=120)
+    
+    def live_flamegraph(self, result_dir, profile_key='command_1', start=None, end=None):
+        """请求测试服务器渲染连续分析模式的火焰图，start/end 为空时为当前累计结果"""
+        logger.debug(f"Live flame graph {result_dir} ({profile_key}) {start}-{end}")
+        return self._send_request({
+            'action': 'live_flamegraph',
+            'result_dir': result_dir,
+            'profile_key': profile_key,
+            'start': start,
+            'end': end
+        }, timeout=60)
+    
     def check_connection(self):
-        """检查与测试服务器的连接"""
-        logger.debug(f"Checking connection to {self.host}:{self.port}")
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.settimeout(self.timeout)
+        """返回缓存的测试服务器连接状态，状态过期时才重新探测"""
+        with self.health_lock:
+            health = dict(self.health)
+        if health['checked_at'] is None or time.monotonic() - health['checked_at'] > self.health_interval:
+            return self.probe_health()
+        return health['healthy']
+
+    def probe_health(self):
+        """通过长连接发送 ping 更新健康状态"""
         try:
-            sock.connect((self.host, self.port))
-            logger.info("Connection successful")
-            return True
-        except socket.timeout:
-            logger.error(f"Connection timeout after {self.timeout} seconds")
-            return False
-        except ConnectionRefusedError:
-            logger.error(f"Connection refused to {self.host}:{self.port}")
-            return False
+            response = self.pool.request({'action': 'ping'}, self.timeout)
+            healthy = bool(response) and response.get('status') == 'ok'
+            self._mark_health(healthy, None if healthy else f"unexpected ping response: {response}")
         except Exception as e:
-            logger.error(f"Connection check failed: {str(e)}")
-            return False
-        finally:
-            sock.close()
-            
+            self._mark_health(False, str(e))
+        return self.health['healthy']
+
+    def _mark_health(self, healthy, error=None):
+        with self.health_lock:
+            if healthy != self.health['healthy']:
+                logger.info(f"Test agent {self.host}:{self.port} healthy={healthy} {error or ''}")
+            self.health = {
+                'healthy': healthy,
+                'checked_at': time.monotonic(),
+                'error': error
+            }
+
     def handle_message(self, message):
         """处理接收到的消息"""
         try:
@@ -273,62 +335,47 @@ class TestClient:
                 'message': str(e)
             }
             
-    def _send_request(self, request_data):
-        """发送请求到测试服务器，支持重试"""
-        retry_count = 0
-        last_error = None
+    def _send_request(self, request_data, timeout=None):
+        """通过连接池发送请求，未送达时立即换连接重试，不在请求线程中等待"""
+        with self.health_lock:
+            health = dict(self.health)
+        if (health['healthy'] is False and
+                time.monotonic() - health['checked_at'] < self.health_interval):
+            # 最近一次探测失败，直接返回错误，等待后台探测恢复
+            return {
+                'status': 'error',
+                'error': f"Test agent {self.host}:{self.port} unavailable: {health['error']}"
+            }
 
-        while retry_count < self.max_retries:
+        last_error = None
+        attempts = 0
+        while attempts < self.max_retries:
+            attempts += 1
             try:
-                with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
-                    sock.settimeout(self.timeout)
-
-                    logger.debug(f"Attempt {retry_count + 1}/{self.max_retries} "
-                                f"to connect to {self.host}:{self.port}")
-
-                    # 尝试连接
-                    sock.connect((self.host, self.port))
-                    logger.debug("Connection established")
-
-                    # 发送请求
-                    request_str = json.dumps(request_data)
-                    logger.debug(f"Sending request: {request_str}")
-                    sock.send(request_str.encode())
-
-                    # 接收响应
-                    response = self._receive_response(sock)
-                    logger.debug(f"Received response: {response}")
-
-                    return json.loads(response)
-
-            except (socket.timeout, ConnectionRefusedError, json.JSONDecodeError) as e:
+                logger.debug(f"Sending request (attempt {attempts}/{self.max_retries}): {request_data}")
+                response = self.pool.request(request_data, timeout or self.timeout)
+                logger.debug(f"Received response: {response}")
+                self._mark_health(True)
+                return response
+            except ConnectError as e:
                 last_error = str(e)
                 self.log_error(last_error)
+            except ResponseError as e:
+                # 请求已经送达（如耗时的 annotate 超时），连接和 agent 本身正常，不改变健康状态；
+                # execute_test 等操作不是幂等的，不能重发
+                self.log_error(f"Request failed: {e}")
+                return {'status': 'error', 'error': str(e)}
             except Exception as e:
-                last_error = str(e)
-                self.log_error(f"Unexpected error: {last_error}", exc_info=True)
-
-            retry_count += 1
-            if retry_count < self.max_retries:
-                wait_time = retry_count * 2  # 指数退避
-                logger.info(f"Waiting {wait_time} seconds before retry...")
-                time.sleep(wait_time)
+                self.log_error(f"Unexpected error: {e}", exc_info=True)
+                return {'status': 'error', 'error': str(e)}
 
+        # 所有尝试都没有连上 agent
+        self._mark_health(False, last_error)
         return {
             'status': 'error',
-            'error': f"Failed after {self.max_retries} attempts. Last error: {last_error}"
+            'error': f"Failed after {attempts} attempts. Last error: {last_error}"
         }
 
-    def _receive_response(self, sock):
-        """接收完整的响应数据"""
-        chunks = []
-        while True:
-            chunk = sock.recv(4096)
-            if not chunk:
-                break
-            chunks.append(chunk)
-        return b''.join(chunks).decode()
-
     def log_error(self, error_msg, exc_info=False):
         """日志记录"""
         logger.error(error_msg, exc_info=exc_info)
@@ -0,0 +1,30 @@
+"""add baseline and verdict to test results
+
+Revision ID: 8c1d4e2f9a7b
+Revises: 5ef0a009832d
+Create Date: 2026-10-18 10:12:40.512203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c1d4e2f9a7b'
+down_revision = '5ef0a009832d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('test_results', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('is_baseline', sa.Boolean(), nullable=True))
+        batch_op.add_column(sa.Column('verdict', sa.String(length=20), nullable=True))
+        batch_op.add_column(sa.Column('comparison', sa.JSON(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('test_results', schema=None) as batch_op:
+        batch_op.drop_column('comparison')
+        batch_op.drop_column('verdict')
+        batch_op.drop_column('is_baseline')
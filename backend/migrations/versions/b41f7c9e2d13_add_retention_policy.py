@@ -0,0 +1,26 @@
+"""add retention policy to test cases
+
+Revision ID: b41f7c9e2d13
+Revises: 8c1d4e2f9a7b
+Create Date: 2026-10-18 15:40:21.803114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b41f7c9e2d13'
+down_revision = '8c1d4e2f9a7b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('test_cases', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('retention_policy', sa.JSON(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('test_cases', schema=None) as batch_op:
+        batch_op.drop_column('retention_policy')
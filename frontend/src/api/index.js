@@ -84,8 +84,17 @@ export default {
             memory_data: response.data.data?.memory_data || [],
             disk_io_data: response.data.data?.disk_io_data || [],
             network_io_data: response.data.data?.network_io_data || [],
+            process_data: response.data.data?.process_data || [],
             benchmark_data: response.data.data?.benchmark_data || [],
+            steps: response.data.data?.steps || [],
+            placement: response.data.data?.placement || null,
+            iteration_data: response.data.data?.iteration_data || null,
+            verdict: response.data.data?.verdict || null,
+            counters: response.data.data?.counters || null,
+            counter_comparison: response.data.data?.counter_comparison || null,
             logs: response.data.data?.logs || [],
+            log_offset: response.data.data?.log_offset || 0,
+            log_eof: response.data.data?.log_eof ?? true,
             flamegraph_path: response.data.data?.flamegraph_path,
             message: response.data.message
           }
@@ -133,13 +142,17 @@ export default {
         }
       })
   },
-  // 获取测试日志
-  getTestLogs(id) {
-    return api.get(`/test-results/${id}/logs`)
+  // 获取测试日志，offset 为上次返回的字节偏移，只返回新增的行
+  getTestLogs(id, offset = 0) {
+    return api.get(`/test-results/${id}/logs`, {
+      params: { offset }
+    })
       .then(response => {
         return {
           data: {
             logs: response.data.data?.logs || [],
+            offset: response.data.data?.offset ?? offset,
+            eof: response.data.data?.eof ?? true,
             status: response.data.data?.status,
             end_time: response.data.data?.end_time,
             message: response.data.message
@@ -159,6 +172,58 @@ export default {
         }
       })
   },
+  // 批量删除测试结果，params 为 { ids } 或 { test_case_id, before }
+  bulkDeleteTestResults(params) {
+    return api.post('/test-results/bulk-delete', params)
+  },
+  // 立即按保留策略清理结果
+  runResultGc(testCaseId) {
+    return api.post('/test-results/gc', { test_case_id: testCaseId })
+  },
+  // 结果目录中文件的地址，压缩保存的产物由后端解压后返回
+  artifactUrl(path) {
+    return `${process.env.VUE_APP_API_BASE_URL}/artifacts?path=${encodeURIComponent(path)}`
+  },
+  // 读取结果目录中的 JSON 产物
+  getArtifactJson(path) {
+    return api.get('/artifacts', { params: { path } }).then(response => response.data)
+  },
+  // 与另一次结果对比的差分火焰图，baseId 为空时使用比较基线
+  getDiffFlamegraph(id, baseId, step = 1) {
+    return api.get(`/test-results/${id}/diff-flamegraph`, {
+      params: { base: baseId || undefined, step },
+      timeout: 60000
+    })
+  },
+  // 可选的 perf record 配置
+  getPerfProfiles() {
+    return api.get('/perf-profiles')
+  },
+  // 热点符号的 perf annotate，symbol 为空时返回最热的符号
+  getProfileAnnotate(id, symbol, step = 1) {
+    return api.get(`/test-results/${id}/profile/annotate`, {
+      params: { symbol: symbol || undefined, step },
+      timeout: 120000
+    })
+  },
+  // 连续分析模式的火焰图，start/end 为空时为当前累计结果
+  getLiveFlamegraph(id, start, end, step = 1) {
+    return api.get(`/test-results/${id}/profile/live`, {
+      params: { start: start ?? undefined, end: end ?? undefined, step },
+      timeout: 60000
+    })
+  },
+  // 获取测试用例历次运行的硬件计数器
+  getCounterHistory(testCaseId, limit = 50) {
+    return api.get(`/test-cases/${testCaseId}/counters`, { params: { limit } })
+      .then(response => response.data.data || [])
+  },
+  // 固定或取消测试结果作为基线
+  setBaseline(id, pinned) {
+    return pinned
+      ? api.post(`/test-results/${id}/baseline`)
+      : api.delete(`/test-results/${id}/baseline`)
+  },
   // 获取性能分析数据
   getTestProfile(resultId) {
     return api.get(`/test-results/${resultId}/profile`)
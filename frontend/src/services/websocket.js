@@ -3,6 +3,7 @@ class WebSocketService {
         this.ws = null
         this.callbacks = new Set()
         this.pendingMessages = []  // 添加消息队列
+        this.watchedResults = new Set()  // 订阅了实时日志和采样数据的结果 id
     }
 
     connect() {
@@ -16,11 +17,11 @@ class WebSocketService {
 
         this.ws.onopen = () => {
             console.log('WebSocket connected successfully')
+            // 重连后恢复之前的订阅
+            this.watchedResults.forEach(id => this.send({ action: 'subscribe', test_id: id }))
         }
 
         this.ws.onmessage = (event) => {
-            console.log('Received message:', event.data)
-            console.log('callbacks:', this.callbacks)
             const data = JSON.parse(event.data)
             if (this.callbacks.size === 0) {
                 // 如果没有回调注册，将消息存入队列
@@ -63,6 +64,27 @@ class WebSocketService {
     unsubscribe(callback) {
         this.callbacks.delete(callback)
     }
+
+    send(data) {
+        if (this.ws && this.ws.readyState === WebSocket.OPEN) {
+            this.ws.send(JSON.stringify(data))
+        }
+    }
+
+    // 订阅运行中测试的实时日志和采样数据
+    watchResult(id) {
+        this.watchedResults.add(id)
+        this.send({ action: 'subscribe', test_id: id })
+    }
+
+    unwatchResult(id) {
+        this.watchedResults.delete(id)
+        this.send({ action: 'unsubscribe', test_id: id })
+    }
+
+    isConnected() {
+        return !!this.ws && this.ws.readyState === WebSocket.OPEN
+    }
 }
 
 export default new WebSocketService() 
\ No newline at end of file
@@ -1,4 +1,24 @@
 FLASK_APP_IP = '172.19.0.4'  #容器内的flask所分配的地址
 DB_CONTAINER_NAME = 'cpp_postgres_db' #docker compose里定义的名字
 CORS_ORIGIN_IP = '172.16.2.2' #允许的前端地址
-CORS_ORIGIN_PORT = '8081' #允许的前端端口
\ No newline at end of file
+CORS_ORIGIN_PORT = '8081' #允许的前端端口
+SAMPLE_PERIOD = 0.05 #性能采样周期(秒)，所有测试共用一个采样线程，最小 0.01
+LOG_FLUSH_INTERVAL = 0.2 #测试输出批量写入 output.log 的间隔(秒)
+LOG_RATE_LIMIT = 1024 * 1024 #每秒写入 output.log 的字节上限，超出部分写入 output.overflow.log.gz
+LOG_MAX_BYTES = 64 * 1024 * 1024 #单次测试 output.log 的大小上限
+LOG_MAX_LINE_BYTES = 4096 #单行超过该长度时在 output.log 中截断
+LIVE_PUSH_INTERVAL = 0.5 #运行中日志和采样数据推送给 backend 的间隔(秒)
+MAX_CONCURRENT_RUNS = 2 #同时运行的测试数上限，超出的测试排队等待
+CPU_PINNING = True #为每个运行中的测试绑定互不重叠的 CPU 核心
+CPU_CORES_PER_RUN = 0 #每个测试分配的物理核心数，0 表示按 MAX_CONCURRENT_RUNS 平分
+CPU_RESERVED = [0] #留给 agent 和采样线程的 CPU，不分配给测试
+BASELINE_WINDOW = 5 #滚动基线使用的最近成功运行次数
+REGRESSION_ALPHA = 0.05 #回归检测的显著性水平
+REGRESSION_THRESHOLD_PCT = 5 #中位数变化小于该百分比时不判定为回归或改进
+POSTPROCESS_WORKERS = 2 #火焰图、perf report 等性能分析产物的后台生成进程数
+SYMCACHE_DIR = 'symcache' #符号表缓存目录（相对 agent 的 base_dir），以 ELF build-id 为键跨运行复用
+ANNOTATE_TOP_SYMBOLS = 10 #perf annotate 默认只对自身开销最高的这些符号按需生成
+RETENTION_KEEP_LAST = 0 #未设置保留策略的测试用例默认保留最近的结果数，0 表示不按次数清理
+RETENTION_KEEP_DAYS = 0 #未设置保留策略的测试用例默认保留的天数，0 表示不按时间清理
+RETENTION_KEEP_BASELINES = True #清理时是否保留固定基线
+RETENTION_GC_INTERVAL = 3600 #后台按保留策略清理结果的间隔(秒)
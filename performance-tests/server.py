@@ -1,7 +1,9 @@
+import asyncio
 import socket
 import json
 import subprocess
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import threading
 import signal
@@ -10,23 +12,49 @@ import logging
 from logging.handlers import RotatingFileHandler
 import psutil
 import time
-import xml.etree.ElementTree as ET
 
 import nameconfig
-from utils import heap_svg
+from utils import (annotate, artifact_store, callgrind, flamegraph, framing, live_profile, massif, perf_record,
+                   perf_stat, pipeline, postprocess, stats)
+from utils.capture import OutputCapture
+from utils.cpu_alloc import CpuAllocator
+from utils.live_push import LivePublisher
+from utils.log_tail import DEFAULT_MAX_BYTES, read_log_delta
+from utils.metrics_store import metrics_dir
+from utils.run_context import RunContext
+from utils.sampler import Sampler
 
 
 class TestServer:
     def __init__(self):
         self.base_dir = '/root/flask-vue/performance-tests'
         self.log_dir = os.path.join(self.base_dir, 'logs')
+        # 按 build-id 缓存的符号表，同一构建的多次运行共用
+        self.symcache_dir = os.path.join(self.base_dir, nameconfig.SYMCACHE_DIR)
         os.makedirs(self.log_dir, exist_ok=True)
         self.setup_logging()
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         self.sock.bind(('0.0.0.0', 9999))
-        self.sock.listen(1)
+        self.sock.listen(128)
+        self.sock.setblocking(False)
         print("Test server started on 0.0.0.0:9999")
+        # 控制类请求与查询类请求分开线程池，大量日志轮询不会占满测试下发的线程；
+        # 差分火焰图等耗时的分析请求单独排队
+        self.executors = {
+            'control': ThreadPoolExecutor(max_workers=4, thread_name_prefix='control'),
+            'query': ThreadPoolExecutor(max_workers=16, thread_name_prefix='query'),
+            'analysis': ThreadPoolExecutor(max_workers=2, thread_name_prefix='analysis')
+        }
+        self.action_lanes = {
+            'execute_test': 'control',
+            'kill_test_processes': 'control',
+            'get_logs': 'query',
+            'ping': 'query',
+            'diff_flamegraph': 'analysis',
+            'annotate_symbol': 'analysis',
+            'live_flamegraph': 'analysis'
+        }
         # 存储每个测试的日志队列和状态
         self.test_logs = {}
         self.test_status = {}
@@ -35,15 +63,25 @@ class TestServer:
         # 禁用代理设置
         os.environ['NO_PROXY'] = '*'
         os.environ['no_proxy'] = '*'
-        self.perf_data = {}  # 新增：存储性能数据
-        # 新增性能分析相关配置
-        self.profiling_enabled = False  # 是否启用性能分析
-        self.profiling_tools = {
-            'perf': True,      # CPU性能分析
-            'valgrind': True,  # 内存分析
-            'callgrind': True  # 调用图分析
-        }
         self.process_pool = {} 
+        # result_dir -> RunContext，性能分析开关和 CPU 绑定按运行区分
+        self.runs = {}
+        # 同时运行的测试数上限，超出的测试在各自线程中排队
+        self.run_slots = threading.BoundedSemaphore(nameconfig.MAX_CONCURRENT_RUNS)
+        self.cpu_allocator = CpuAllocator(
+            nameconfig.CPU_CORES_PER_RUN,
+            nameconfig.MAX_CONCURRENT_RUNS,
+            nameconfig.CPU_RESERVED
+        ) if nameconfig.CPU_PINNING else None
+        # 性能分析产物在有界的进程池中生成，工作进程使用预留 CPU
+        self.postprocessor = postprocess.PostProcessor(
+            nameconfig.POSTPROCESS_WORKERS,
+            nameconfig.CPU_RESERVED
+        )
+        # 所有测试共用一个采样线程
+        self.sampler = Sampler(period=nameconfig.SAMPLE_PERIOD)
+        # 运行中的日志增量和采样数据批量推送给 backend，再经 WebSocket 转发给前端
+        self.publisher = LivePublisher(self.api_url, interval=nameconfig.LIVE_PUSH_INTERVAL)
         
     def setup_logging(self):
         """配置日志记录器"""
@@ -73,7 +111,7 @@ class TestServer:
         self.logger.addHandler(console_handler)
         self.logger.addHandler(file_handler)
     
-    def update_test_status(self, test_case_id, start_timestamp, status, end_time=None, perf_data=None):
+    def update_test_status(self, test_case_id, start_timestamp, status, end_time=None, perf_data=None, benchmark_data=None):
         """通过 HTTP 更新测试状态"""
         try:
             data = {
@@ -86,6 +124,8 @@ class TestServer:
             # 添加性能数据
             if perf_data:
                 data['perf_data'] = perf_data
+            if benchmark_data:
+                data['benchmark_data'] = benchmark_data
             
             self.logger.info(f"Updating status for test case {test_case_id}")
             
@@ -104,12 +144,8 @@ class TestServer:
         except Exception as e:
             self.logger.error(f"Error calling API: {e}", exc_info=True)
             
-    def execute_test(self, test_id, command, enable_profiling=False, profiling_config=None):
+    def execute_test(self, test_id, command, enable_profiling=False, profiling_config=None, parameters=None):
         """扩展执行测试函数，添加性能分析支持"""
-        self.profiling_enabled = enable_profiling
-        self.profiling_tools['perf'] = 'perf' == profiling_config['tools']
-        self.profiling_tools['valgrind'] = 'valgrind' == profiling_config['tools']
-        self.profiling_tools['callgrind'] = 'callgrind' == profiling_config['tools']
         timestamp = datetime.now()
         self.logger.info(f"Starting test execution for test case: {test_id} at {timestamp}")
         
@@ -121,349 +157,397 @@ class TestServer:
         profile_dir = os.path.join(result_dir, 'profile')
         os.makedirs(profile_dir, exist_ok=True)
 
-        self.test_status[test_id] = 'running'
+        ctx = RunContext(test_id, command, timestamp, result_dir, enable_profiling, profiling_config, parameters)
+        plan = ctx.iteration_plan
+        self.runs[result_dir] = ctx
+        # 有空闲名额时直接占用，否则测试线程排队等待
+        if self.run_slots.acquire(blocking=False):
+            ctx.status = 'running'
+        self.test_status[result_dir] = ctx.status
+
+        # stdout/stderr 与框架消息统一由后台线程批量写入 output.log
+        capture = OutputCapture(
+            result_dir,
+            flush_interval=nameconfig.LOG_FLUSH_INTERVAL,
+            rate_limit=nameconfig.LOG_RATE_LIMIT,
+            max_log_bytes=nameconfig.LOG_MAX_BYTES,
+            max_line_bytes=nameconfig.LOG_MAX_LINE_BYTES,
+            on_flush=lambda lines, start, end: self.publisher.publish_logs(result_dir, lines, start, end)
+        )
 
         def log_message(msg):
             """保持原有的日志记录功能"""
-            with open(f"{result_dir}/output.log", 'a') as f:
-                f.write(f"{msg}\n")
+            capture.write_line(msg)
 
         def cmd_run(cmd, result_dir):
-            # 保持原有的命令执行逻辑
+            """执行命令并等待结束，返回耗时、CPU 时间和峰值 RSS（包含子进程）"""
+            started = time.monotonic()
             process = subprocess.Popen(
-                cmd,
+                ctx.wrap_command(cmd),
                 shell=True,
                 stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
                 cwd=result_dir,
-                bufsize=1,
-                universal_newlines=True,
-                preexec_fn=os.setsid
+                bufsize=0,
+                preexec_fn=ctx.preexec
             )
             #加入进程池
             if result_dir not in self.process_pool:
                 self.process_pool[result_dir] = []
 
-            print(f"===========append_process_pool==============:{result_dir}==========={process.pid}")
             self.process_pool[result_dir].append(process)
-            # 保持原有的输出处理逻辑
-            while True:
-                stdout_line = process.stdout.readline()
-                print(stdout_line)
-                
-                if not stdout_line and process.poll() is not None:
-                    break
-                    
-                if stdout_line:
-                    log_message(f"[STDOUT] {stdout_line.strip()}")
+            # 输出由后台线程读取，这里只等待管道关闭和进程退出
+            for reader in capture.attach(process):
+                reader.join()
+            # wait4 直接拿到进程及其已回收子进程的资源使用
+            _, wait_status, usage = os.wait4(process.pid, 0)
+            # 已回收的 pid 可能被系统复用，立即移出，采样和终止都不再使用它
+            processes = self.process_pool.get(result_dir)
+            if processes and process in processes:
+                processes.remove(process)
+            wall_time = time.monotonic() - started
+            process.returncode = os.waitstatus_to_exitcode(wait_status)
             
             if process.returncode != 0:
                 raise Exception(f"Command failed with exit code {process.returncode}")
+            return {
+                'wall_time': wall_time,
+                'cpu_user': usage.ru_utime,
+                'cpu_system': usage.ru_stime,
+                'cpu_time': usage.ru_utime + usage.ru_stime,
+                'max_rss': usage.ru_maxrss * 1024
+            }
 
 
-        def xml_to_text(xml_file, text_file):
-            """将 valgrind XML 转换为可读的文本格式"""
-            try:
-                # 读取并清理文件中的无效内容
-                with open(xml_file, 'r', encoding='utf-8') as f:
-                    content = f.read()
-
-                # 清理文件中的多余内容或尾部错误内容
-                content = content.strip()
-
-                # 重新写入清理后的内容到临时文件
-                with open(xml_file, 'w', encoding='utf-8') as f:
-                    f.write(content)
-
-                # 解析清理后的文件
-                tree = ET.parse(xml_file)
-                root = tree.getroot()
-
-                with open(text_file, 'w') as f:
-                    # 写入头部信息
-                    for line in root.findall('.//preamble/line'):
-                        if line.text:
-                            f.write(f"{line.text}\n")
-                    f.write("\n")
-
-                    # 写入命令信息
-                    cmd = root.find('.//args/argv/exe')
-                    args = root.findall('.//args/argv/arg')
-                    if cmd is not None and cmd.text:
-                        cmd_str = cmd.text
-                        for arg in args:
-                            if arg.text:
-                                cmd_str += f" {arg.text}"
-                        f.write(f"Command: {cmd_str}\n\n")
-
-                    # 写入运行状态
-                    final_status = root.findall('.//status')[-1]
-                    if final_status is not None:
-                        state = final_status.find('state')
-                        time = final_status.find('time')
-                        if state is not None and time is not None:
-                            f.write(f"Status: {state.text} in {time.text}\n\n")
-
-                    # 写入错误信息
-                    for error in root.findall('.//error'):
-                        # 获取错误类型和描述
-                        kind = error.find('kind')
-                        xwhat = error.find('xwhat/text')
-
-                        if kind is not None and kind.text:
-                            f.write(f"\n==ERROR== {kind.text}\n")
-                        if xwhat is not None and xwhat.text:
-                            f.write(f"==ERROR== {xwhat.text}\n")
-
-                        # 写入调用栈
-                        stack = error.find('stack')
-                        if stack is not None:
-                            f.write("==ERROR== Stack trace:\n")
-                            for frame in stack.findall('frame'):
-                                fn = frame.find('fn')
-                                file = frame.find('file')
-                                line = frame.find('line')
-
-                                if fn is not None and fn.text:
-                                    frame_info = f"==ERROR==    at {fn.text}"
-                                    if file is not None and file.text:
-                                        frame_info += f" ({file.text}"
-                                        if line is not None and line.text:
-                                            frame_info += f":{line.text}"
-                                        frame_info += ")"
-                                    f.write(f"{frame_info}\n")
-
-                        f.write("\n")
-
-                    # 如果没有错误信息
-                    if not root.findall('.//error'):
-                        f.write("No memory leaks or errors detected.\n")
-
-                return True
-            except ET.ParseError as e:
-                # 捕获 XML 解析错误并返回 False
-                print(f"Error parsing XML file {xml_file}: {e}")
-                return False
-            except Exception as e:
-                # 捕获其他错误
-                print(f"Unexpected error: {e}")
-                return False
+        def postprocess_submit(step_dir, artifact, path, fn, *args):
+            """提交后台任务，清单中的名称为 "step_N/产物" """
+            name = f"{os.path.basename(step_dir)}/{artifact}"
+            return self.postprocessor.submit(profile_dir, name, path, fn, *args)
 
-
-   
-        def generate_memory_svg(xml_file, svg_file):
-            """将 valgrind XML 输出转换为内存泄漏可视化图"""
-            import xml.etree.ElementTree as ET
-            import graphviz
-            
-            try:
-                tree = ET.parse(xml_file)
-                root = tree.getroot()
-                
-                # 检查是否有错误信息
-                errors = root.findall('.//error')
-                if not errors:
-                    print("No memory leaks detected, skipping SVG generation")
-                    return False
-                    
-                # 创建有向图
-                dot = graphviz.Digraph(comment='Memory Leak Analysis')
-                dot.attr(rankdir='TB')  # 从上到下的布局
-                
-                has_valid_error = False  # 跟踪是否有有效的错误信息
-                
-                # 遍历所有错误
-                for error in errors:
-                    kind = error.find('kind')
-                    xwhat = error.find('xwhat/text')
-                    
-                    if kind is not None and xwhat is not None and kind.text and xwhat.text:
-                        has_valid_error = True
-                        # 创建错误节点
-                        error_id = f"error_{error.find('unique').text}"
-                        error_label = f"{kind.text}\n{xwhat.text}"
-                        dot.node(error_id, error_label, 
-                                shape='box', 
-                                style='filled', 
-                                fillcolor='red',
-                                fontcolor='white')
-                        
-                        # 处理调用栈
-                        stack = error.find('stack')
-                        if stack is not None:
-                            prev_node = error_id
-                            for i, frame in enumerate(stack.findall('frame')):
-                                fn = frame.find('fn')
-                                file = frame.find('file')
-                                line = frame.find('line')
-                                
-                                if fn is not None and fn.text:
-                                    frame_id = f"{error_id}_frame_{i}"
-                                    
-                                    # 构建帧标签
-                                    frame_label = fn.text
-                                    if file is not None and file.text:
-                                        frame_label += f"\n{file.text}"
-                                        if line is not None and line.text:
-                                            frame_label += f":{line.text}"
-                                    
-                                    # 添加帧节点
-                                    dot.node(frame_id, frame_label, 
-                                        shape='box',
-                                        style='filled',
-                                        fillcolor='lightblue')
-                                    
-                                    # 连接节点
-                                    dot.edge(prev_node, frame_id)
-                                    prev_node = frame_id
-                
-                # 只在有有效错误信息时生成 SVG
-                if has_valid_error:
-                    dot.render(svg_file, format='svg', cleanup=True)
-                    return True
-                else:
-                    print("No valid memory leak information found, skipping SVG generation")
-                    return False
-                
-            except Exception as e:
-                print(f"Error generating memory SVG: {e}")
-                return False
-
-        def run_profiling(cmd):
-            """执行性能分析"""
+        def run_profiling(cmd, step_dir, key):
+            """执行性能分析，输出写入该步骤的目录"""
+            os.makedirs(step_dir, exist_ok=True)
             profiling_results = {}
             
             if enable_profiling:
                 try:
+                    # 0. perf stat 硬件计数器，计数模式开销很小，最先执行
+                    if ctx.profiling_tools['perfstat']:
+                        stat_file = os.path.join(step_dir, 'perf_stat.csv')
+                        cmd_run(perf_stat.stat_command(cmd, stat_file), result_dir)
+                        if os.path.exists(stat_file):
+                            profiling_results['perfstat'] = {
+                                'raw': stat_file,
+                                **perf_stat.read_output(stat_file)
+                            }
+
                     # 1. perf 分析
-                    if self.profiling_tools['perf']:
-                        perf_data = os.path.join(profile_dir, 'perf.data')
-                        perf_cmd = f"perf record -F 99 -g -o {perf_data} -- {cmd}"
-                        cmd_run(perf_cmd, result_dir)
-                        
-                        # 生成火焰图
-                        subprocess.run(f"perf script -i {perf_data} > {profile_dir}/perf.script", shell=True)
-                        subprocess.run(f"/root/FlameGraph/stackcollapse-perf.pl {profile_dir}/perf.script > {profile_dir}/perf.folded", shell=True)
-                        subprocess.run(f"/root/FlameGraph/flamegraph.pl {profile_dir}/perf.folded > {profile_dir}/flamegraph.svg", shell=True)
-                        
-                        # 生成 perf report 输出
-                        subprocess.run(f"perf report -i {perf_data} > {profile_dir}/perf_report.txt", shell=True)
+                    if ctx.profiling_tools['perf']:
+                        perf_data = os.path.join(step_dir, 'perf.data')
+                        profile = ctx.perf_profile
+                        event = profile['events'][0] if len(profile['events']) > 1 else None
+                        live = None
+                        if profile['switch_output']:
+                            # 连续分析模式：运行中切出的块在后台折叠合并，随时可以查看当前的火焰图
+                            live = live_profile.LiveProfile(
+                                step_dir,
+                                lambda name, path, fn, *args: postprocess_submit(step_dir, name, path, fn, *args),
+                                self.symcache_dir, event
+                            )
+                            ctx.live_dirs[key] = live.live_dir
+                            live.start()
+                        try:
+                            cmd_run(perf_record.record_command(cmd, perf_data, profile), result_dir)
+                        finally:
+                            if live is not None:
+                                live.stop()
                         
-                        # 生成 perf annotate 输出
-                        subprocess.run(f"perf annotate -i {perf_data} > {profile_dir}/perf_annotate.txt", shell=True)
-                        
-                        # 收集所有性能分析结果的路径
+                        # 收集所有性能分析结果的路径，生成状态见 profile/artifacts.json
                         profiling_results['perf'] = {
-                            'flamegraph': f"{profile_dir}/flamegraph.svg",
-                            'report': f"{profile_dir}/perf_report.txt",
-                            'annotate': f"{profile_dir}/perf_annotate.txt",
-                            'raw_data': perf_data,
-                            'script': f"{profile_dir}/perf.script",
-                            'folded': f"{profile_dir}/perf.folded"
+                            'profile': profile,
+                            'flamegraph': f"{step_dir}/flamegraph.svg",
+                            'folded': f"{step_dir}/perf.folded",
+                            'flamegraph_json': f"{step_dir}/flamegraph.json"
                         }
+                        # 火焰图、perf report 交给后台进程池生成，不阻塞测试完成；
+                        # perf annotate 只在查看时对热点符号按需生成（见 annotate_symbol）
+                        if live is not None:
+                            # 没有完整的 perf.data，火焰图由各窗口合并，不生成 perf report
+                            postprocess_submit(step_dir, 'flamegraph', f"{step_dir}/flamegraph.svg",
+                                               postprocess.live_flamegraph, step_dir, f"Flame Graph: {test_id}",
+                                               live.started_at, self.symcache_dir, event)
+                            profiling_results['perf']['live'] = live.live_dir
+                        else:
+                            postprocess_submit(step_dir, 'flamegraph', f"{step_dir}/flamegraph.svg",
+                                               postprocess.perf_flamegraph, perf_data, step_dir,
+                                               f"Flame Graph: {test_id}", self.symcache_dir, event)
+                            postprocess_submit(step_dir, 'perf_report', f"{step_dir}/perf_report.txt",
+                                               postprocess.shell_to_file, f"perf report -i {perf_data}",
+                                               f"{step_dir}/perf_report.txt")
+                            profiling_results['perf']['report'] = f"{step_dir}/perf_report.txt"
+                            profiling_results['perf']['raw_data'] = perf_data
 
                     # 2. Valgrind 内存分析
-                    if self.profiling_tools['valgrind']:
-                        valgrind_log = os.path.join(profile_dir, 'valgrind.log')
-                        valgrind_xml = os.path.join(profile_dir, 'valgrind.xml')
+                    if ctx.profiling_tools['valgrind']:
+                        valgrind_log = os.path.join(step_dir, 'valgrind.log')
+                        valgrind_xml = os.path.join(step_dir, 'valgrind.xml')
                         
-                        # 只生成 XML 输出
-                        # valgrind_cmd = f"valgrind --tool=memcheck --leak-check=full --show-leak-kinds=all --xml=yes --xml-file={valgrind_xml} {cmd}"
-                        valgrind_cmd = f"valgrind --tool=memcheck --leak-check=full --show-leak-kinds=all --track-origins=yes --log-file={valgrind_log} {cmd}"
+                        # 错误和泄漏记录输出为 XML，valgrind.log 中只剩少量文本信息
+                        valgrind_cmd = (
+                            f"valgrind --tool=memcheck --leak-check=full --show-leak-kinds=all --track-origins=yes "
+                            f"--xml=yes --xml-file={valgrind_xml} --log-file={valgrind_log} {cmd}"
+                        )
                         cmd_run(valgrind_cmd, result_dir)
-                        if os.path.exists(valgrind_log):
-                            profiling_results['valgrind'] = valgrind_log
-                            heap_path = os.path.join(profile_dir,'heap.svg')
-                            heap_svg.generate_memory_svg(profile_dir)
-                            if os.path.exists(heap_path):
-                                profiling_results['heap'] = heap_path
-
-
-                        
-                        
-                        # # 从 XML 生成文本日志
-                        # if xml_to_text(valgrind_xml, valgrind_log):
-                        #     profiling_results['valgrind'] = valgrind_log
-                        
-                        # # 生成内存分析图
-                        # heap_svg = os.path.join(profile_dir, 'heap')
-                        # if generate_memory_svg(valgrind_xml, heap_svg):
-                        #     profiling_results['heap'] = heap_svg + '.svg'
+                        heap_path = os.path.join(step_dir, 'heap.svg')
+                        if os.path.exists(valgrind_xml):
+                            # 文本报告、去重后的错误摘要、错误调用图和 heap.svg 在后台一次解析生成
+                            report_path = os.path.join(step_dir, 'memcheck_report.txt')
+                            postprocess_submit(step_dir, 'memcheck', [report_path, heap_path],
+                                               postprocess.memcheck_report, valgrind_xml, step_dir)
+                            profiling_results['valgrind'] = report_path
+                            profiling_results['memcheck'] = {
+                                'report': report_path,
+                                'summary': os.path.join(step_dir, 'memcheck.json'),
+                                'graph': os.path.join(step_dir, 'memcheck_graph.svg'),
+                                'xml': valgrind_xml,
+                                'log': valgrind_log
+                            }
+                            profiling_results['heap'] = heap_path
+                        elif os.path.exists(valgrind_log):
+                            postprocess_submit(step_dir, 'heap', heap_path, postprocess.heap_graph, step_dir)
+                            profiling_results['heap'] = heap_path
 
                     # 3. Callgrind 调用图分析
-                    if self.profiling_tools['callgrind']:
-                        callgrind_out = os.path.join(profile_dir, 'callgrind.out')
-                        callgrind_cmd = f"valgrind --tool=callgrind --callgrind-out-file={callgrind_out} {cmd}"
-                        cmd_run(callgrind_cmd, result_dir)
-
-                        # 生成调用图可视化
-                        subprocess.run(f"gprof2dot -f callgrind {callgrind_out} | dot -Tsvg -o {profile_dir}/callgrind.svg", shell=True)
-                        profiling_results['callgrind'] = f"{profile_dir}/callgrind.svg"
+                    if ctx.profiling_tools['callgrind']:
+                        callgrind_out = os.path.join(step_dir, 'callgrind.out')
+                        cmd_run(callgrind.callgrind_command(cmd, callgrind_out), result_dir)
+
+                        if os.path.exists(callgrind_out):
+                            # 在 agent 内解析成本表并裁剪调用图，只有裁剪后的图交给 dot 布局
+                            summary = callgrind.summarize(callgrind.read_output(callgrind_out))
+                            callgrind_json = os.path.join(step_dir, 'callgrind.json')
+                            callgrind.write_json(summary, callgrind_json)
+                            postprocess_submit(step_dir, 'callgrind', f"{step_dir}/callgrind.svg",
+                                               postprocess.callgrind_graph, callgrind_json, f"{step_dir}/callgrind.svg")
+                            profiling_results['callgrind'] = f"{step_dir}/callgrind.svg"
+                            profiling_results['callgrind_summary'] = {
+                                'json': callgrind_json,
+                                'event': summary['event'],
+                                'total': summary['total'],
+                                'functions': summary['function_count'],
+                                'top_functions': summary['by_self'][:callgrind.TOP_FUNCTIONS]
+                            }
+
+                    # 4. Massif 堆内存随时间的变化
+                    if ctx.profiling_tools['massif']:
+                        massif_out = os.path.join(step_dir, 'massif.out')
+                        # 快照时间相对程序启动，记录启动时刻以便和采样的内存序列对齐
+                        start_ms = int(time.time() * 1000)
+                        cmd_run(massif.massif_command(cmd, massif_out), result_dir)
+                        if os.path.exists(massif_out):
+                            profiling_results['massif'] = {
+                                'raw': massif_out,
+                                'report': f"{step_dir}/massif.txt",
+                                'start_ms': start_ms,
+                                **massif.read_output(massif_out)
+                            }
+                            postprocess_submit(step_dir, 'massif', f"{step_dir}/massif.txt",
+                                               postprocess.shell_to_file, f"ms_print {massif_out}",
+                                               f"{step_dir}/massif.txt")
 
                 except Exception as e:
                     log_message(f"Profiling error: {str(e)}")
-                    
+
+                # 该步骤不再产生新文件，后台任务全部完成后压缩原始数据
+                self.postprocessor.seal(profile_dir, os.path.basename(step_dir), step_dir)
+
             return profiling_results
 
+        def stop_sampling():
+            """停止采样，返回指标摘要，完整序列保存在 metrics 目录中
+
+            columns 只统计被测步骤，整个运行期间（含准备、预热、清理）的统计放在 run 中。
+            """
+            summary = self.sampler.unregister(result_dir) or {}
+            measured = summary.pop('measured', None)
+            if measured and measured['samples']:
+                summary['run'] = {'samples': summary['samples'], 'columns': summary['columns']}
+                summary.update(measured)
+            summary['steps'] = step_results
+            summary['placement'] = ctx.placement
+            # 第一个被测步骤的硬件计数器，用于跨运行比较
+            summary['counters'] = next((r['counters'] for r in step_results if r.get('counters')), None)
+            return summary
+
+        step_results = []
+        profiling_results = {}
+
+        def run_iterations(step):
+            """按迭代参数重复执行被测步骤，返回每次迭代的耗时和资源占用"""
+            iterations = []
+            while not plan.done([it['wall_time'] for it in iterations]):
+                measurement = cmd_run(step.command, result_dir)
+                iterations.append(measurement)
+                log_message(
+                    f"Iteration {len(iterations)}: wall {measurement['wall_time']:.4f}s, "
+                    f"cpu {measurement['cpu_time']:.4f}s, max rss {measurement['max_rss'] // 1024} KB"
+                )
+            return iterations
+
+        def profile_step(step, measured_index, record):
+            key = f"command_{measured_index}"
+            profiling_results['tools'] = ctx.profiling_tools
+            profiling_results[key] = run_profiling(step.command, os.path.join(profile_dir, f"step_{step.index}"), key)
+            record['profile'] = key
+            stat = profiling_results[key].get('perfstat')
+            if stat:
+                record['counters'] = {'events': stat['counters'], 'derived': stat['derived']}
+
+        def run_step(step, measured_index):
+            """执行单个步骤并记录耗时和该步骤区间的指标，被测步骤按需做性能分析"""
+            window = f"step_{step.index}"
+            record = step.to_dict()
+            log_message(f"\nExecuting {step.kind} step {step.index}: {step.command}")
+            iterated = step.measured and plan is not None
+            if iterated and plan.warmup:
+                # 预热迭代不进入该步骤的指标区间
+                for i in range(plan.warmup):
+                    log_message(f"Warmup iteration {i + 1}/{plan.warmup}")
+                    cmd_run(step.command, result_dir)
+            record['start_ms'] = self.sampler.begin_window(result_dir, window)
+            started = time.monotonic()
+            try:
+                if iterated:
+                    record['iterations'] = run_iterations(step)
+                    record['stats'] = stats.iteration_stats(record['iterations'], plan.confidence)
+                elif step.measured and enable_profiling:
+                    profile_step(step, measured_index, record)
+                else:
+                    record['rusage'] = cmd_run(step.command, result_dir)
+                record['status'] = 'success'
+            except Exception as e:
+                record['status'] = 'failed'
+                record['error'] = str(e)
+                raise
+            finally:
+                record['duration'] = time.monotonic() - started
+                summary = self.sampler.end_window(result_dir, window, measured=step.measured)
+                if summary is not None:
+                    record['end_ms'] = summary.pop('end_ms')
+                    record['metrics'] = summary
+                step_results.append(record)
+                log_message(f"{step.kind} step {step.index} {record['status']} in {record['duration']:.3f}s")
+
+            if iterated and enable_profiling:
+                # 迭代模式下在指标区间之外单独执行一次带分析工具的运行，不影响计时
+                profile_step(step, measured_index, record)
+
+        def benchmark_data():
+            """迭代模式的统计结果，测试结果的统计值取第一个被测步骤"""
+            if plan is None:
+                return None
+            measured = [
+                {
+                    'index': record['index'],
+                    'command': record['command'],
+                    'iterations': record['iterations'],
+                    'stats': record['stats']
+                }
+                for record in step_results if record.get('iterations')
+            ]
+            if not measured:
+                return None
+            return {
+                **plan.to_dict(),
+                'steps': measured,
+                'stats': measured[0]['stats']
+            }
+
         def run_test():
+            if ctx.status == 'queued':
+                log_message(f"Waiting for a free run slot ({nameconfig.MAX_CONCURRENT_RUNS} concurrent runs)")
+                self.run_slots.acquire()
+                if ctx.cancelled:
+                    # 排队期间被取消，记录终止状态，get_logs 不再报告为运行中
+                    ctx.status = 'cancelled'
+                    self.test_status[result_dir] = 'cancelled'
+                    self.run_slots.release()
+                    self.runs.pop(result_dir, None)
+                    capture.close()
+                    return
+                ctx.status = 'running'
+                self.test_status[result_dir] = 'running'
+                self.update_test_status(test_id, timestamp, 'running')
+
             try:
-                # 保持原有的性能监控线程
-                monitor_thread = threading.Thread(
-                    target=self.collect_performance_metrics,
-                    args=(test_id, result_dir)
+                # 分配独占的 CPU 核心，子进程在 exec 前绑定
+                if self.cpu_allocator is not None:
+                    ctx.set_placement(self.cpu_allocator.allocate(result_dir))
+                    if ctx.placement:
+                        log_message(f"Pinned to CPUs {ctx.placement['cpulist']} (NUMA nodes {ctx.placement['numa_nodes']}, "
+                                    f"memory {'bound to ' + ctx.placement['membind'] if ctx.placement['membind'] else 'not bound, numactl unavailable'})")
+                    else:
+                        log_message("No free CPU cores, running without pinning")
+
+                # 注册到共享采样线程，只采样本次测试启动的进程树
+                self.sampler.register(
+                    result_dir,
+                    lambda: self._root_pids(result_dir),
+                    metrics_dir(result_dir),
+                    on_sample=lambda epoch_ms, row: self.publisher.publish_sample(result_dir, epoch_ms, row)
                 )
-                monitor_thread.daemon = True
-                monitor_thread.start()
 
                 log_message(f"Test started at: {datetime.now()}")
                 log_message(f"Commands to execute:\n{command}")
 
-                commands = command.split('\n')
-                profiling_results = {}
-
-                for i, cmd in enumerate(commands, 1):
-                    cmd = cmd.strip()
-                    if not cmd:
-                        continue
-
-                    log_message(f"\nExecuting command {i}: {cmd}")
-                    
-                    # 执行性能分析
-                    if enable_profiling:
-                        prof_results = run_profiling(cmd)
-                        profiling_results['tools'] = self.profiling_tools
-                        profiling_results[f"command_{i}"] = prof_results
-
+                steps = pipeline.parse_steps(command)
+                if not any(step.measured for step in steps):
+                    raise Exception("No measured step in command")
 
-                    else:
-                        cmd_run(cmd, result_dir)
-                    #目前仅支持单行命令
-                    break
-
-                # 保存性能分析结果
-                if profiling_results:
-                    with open(os.path.join(profile_dir, 'profiling_results.json'), 'w') as f:
-                        json.dump(profiling_results, f)
+                # 准备、预热、被测步骤按顺序执行，清理步骤最后执行且总会执行
+                try:
+                    measured_index = 0
+                    for step in steps:
+                        if step.kind == pipeline.TEARDOWN:
+                            continue
+                        if step.measured:
+                            measured_index += 1
+                        run_step(step, measured_index)
+                finally:
+                    for step in steps:
+                        if step.kind != pipeline.TEARDOWN:
+                            continue
+                        try:
+                            run_step(step, 0)
+                        except Exception as e:
+                            log_message(f"Teardown step {step.index} failed: {e}")
+
+                # 保存各步骤耗时和性能分析结果
+                profiling_results['steps'] = step_results
+                with open(os.path.join(profile_dir, 'profiling_results.json'), 'w') as f:
+                    json.dump(profiling_results, f)
 
                 log_message(f"\nTest completed successfully at: {datetime.now()}")
-                self.test_status[test_id] = 'success'
-                
-                # 等待性能监控线程结束
-                monitor_thread.join(timeout=5)
+                self.test_status[result_dir] = 'success'
+                perf_data = stop_sampling()
                 
                 # 更新测试状态时包含性能分析结果
-                perf_data = self.perf_data.get(test_id, {})
-                if profiling_results:
+                if enable_profiling:
                     perf_data['profiling'] = profiling_results
-                print(f"=============perf_data: {perf_data}==============")
-                self.update_test_status(test_id, timestamp, 'success', datetime.now(), perf_data)
+                self.update_test_status(test_id, timestamp, 'success', datetime.now(), perf_data, benchmark_data())
                 
             except Exception as e:
                 error_msg = str(e)
                 log_message(f"\nTest failed at: {datetime.now()}")
                 log_message(f"Error: {error_msg}")
-                self.test_status[test_id] = 'failed'
-                self.update_test_status(test_id, timestamp, 'failed', datetime.now(), self.perf_data.get(test_id))
+                self.test_status[result_dir] = 'failed'
+                self.update_test_status(test_id, timestamp, 'failed', datetime.now(), stop_sampling())
             finally:
+                capture.close()
+                if self.cpu_allocator is not None:
+                    self.cpu_allocator.release(result_dir)
+                self.runs.pop(result_dir, None)
+                self.run_slots.release()
                 if test_id in self.test_logs:
                     del self.test_logs[test_id]
                 
@@ -471,12 +555,13 @@ class TestServer:
                     del self.process_pool[result_dir]  
 
         # 启动测试线程
+        initial_status = ctx.status
         thread = threading.Thread(target=run_test)
         thread.daemon = True
         thread.start()
         
         return {
-            'status': 'running',
+            'status': initial_status,
             'result_dir': result_dir,
             'timestamp': timestamp.isoformat(),
             'profiling_enabled': enable_profiling
@@ -484,11 +569,15 @@ class TestServer:
     
     
     def kill_test_processes(self, result_dir):
+        ctx = self.runs.get(result_dir)
+        if ctx is not None and ctx.status == 'queued':
+            # 还在排队的测试拿到名额后直接退出
+            ctx.cancelled = True
+            return {'status': 'success', 'message': f"Queued run {result_dir} cancelled."}
         if result_dir in self.process_pool:
             processes = self.process_pool[result_dir]
-            for process in processes:
+            for process in list(processes):
                 try:
-                    print(f"===========process_pool==============:{process.pid}")
                     if isinstance(process, int): 
                         pid = process
                     else:
@@ -516,131 +605,240 @@ class TestServer:
         except psutil.NoSuchProcess:
             self.logger.warning(f"Process {pid} not found")
 
-    def get_test_logs(self, test_id, result_dir):
-        """获取测试日志"""
+    def get_test_logs(self, test_id, result_dir, offset=0, max_bytes=DEFAULT_MAX_BYTES):
+        """获取测试日志，只返回 offset 之后新增的完整行及下一次读取的偏移"""
         logs = []
-        status = self.test_status.get(test_id, 'unknown')
-        
-        print(f"获取测试日志self.test_logs：{result_dir}")
-        
-        # 如果没有实时日志，尝试从文件读取
-        if result_dir and os.path.exists(f"{result_dir}/output.log"):
-            with open(f"{result_dir}/output.log", 'r') as f:
-                logs = f.read().splitlines()
-        
+        eof = True
+        status = self.test_status.get(result_dir, 'unknown')
+
+        if result_dir:
+            logs, offset, eof = read_log_delta(os.path.join(result_dir, 'output.log'), offset, max_bytes)
+
         return {
             'status': status,
-            'logs': logs
+            'logs': logs,
+            'offset': offset,
+            'eof': eof
         }
     
     
-    def collect_performance_metrics(self, test_id, result_dir):
-        """收集性能指标"""
-        perf_data = {
-            'cpu_data': [],
-            'memory_data': [],
-            'disk_io_data': [],  # 新增：磁盘 I/O 数据
-            'network_io_data': []  # 新增：网络 I/O 数据
+    def _perf_path(self, result_dir, profile_key, name):
+        """结果中某个被测步骤的 perf 产物路径（folded、raw_data 等），没有 perf 分析结果时返回 None"""
+        results_file = os.path.join(result_dir, 'profile', 'profiling_results.json')
+        try:
+            with open(results_file, 'r') as f:
+                path = json.load(f)[profile_key]['perf'][name]
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        return path if artifact_store.exists(path) else None
+
+    def _folded_path(self, result_dir, profile_key):
+        return self._perf_path(result_dir, profile_key, 'folded')
+
+    def _live_dir(self, result_dir, profile_key):
+        """连续分析模式的 live 目录，运行中从 RunContext 查找，结束后从 profiling_results.json 查找"""
+        ctx = self.runs.get(result_dir)
+        if ctx is not None and profile_key in ctx.live_dirs:
+            return ctx.live_dirs[profile_key]
+        return self._perf_path(result_dir, profile_key, 'live')
+
+    def live_flamegraph(self, result_dir, profile_key='command_1', start=None, end=None):
+        """连续分析模式下当前累计的火焰图，指定 start/end（相对 perf 启动的秒数）时为该时间范围内各窗口的火焰图"""
+        live_dir = self._live_dir(result_dir, profile_key)
+        if live_dir is None:
+            return {'status': 'error', 'error': f"No continuous profile for {profile_key} in {result_dir}"}
+        rendered = live_profile.render(
+            live_dir, start, end,
+            title=f"Flame Graph: {os.path.basename(os.path.normpath(result_dir))}"
+        )
+        if rendered is None:
+            # 第一块还没有切出
+            return {'status': 'success', 'svg': None, 'windows': [], 'samples': 0,
+                    'index': live_profile.read_index(live_dir)}
+        return {'status': 'success', **rendered}
+
+    def annotate_symbol(self, result_dir, profile_key='command_1', symbol=None, top=None, allow_any=False):
+        """按需生成热点符号的 perf annotate，返回热点符号列表和一个符号逐行的样本百分比
+
+        symbol 为空时注解最热的符号，结果按符号缓存在步骤目录中。
+        """
+        perf_data = self._perf_path(result_dir, profile_key, 'raw_data')
+        if perf_data is None:
+            return {'status': 'error', 'error': f"No perf.data for {profile_key} in {result_dir}"}
+        annotator = annotate.Annotator(perf_data, top or nameconfig.ANNOTATE_TOP_SYMBOLS)
+        try:
+            return {'status': 'success', **annotator.lookup(symbol, allow_any)}
+        except ValueError as e:
+            return {'status': 'error', 'error': str(e)}
+
+    def diff_flamegraph(self, before_dir, after_dir, profile_key='command_1', limit=50):
+        """两次结果同一被测步骤的差分火焰图和占比变化排行
+
+        输出写入 after 结果的 profile/diff 目录，已经生成过时直接读取。
+        """
+        before = self._folded_path(before_dir, profile_key)
+        after = self._folded_path(after_dir, profile_key)
+        if before is None or after is None:
+            missing = before_dir if before is None else after_dir
+            manifest = postprocess.read_manifest(os.path.join(missing, 'profile'))
+            if any(item.get('status') == postprocess.PENDING for item in manifest.values()):
+                return {'status': 'error', 'error': f"Profiling artifacts of {missing} are still being generated"}
+            return {
+                'status': 'error',
+                'error': f"No perf.folded for {profile_key} in {missing}"
+            }
+
+        name = f"{os.path.basename(os.path.normpath(before_dir))}_{profile_key}"
+        out_dir = os.path.join(after_dir, 'profile', 'diff', name)
+        svg_path = os.path.join(out_dir, 'diff_flamegraph.svg')
+        table_path = os.path.join(out_dir, 'diff.json')
+        if os.path.exists(table_path) and os.path.exists(svg_path):
+            with open(table_path, 'r') as f:
+                summary = json.load(f)
+            if len(summary['table']) >= min(limit, summary['frames']):
+                summary['table'] = summary['table'][:limit]
+                return {'status': 'success', **summary}
+
+        before_stacks = flamegraph.read_folded(before)
+        after_stacks = flamegraph.read_folded(after)
+        os.makedirs(out_dir, exist_ok=True)
+        flamegraph.render_diff_svg(
+            before_stacks, after_stacks, svg_path,
+            title=f"Differential Flame Graph: {os.path.basename(os.path.normpath(after_dir))} vs "
+                  f"{os.path.basename(os.path.normpath(before_dir))}"
+        )
+        rows = flamegraph.diff_table(before_stacks, after_stacks, None)
+        summary = {
+            'svg': svg_path,
+            'before_samples': sum(before_stacks.values()),
+            'after_samples': sum(after_stacks.values()),
+            'frames': len(rows),
+            # 缓存中多保留一些行，之后请求更大的 limit 时不必重新计算
+            'table': rows[:max(limit, 500)]
         }
-        
-        perf_file = os.path.join(result_dir, 'performance.json')
-        
-        # 初始化 I/O 计数器
-        disk_io_start = psutil.disk_io_counters()
-        net_io_start = psutil.net_io_counters()
-        
-        while self.test_status.get(test_id) == 'running':
-            timestamp = datetime.now().isoformat()
-            
-            # 收集 CPU 使用率
-            cpu_percent = psutil.cpu_percent(interval=1)
-            perf_data['cpu_data'].append({
-                'timestamp': timestamp,
-                'value': cpu_percent
-            })
-            
-            # 收集内存使用情况
-            memory = psutil.virtual_memory()
-            perf_data['memory_data'].append({
-                'timestamp': timestamp,
-                'value': memory.percent
-            })
-            
-            # 收集磁盘 I/O 使用情况
-            disk_io = psutil.disk_io_counters()
-            perf_data['disk_io_data'].append({
-                'timestamp': timestamp,
-                'read_bytes': disk_io.read_bytes - disk_io_start.read_bytes,
-                'write_bytes': disk_io.write_bytes - disk_io_start.write_bytes
-            })
-            
-            # 收集网络 I/O 使用情况
-            net_io = psutil.net_io_counters()
-            perf_data['network_io_data'].append({
-                'timestamp': timestamp,
-                'bytes_sent': net_io.bytes_sent - net_io_start.bytes_sent,
-                'bytes_recv': net_io.bytes_recv - net_io_start.bytes_recv
-            })
-            
-            # 实时保存性能数据到文件
-            with open(perf_file, 'w') as f:
-                json.dump(perf_data, f)
-            
-            time.sleep(1)
-        
-        self.perf_data[test_id] = perf_data
-        return perf_data
-    
-    def run(self):
-        while True:
+        with open(table_path, 'w') as f:
+            json.dump(summary, f)
+        summary['table'] = rows[:limit]
+        return {'status': 'success', **summary}
+
+    def _root_pids(self, result_dir):
+        """process_pool 中记录的本次测试仍在运行的根进程"""
+        return [
+            process if isinstance(process, int) else process.pid
+            for process in list(self.process_pool.get(result_dir, []))
+            if isinstance(process, int) or process.returncode is None
+        ]
+
+    def dispatch(self, request):
+        """执行单个请求，在线程池中运行"""
+        action = request.get('action')
+        try:
+            if action == 'execute_test':
+                return self.execute_test(
+                    request['test_id'],
+                    request['command'],
+                    request['enable_profiling'],
+                    request['profiling_config'],
+                    request.get('parameters')
+                )
+            elif action == 'get_logs':
+                return self.get_test_logs(
+                    request['test_id'],
+                    request['result_dir'],
+                    request.get('offset', 0),
+                    request.get('max_bytes', DEFAULT_MAX_BYTES)
+                )
+            elif action == 'kill_test_processes':
+                return self.kill_test_processes(request['result_dir'])
+            elif action == 'diff_flamegraph':
+                return self.diff_flamegraph(
+                    request['before_dir'],
+                    request['after_dir'],
+                    request.get('profile_key', 'command_1'),
+                    request.get('limit', 50)
+                )
+            elif action == 'live_flamegraph':
+                return self.live_flamegraph(
+                    request['result_dir'],
+                    request.get('profile_key', 'command_1'),
+                    request.get('start'),
+                    request.get('end')
+                )
+            elif action == 'annotate_symbol':
+                return self.annotate_symbol(
+                    request['result_dir'],
+                    request.get('profile_key', 'command_1'),
+                    request.get('symbol'),
+                    request.get('top'),
+                    request.get('allow_any', False)
+                )
+            elif action == 'ping':
+                return {'status': 'ok'}
+            else:
+                return {
+                    'status': 'error',
+                    'error': 'Unknown action'
+                }
+        except Exception as e:
+            self.logger.error(f"Error handling request '{action}': {e}", exc_info=True)
+            return {
+                'status': 'error',
+                'error': str(e)
+            }
+
+    async def handle_connection(self, reader, writer):
+        """处理一个客户端长连接
+
+        带 id 的请求并发执行，响应按完成顺序写回并附带同一个 id；
+        不带 id 的请求按顺序逐个处理。
+        """
+        addr = writer.get_extra_info('peername')
+        self.logger.debug(f"Connection from {addr}")
+        loop = asyncio.get_running_loop()
+        write_lock = asyncio.Lock()
+        in_flight = set()
+
+        async def respond(request):
+            lane = self.action_lanes.get(request.get('action'), 'query')
+            result = await loop.run_in_executor(self.executors[lane], self.dispatch, request)
+            if 'id' in request:
+                result = {'id': request['id'], 'response': result}
             try:
-                print("Waiting for connection...")
-                conn, addr = self.sock.accept()
-                print(f"Connection from {addr}")
-                
-                try:
-                    data = conn.recv(1024).decode()
-                    request = json.loads(data)
-                    
-                    if request['action'] == 'execute_test':
-                        # 执行测试
-                        result = self.execute_test(
-                            request['test_id'],
-                            request['command'],
-                            request['enable_profiling'],
-                            request['profiling_config']
-                        )
-                        conn.sendall(json.dumps(result).encode())
-                        
-                    elif request['action'] == 'get_logs':
-                        # 获取日志
-                        result = self.get_test_logs(request['test_id'], request['result_dir'])
-                        conn.sendall(json.dumps(result).encode())
-                    
-                    elif request['action'] == 'kill_test_processes':
-                        result = self.kill_test_processes(request['result_dir'])
-                        conn.sendall(json.dumps(result).encode())
-                        
-                    else:
-                        conn.sendall(json.dumps({
-                            'status': 'error',
-                            'error': 'Unknown action'
-                        }).encode())
-                        
-                except Exception as e:
-                    print(f"Error handling request '{request['action']}': {e}")
-                    try:
-                        conn.sendall(json.dumps({
-                            'status': 'error',
-                            'error': str(e)
-                        }).encode())
-                    except:
-                        pass
-                finally:
-                    conn.close()
-                    
-            except Exception as e:
-                print(f"Error accepting connection: {e}")
+                async with write_lock:
+                    await framing.write_message(writer, result)
+            except ConnectionError as e:
+                self.logger.warning(f"Dropping response for {addr}: {e}")
+
+        try:
+            while True:
+                request = await framing.read_message(reader)
+                if request is None:
+                    break
+                if 'id' in request:
+                    task = asyncio.create_task(respond(request))
+                    in_flight.add(task)
+                    task.add_done_callback(in_flight.discard)
+                else:
+                    await respond(request)
+        except (framing.FramingError, ConnectionError) as e:
+            self.logger.warning(f"Connection {addr} dropped: {e}")
+        except Exception as e:
+            self.logger.error(f"Error serving connection {addr}: {e}", exc_info=True)
+        finally:
+            if in_flight:
+                await asyncio.gather(*in_flight, return_exceptions=True)
+            writer.close()
+
+    async def serve(self):
+        server = await asyncio.start_server(self.handle_connection, sock=self.sock)
+        async with server:
+            await server.serve_forever()
+
+    def run(self):
+        try:
+            asyncio.run(self.serve())
+        finally:
+            self.publisher.close()
 
 if __name__ == '__main__':
     server = TestServer()
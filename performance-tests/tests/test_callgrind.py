@@ -0,0 +1,108 @@
+import os
+import unittest
+from unittest import mock
+
+from utils import callgrind
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+APP = '/tmp/app'
+LIBC = '/usr/lib/libc.so.6'
+
+
+def load_profile(event=None):
+    return callgrind.read_output(os.path.join(FIXTURES, 'callgrind.out'), event)
+
+
+class TestParse(unittest.TestCase):
+    def test_header(self):
+        profile = load_profile()
+        self.assertEqual(profile['cmd'], './app --flag')
+        self.assertEqual(profile['events'], ['Ir', 'Dr'])
+        self.assertEqual(profile['event'], 'Ir')
+        self.assertEqual(profile['total'], 7650)
+
+    def test_costs(self):
+        functions = load_profile()['functions']
+        cases = [
+            # (函数, 自身成本, 包含成本, 被调用次数)
+            ((APP, 'main'), 143, 7650, 0),
+            # 直接递归的调用成本不计入包含成本
+            ((APP, 'compute'), 4000, 7000, 3),
+            ((APP, 'helper'), 3000, 3000, 5),
+            ((APP, 'tiny'), 7, 7, 1),
+            ((LIBC, 'memcpy'), 500, 500, 10)
+        ]
+        for key, self_cost, inclusive, calls in cases:
+            with self.subTest(function=key[1]):
+                entry = functions[key]
+                self.assertEqual((entry['self'], entry['inclusive'], entry['calls']),
+                                 (self_cost, inclusive, calls))
+        # 压缩的文件名在调用说明行中定义，之后用编号引用
+        self.assertEqual(functions[(LIBC, 'memcpy')]['file'], 'memcpy.S')
+        self.assertEqual(functions[(APP, 'helper')]['file'], 'app.c')
+
+    def test_calls(self):
+        calls = load_profile()['calls']
+        self.assertEqual(calls[((APP, 'main'), (APP, 'compute'))], [7000, 2])
+        self.assertEqual(calls[((APP, 'compute'), (APP, 'compute'))], [1500, 1])
+        self.assertEqual(calls[((APP, 'compute'), (LIBC, 'memcpy'))], [500, 10])
+        self.assertEqual(len(calls), 6)
+
+    def test_event(self):
+        profile = load_profile('Dr')
+        self.assertEqual(profile['event'], 'Dr')
+        self.assertEqual(profile['total'], 2100)
+        self.assertEqual(profile['functions'][(APP, 'compute')]['self'], 1000)
+        self.assertEqual(profile['functions'][(APP, 'compute')]['inclusive'], 1800)
+        # 不存在的事件按第一个事件统计
+        self.assertEqual(load_profile('Bc')['event'], 'Ir')
+
+
+class TestPrune(unittest.TestCase):
+    def setUp(self):
+        self.profile = load_profile()
+
+    def names(self, graph):
+        return [node['name'] for node in graph['nodes']]
+
+    def edges(self, graph):
+        ids = {node['id']: node['name'] for node in graph['nodes']}
+        return [(ids[edge['source']], ids[edge['target']]) for edge in graph['edges']]
+
+    def test_thresholds(self):
+        with mock.patch.object(callgrind, 'MIN_NODES', 1):
+            graph = callgrind.prune(self.profile)
+            # 包含成本 7 低于总成本的 0.5%
+            self.assertEqual(self.names(graph), ['main', 'compute', 'helper', 'memcpy'])
+            self.assertEqual(graph['dropped_nodes'], 1)
+
+            graph = callgrind.prune(self.profile, node_threshold=10, edge_threshold=20)
+            self.assertEqual(self.names(graph), ['main', 'compute', 'helper'])
+            self.assertEqual(self.edges(graph), [('main', 'compute'), ('compute', 'helper')])
+
+            graph = callgrind.prune(self.profile, max_nodes=2)
+            self.assertEqual(self.names(graph), ['main', 'compute'])
+
+    def test_min_nodes(self):
+        # 函数少于 MIN_NODES 时全部保留，调用边仍按阈值裁剪
+        graph = callgrind.prune(self.profile)
+        self.assertEqual(len(graph['nodes']), 5)
+        self.assertEqual(graph['dropped_nodes'], 0)
+        self.assertNotIn(('main', 'tiny'), self.edges(graph))
+        self.assertIn(('compute', 'compute'), self.edges(graph))
+        self.assertEqual(len(graph['edges']), 5)
+
+    def test_summarize(self):
+        summary = callgrind.summarize(self.profile)
+        self.assertEqual(summary['function_count'], 5)
+        self.assertEqual(summary['by_self'][0]['name'], 'compute')
+        self.assertAlmostEqual(summary['by_inclusive'][1]['inclusive_pct'], 7000 / 7650 * 100)
+        self.assertIn('n0 -> n1', callgrind.to_dot(summary))
+
+    def test_empty(self):
+        self.assertEqual(callgrind.prune(callgrind.parse([])), {'nodes': [], 'edges': [], 'dropped_nodes': 0})
+
+
+if __name__ == '__main__':
+    unittest.main()
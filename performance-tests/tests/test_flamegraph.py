@@ -0,0 +1,94 @@
+import os
+import re
+import shutil
+import tempfile
+import unittest
+
+from utils import flamegraph
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+KERNEL_STACK = ('app', '__libc_start_main', 'main', 'compute', 'asm_exc_page_fault')
+LIBC_STACK = ('app', 'main', '[libc.so.6]')
+UNKNOWN_STACK = ('my_worker', '[unknown]')
+
+
+def load_stacks(event='cycles'):
+    with open(os.path.join(FIXTURES, 'perf_script.txt')) as f:
+        return flamegraph.collapse_perf_script(f, event=event)
+
+
+class TestCollapsePerfScript(unittest.TestCase):
+    def test_collapse(self):
+        # 多行调用栈按根到叶排列，偏移不同的同一函数合并，进程名中的空格替换为下划线
+        self.assertEqual(load_stacks(), {
+            KERNEL_STACK: 2,
+            LIBC_STACK: 1,
+            UNKNOWN_STACK: 1
+        })
+
+    def test_event_filter(self):
+        stacks = load_stacks(event=None)
+        self.assertEqual(sum(stacks.values()), 5)
+        self.assertEqual(stacks[('app', 'main', 'compute')], 1)
+        self.assertEqual(load_stacks(event='cache-misses'), {('app', 'main', 'compute'): 1})
+
+    def test_frame_name(self):
+        cases = [
+            ('ffffffff81000010 asm_exc_page_fault+0x1e ([kernel.kallsyms])', 'asm_exc_page_fault'),
+            ('401136 compute+0x16 (/tmp/app)', 'compute'),
+            ('7f00000a1234 [unknown] (/usr/lib/x86_64-linux-gnu/libc.so.6)', '[libc.so.6]'),
+            ('0 [unknown] ([unknown])', '[unknown]'),
+            ('7f00000a1234 (/usr/lib/libm.so.6)', '[libm.so.6]'),
+            ('401136', '[unknown]')
+        ]
+        for line, expected in cases:
+            with self.subTest(line=line):
+                self.assertEqual(flamegraph._frame_name(line), expected)
+
+
+class TestFlameGraphOutput(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.stacks = load_stacks()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_folded(self):
+        path = os.path.join(self.tmpdir, 'perf.folded')
+        flamegraph.write_folded(self.stacks, path)
+        with open(path) as f:
+            self.assertEqual(f.read().splitlines(), [
+                'app;__libc_start_main;main;compute;asm_exc_page_fault 2',
+                'app;main;[libc.so.6] 1',
+                'my_worker;[unknown] 1'
+            ])
+        self.assertEqual(flamegraph.read_folded(path), self.stacks)
+
+    def test_json_totals(self):
+        root = flamegraph.to_json(self.stacks)
+        self.assertEqual(root['value'], 4)
+        self.assertEqual([(c['name'], c['value']) for c in root['children']], [('app', 3), ('my_worker', 1)])
+        app = root['children'][0]
+        self.assertEqual([(c['name'], c['value']) for c in app['children']],
+                         [('__libc_start_main', 2), ('main', 1)])
+        # 低于阈值的节点不输出
+        pruned = flamegraph.to_json(self.stacks, min_fraction=0.5)
+        self.assertEqual([c['name'] for c in pruned['children']], ['app'])
+
+    def test_svg_totals(self):
+        path = os.path.join(self.tmpdir, 'flamegraph.svg')
+        flamegraph.render_svg(self.stacks, path)
+        with open(path) as f:
+            titles = re.findall(r'<title>(.*?)</title>', f.read())
+        self.assertIn('app (3 samples, 75.00%)', titles)
+        self.assertIn('my_worker (1 samples, 25.00%)', titles)
+        self.assertIn('asm_exc_page_fault (2 samples, 50.00%)', titles)
+        self.assertIn('[libc.so.6] (1 samples, 25.00%)', titles)
+        self.assertIn('[unknown] (1 samples, 25.00%)', titles)
+        self.assertEqual(len(titles), 9)
+
+
+if __name__ == '__main__':
+    unittest.main()
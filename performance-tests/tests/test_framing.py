@@ -0,0 +1,155 @@
+import asyncio
+import logging
+import socket
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import server
+from utils import framing
+
+# 远大于 StreamReader 默认缓冲（64 KiB）和 recv 单次读取大小（1 MiB）
+LARGE_PAYLOAD = {'action': 'execute_test', 'command': 'x' * (3 * 1024 * 1024)}
+
+
+class TestAsyncFraming(unittest.IsolatedAsyncioTestCase):
+    async def feed(self, chunks, eof=True):
+        reader = asyncio.StreamReader()
+        task = asyncio.create_task(framing.read_message(reader))
+        for chunk in chunks:
+            reader.feed_data(chunk)
+            await asyncio.sleep(0)
+        if eof:
+            reader.feed_eof()
+        return reader, task
+
+    async def test_partial_reads(self):
+        # 消息逐字节到达，长度头和消息体都被拆开
+        data = framing.encode_message({'action': 'ping', 'text': '中文'})
+        reader, task = await self.feed([data[i:i + 1] for i in range(len(data))])
+        self.assertEqual(await task, {'action': 'ping', 'text': '中文'})
+        self.assertIsNone(await framing.read_message(reader))
+
+    async def test_back_to_back(self):
+        data = framing.encode_message({'id': 1}) + framing.encode_message({'id': 2})
+        reader, task = await self.feed([data[:5], data[5:-3], data[-3:]])
+        self.assertEqual(await task, {'id': 1})
+        self.assertEqual(await framing.read_message(reader), {'id': 2})
+        self.assertIsNone(await framing.read_message(reader))
+
+    async def test_truncated(self):
+        data = framing.encode_message({'action': 'ping'})
+        cases = [
+            # (收到的字节, 期望结果)
+            (b'', None),
+            (data[:3], framing.FramingError),
+            (data[:-1], framing.FramingError)
+        ]
+        for chunk, expected in cases:
+            with self.subTest(received=len(chunk)):
+                _, task = await self.feed([chunk] if chunk else [])
+                if expected is None:
+                    self.assertIsNone(await task)
+                else:
+                    with self.assertRaises(expected):
+                        await task
+
+    async def test_large_frame(self):
+        # asyncio 一端与 backend 使用的阻塞 socket 一端互通，大消息不被截断
+        async def echo(reader, writer):
+            message = await framing.read_message(reader)
+            await framing.write_message(writer, message)
+            writer.close()
+
+        echo_server = await asyncio.start_server(echo, '127.0.0.1', 0)
+        port = echo_server.sockets[0].getsockname()[1]
+
+        def client():
+            with socket.create_connection(('127.0.0.1', port)) as sock:
+                framing.send_message(sock, LARGE_PAYLOAD)
+                return framing.recv_message(sock), framing.recv_message(sock)
+
+        async with echo_server:
+            reply, after = await asyncio.to_thread(client)
+        self.assertEqual(reply, LARGE_PAYLOAD)
+        self.assertIsNone(after)
+
+
+class TestBlockingFraming(unittest.TestCase):
+    def test_partial_reads(self):
+        left, right = socket.socketpair()
+        with left, right:
+            data = framing.encode_message({'action': 'get_logs'})
+            thread = threading.Thread(target=lambda: [left.sendall(data[i:i + 2]) for i in range(0, len(data), 2)])
+            thread.start()
+            self.assertEqual(framing.recv_message(right), {'action': 'get_logs'})
+            thread.join()
+            left.sendall(data[:-1])
+            left.shutdown(socket.SHUT_WR)
+            with self.assertRaises(framing.FramingError):
+                framing.recv_message(right)
+
+
+class TestHandleConnection(unittest.IsolatedAsyncioTestCase):
+    """两个带 id 的请求在同一连接上并发处理，响应按完成顺序写回"""
+
+    async def asyncSetUp(self):
+        self.release = threading.Event()
+        self.executors = {
+            'control': ThreadPoolExecutor(max_workers=1),
+            'query': ThreadPoolExecutor(max_workers=1)
+        }
+
+        def dispatch(request):
+            if request['action'] == 'execute_test':
+                # 客户端收到查询请求的响应后才返回；请求被串行处理时测试会超时
+                self.release.wait(10)
+                return {'status': 'success', 'size': len(request['command'])}
+            return {'status': 'success', 'action': request['action']}
+
+        agent = SimpleNamespace(
+            logger=logging.getLogger(__name__),
+            executors=self.executors,
+            action_lanes={'execute_test': 'control', 'get_logs': 'query'},
+            dispatch=dispatch
+        )
+        self.server = await asyncio.start_server(
+            lambda reader, writer: server.TestServer.handle_connection(agent, reader, writer), '127.0.0.1', 0
+        )
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def asyncTearDown(self):
+        self.release.set()
+        self.server.close()
+        await self.server.wait_closed()
+        for executor in self.executors.values():
+            executor.shutdown()
+
+    async def test_interleaved_requests(self):
+        reader, writer = await asyncio.open_connection('127.0.0.1', self.port)
+        second_request = framing.encode_message({'action': 'get_logs', 'id': 2})
+        data = framing.encode_message({**LARGE_PAYLOAD, 'id': 1}) + second_request
+        # 两条请求连续写入，第二条的长度头跨越两次写入的边界
+        split = len(data) - len(second_request) + 4
+        writer.write(data[:split])
+        await writer.drain()
+        writer.write(data[split:])
+        await writer.drain()
+
+        first = await asyncio.wait_for(framing.read_message(reader), 5)
+        self.release.set()
+        second = await asyncio.wait_for(framing.read_message(reader), 10)
+        self.assertEqual(first, {'id': 2, 'response': {'status': 'success', 'action': 'get_logs'}})
+        self.assertEqual(second, {'id': 1, 'response': {'status': 'success', 'size': len(LARGE_PAYLOAD['command'])}})
+
+        # 不带 id 的请求按顺序处理，响应不带 id
+        await framing.write_message(writer, {'action': 'get_logs'})
+        self.assertEqual(await asyncio.wait_for(framing.read_message(reader), 10),
+                         {'status': 'success', 'action': 'get_logs'})
+        writer.close()
+        await writer.wait_closed()
+
+
+if __name__ == '__main__':
+    unittest.main()
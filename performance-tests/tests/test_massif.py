@@ -0,0 +1,64 @@
+import os
+import unittest
+
+from utils import massif
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+def load_lines():
+    with open(os.path.join(FIXTURES, 'massif.out')) as f:
+        return f.readlines()
+
+
+class TestParse(unittest.TestCase):
+    def test_header(self):
+        profile = massif.read_output(os.path.join(FIXTURES, 'massif.out'))
+        self.assertEqual(profile['cmd'], './app --flag')
+        self.assertEqual(profile['time_unit'], 'ms')
+
+    def test_series(self):
+        profile = massif.parse(load_lines())
+        self.assertEqual(
+            [(p['time'], p['heap'], p['extra'], p['total']) for p in profile['series']],
+            [(0, 0, 0, 0), (10.5, 1000, 24, 1024), (20, 3000, 40, 3040), (30, 500, 8, 508)]
+        )
+
+    def test_peak(self):
+        profile = massif.parse(load_lines())
+        self.assertEqual(profile['peak'], {
+            'snapshot': 2, 'time': 20, 'heap': 3000, 'extra': 40, 'stacks': 0, 'total': 3040
+        })
+        # 只取峰值快照的顶层节点，按字节数排序；低于阈值的合并节点没有位置
+        self.assertEqual(
+            [(s['fn'], s['location'], s['bytes']) for s in profile['top_sites']],
+            [('make_table', 'app.c:20', 2000), ('make_buffer', 'app.c:12', 900),
+             ("in 3 places, all below massif's threshold (1.00%)", None, 100)]
+        )
+        self.assertAlmostEqual(profile['top_sites'][0]['pct'], 2000 / 3000 * 100)
+
+    def test_top(self):
+        profile = massif.parse(load_lines(), top=1)
+        self.assertEqual([s['fn'] for s in profile['top_sites']], ['make_table'])
+
+    def test_unmarked_peak(self):
+        # 没有标记峰值快照时取堆最大的详细快照
+        lines = [line.replace('heap_tree=peak', 'heap_tree=detailed') for line in load_lines()]
+        profile = massif.parse(lines)
+        self.assertEqual(profile['peak']['snapshot'], 2)
+        self.assertEqual(profile['top_sites'][0]['bytes'], 2000)
+        # 只有一个详细快照时就是它
+        profile = massif.parse(lines[:lines.index('snapshot=2\n') - 1])
+        self.assertEqual(profile['peak']['snapshot'], 1)
+        self.assertEqual([s['fn'] for s in profile['top_sites']], ['make_buffer', 'make_table'])
+
+    def test_no_detailed_snapshot(self):
+        lines = load_lines()
+        profile = massif.parse(lines[:lines.index('snapshot=1\n') - 1])
+        self.assertEqual(len(profile['series']), 1)
+        self.assertIsNone(profile['peak'])
+        self.assertEqual(profile['top_sites'], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import os
+import unittest
+
+from utils import perf_stat
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+class TestParseOutput(unittest.TestCase):
+    def setUp(self):
+        self.result = perf_stat.read_output(os.path.join(FIXTURES, 'perf_stat.csv'))
+
+    def test_counters(self):
+        counters = self.result['counters']
+        # 混合架构上按 PMU 分行输出的同一事件累加，某个 PMU 未计数不影响其他 PMU 的值
+        self.assertEqual(counters['cycles'], 1800000)
+        self.assertEqual(counters['instructions'], 2400000)
+        self.assertEqual(counters['task-clock'], 12.5)
+        self.assertEqual(counters['branches'], 1000)
+        # <not counted> / <not supported> 记为 None
+        self.assertIsNone(counters['cache-misses'])
+        self.assertIsNone(counters['LLC-loads'])
+        self.assertIsNone(counters['LLC-load-misses'])
+
+    def test_running_pct(self):
+        running_pct = self.result['running_pct']
+        # 复用的事件取各 PMU 中最小的运行占比
+        self.assertEqual(running_pct['cycles'], 50.0)
+        self.assertEqual(running_pct['cache-references'], 80.0)
+        self.assertEqual(running_pct['instructions'], 100.0)
+        self.assertNotIn('cache-misses', running_pct)
+
+    def test_derived(self):
+        derived = self.result['derived']
+        self.assertAlmostEqual(derived['ipc'], 2400000 / 1800000)
+        self.assertAlmostEqual(derived['branch_miss_rate'], 5.0)
+        self.assertAlmostEqual(derived['branch_mpki'], 50 / 2400000 * 1000)
+        self.assertIsNone(derived['cache_miss_rate'])
+        self.assertIsNone(derived['cache_mpki'])
+        self.assertIsNone(derived['llc_miss_rate'])
+
+    def test_not_counted_after_value(self):
+        result = perf_stat.parse_output([
+            '100,,cpu_core/cycles/,1000,100.00,,',
+            '<not counted>,,cpu_atom/cycles/,0,0.00,,'
+        ])
+        self.assertEqual(result['counters']['cycles'], 100)
+
+    def test_short_and_comment_lines(self):
+        result = perf_stat.parse_output(['# comment', '', 'garbage', '5,,page-faults'])
+        self.assertEqual(result['counters'], {'page-faults': 5})
+        self.assertEqual(result['running_pct'], {})
+
+
+if __name__ == '__main__':
+    unittest.main()
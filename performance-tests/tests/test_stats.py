@@ -0,0 +1,127 @@
+import math
+import unittest
+
+from utils import stats
+from utils.pipeline import IterationPlan
+
+
+class TestTCritical(unittest.TestCase):
+    def test_lookup(self):
+        cases = [
+            # (自由度, 置信度, 期望值)
+            (1, 0.95, 12.706),
+            (2, 0.95, 4.303),
+            (10, 0.90, 1.812),
+            (30, 0.99, 2.750),
+            # 不支持的置信度按 0.95 处理
+            (5, 0.80, 2.571),
+            # 超过 30 时在表尾与正态分位数之间插值，scipy: t.ppf(0.975, 60) = 2.0003
+            (60, 0.95, 2.001),
+            (3000, 0.95, 1.961)
+        ]
+        for df, confidence, expected in cases:
+            with self.subTest(df=df, confidence=confidence):
+                self.assertAlmostEqual(stats.t_critical(df, confidence), expected, places=3)
+
+    def test_no_degrees_of_freedom(self):
+        self.assertEqual(stats.t_critical(0), math.inf)
+
+
+class TestMannWhitneyU(unittest.TestCase):
+    def test_known_values(self):
+        # 期望值来自 scipy.stats.mannwhitneyu(a, b, method='asymptotic')
+        cases = [
+            ([19, 22, 16, 29, 24], [20, 11, 17, 12], 17.0, 0.111347),
+            ([1, 2, 3], [4, 5, 6], 0.0, 0.080856),
+            ([4, 5, 6], [1, 2, 3], 9.0, 0.080856),
+            ([1, 2, 2, 3], [2, 3, 4, 5], 2.5, 0.136661)
+        ]
+        for a, b, expected_u, expected_p in cases:
+            with self.subTest(a=a, b=b):
+                u, p = stats.mann_whitney_u(a, b)
+                self.assertEqual(u, expected_u)
+                self.assertAlmostEqual(p, expected_p, places=5)
+
+    def test_all_ties(self):
+        self.assertEqual(stats.mann_whitney_u([5, 5, 5], [5, 5]), (3.0, 1.0))
+
+    def test_empty_sample(self):
+        self.assertEqual(stats.mann_whitney_u([], [1, 2]), (None, None))
+        self.assertEqual(stats.mann_whitney_u([1, 2], []), (None, None))
+
+
+class TestPredictionTest(unittest.TestCase):
+    def test_interval(self):
+        # 均值 12，标准差 2，t(2) = 4.303，半宽 4.303 * 2 * sqrt(1 + 1/3)
+        low, high = stats.prediction_test(20, [10, 12, 14])
+        half_width = 4.303 * 2 * math.sqrt(4 / 3)
+        self.assertAlmostEqual(low, 12 - half_width)
+        self.assertAlmostEqual(high, 12 + half_width)
+
+    def test_too_few_samples(self):
+        self.assertIsNone(stats.prediction_test(1, []))
+        self.assertIsNone(stats.prediction_test(1, [1.0]))
+
+    def test_identical_samples(self):
+        self.assertEqual(stats.prediction_test(1, [2.0, 2.0, 2.0]), (2.0, 2.0))
+
+
+class TestSummarize(unittest.TestCase):
+    def test_single_value(self):
+        summary = stats.summarize([3.0])
+        self.assertEqual(summary['stddev'], 0.0)
+        self.assertIsNone(summary['ci_low'])
+        self.assertIsNone(summary['ci_pct'])
+
+    def test_interval(self):
+        summary = stats.summarize([10, 12, 14])
+        half_width = 4.303 * 2 / math.sqrt(3)
+        self.assertEqual(summary['median'], 12)
+        self.assertAlmostEqual(summary['ci_high'], 12 + half_width)
+        self.assertAlmostEqual(summary['ci_pct'], half_width / 12 * 100)
+
+    def test_empty(self):
+        self.assertIsNone(stats.summarize([]))
+
+
+class TestIterationPlan(unittest.TestCase):
+    def test_fixed(self):
+        plan = IterationPlan(iterations=3)
+        self.assertEqual(plan.mode, 'fixed')
+        self.assertFalse(plan.done([1.0, 1.0]))
+        self.assertTrue(plan.done([1.0, 1.0, 1.0]))
+
+    def test_adaptive(self):
+        plan = IterationPlan(target_ci_pct=5, min_iterations=5, max_iterations=8)
+        noisy = [1.0, 2.0] * 4
+        cases = [
+            # 未达到最少次数时即使区间已经足够窄也继续
+            ([1.0] * 4, False),
+            ([1.0] * 5, True),
+            ([1.0, 1.01, 0.99, 1.0, 1.02], True),
+            (noisy[:5], False),
+            (noisy[:7], False),
+            # 达到最多次数时停止
+            (noisy, True)
+        ]
+        for wall_times, expected in cases:
+            with self.subTest(wall_times=wall_times):
+                self.assertEqual(plan.done(wall_times), expected)
+
+    def test_min_iterations_floor(self):
+        # 至少两次才能计算置信区间
+        plan = IterationPlan(target_ci_pct=5, min_iterations=1)
+        self.assertEqual(plan.min_iterations, 2)
+        self.assertFalse(plan.done([1.0]))
+        self.assertTrue(plan.done([1.0, 1.0]))
+
+    def test_from_parameters(self):
+        self.assertIsNone(IterationPlan.from_parameters(None))
+        self.assertIsNone(IterationPlan.from_parameters({'min_iterations': 3}))
+        plan = IterationPlan.from_parameters({'target_ci_pct': '2.5', 'max_iterations': 20})
+        self.assertEqual(plan.mode, 'adaptive')
+        self.assertEqual((plan.min_iterations, plan.max_iterations), (5, 20))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from utils import valgrind_xml
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+class TestProcess(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.text_file = os.path.join(self.tmpdir, 'valgrind_report.txt')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def process(self, xml_file):
+        return valgrind_xml.process(xml_file, self.text_file)
+
+    def test_summary(self):
+        summary = self.process(os.path.join(FIXTURES, 'valgrind.xml'))
+        self.assertEqual(summary['pid'], '1234')
+        self.assertEqual(summary['tool'], 'memcheck')
+        self.assertEqual(summary['command'], './app --flag')
+        self.assertEqual(summary['status'], 'FINISHED')
+        self.assertFalse(summary['truncated'])
+        # errorcounts 中 InvalidRead 出现 3 次
+        self.assertEqual(summary['unique_errors'], 5)
+        self.assertEqual(summary['errors'], 7)
+        self.assertEqual(summary['by_kind']['InvalidRead'], {'count': 3, 'bytes': 0, 'blocks': 0})
+        self.assertEqual(summary['by_kind']['Leak_DefinitelyLost'], {'count': 2, 'bytes': 150, 'blocks': 3})
+
+    def test_leak_totals(self):
+        summary = self.process(os.path.join(FIXTURES, 'valgrind.xml'))
+        self.assertEqual(summary['leaks'], {
+            'definitely_lost': {'bytes': 150, 'blocks': 3},
+            'indirectly_lost': {'bytes': 24, 'blocks': 1},
+            'possibly_lost': {'bytes': 0, 'blocks': 0},
+            'still_reachable': {'bytes': 8, 'blocks': 1}
+        })
+
+    def test_groups(self):
+        summary = self.process(os.path.join(FIXTURES, 'valgrind.xml'))
+        # 相同调用栈的泄漏合并，按泄漏字节数和次数排序
+        self.assertEqual(summary['total_groups'], 4)
+        self.assertEqual(
+            [(g['kind'], g['count'], g['bytes']) for g in summary['groups']],
+            [('Leak_DefinitelyLost', 2, 150), ('Leak_IndirectlyLost', 1, 24),
+             ('Leak_StillReachable', 1, 8), ('InvalidRead', 3, 0)]
+        )
+        # 只保留第一个调用栈，辅助调用栈不参与去重
+        invalid_read = summary['groups'][-1]
+        self.assertEqual([f['fn'] for f in invalid_read['frames']], ['read_past_end', 'main'])
+        self.assertEqual(valgrind_xml.frame_label(invalid_read['frames'][0]), 'read_past_end (app.c:10)')
+        still_reachable = summary['groups'][2]
+        self.assertEqual(valgrind_xml.frame_label(still_reachable['frames'][0]), '0x401000 (in /tmp/app)')
+
+    def test_text_report(self):
+        self.process(os.path.join(FIXTURES, 'valgrind.xml'))
+        with open(self.text_file) as f:
+            report = f.read()
+        self.assertIn('Command: ./app --flag\n', report)
+        self.assertIn('Status: FINISHED in 00:00:00:01.200\n', report)
+        self.assertIn('==ERROR== Invalid read of size 4\n', report)
+        self.assertIn('==ERROR==    at leak_fn (app.c:20)\n', report)
+        self.assertEqual(report.count('==ERROR== Leak_DefinitelyLost\n'), 2)
+
+    def test_truncated(self):
+        # valgrind 被中途终止时 XML 没有结束，已解析的错误照常统计
+        with open(os.path.join(FIXTURES, 'valgrind.xml')) as f:
+            content = f.read()
+        truncated = os.path.join(self.tmpdir, 'truncated.xml')
+        with open(truncated, 'w') as f:
+            f.write(content[:content.index('<unique>0x3</unique>')])
+        summary = self.process(truncated)
+        self.assertTrue(summary['truncated'])
+        self.assertEqual(summary['unique_errors'], 2)
+        self.assertEqual(summary['leaks']['definitely_lost'], {'bytes': 100, 'blocks': 1})
+
+    def test_no_errors(self):
+        clean = os.path.join(self.tmpdir, 'clean.xml')
+        with open(clean, 'w') as f:
+            f.write('<?xml version="1.0"?>\n<valgrindoutput><pid>1</pid><tool>memcheck</tool></valgrindoutput>\n')
+        summary = self.process(clean)
+        self.assertEqual(summary['errors'], 0)
+        self.assertEqual(summary['groups'], [])
+        with open(self.text_file) as f:
+            self.assertIn('No memory leaks or errors detected.', f.read())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,164 @@
+import contextlib
+import hashlib
+import json
+import os
+import re
+import subprocess
+
+from utils import artifact_store
+
+# perf report -F overhead,dso,sym 的行，如 "    45.32%  prog  [.] hot_loop"
+REPORT_LINE_RE = re.compile(r'^\s*([\d.]+)%\s+(\S+)\s+\[(.)\]\s+(.+?)\s*$')
+# perf annotate --stdio 的指令行，如 "   12.50 :   40112a:       mov    %eax,%ebx"
+ANNOTATE_LINE_RE = re.compile(r'^\s*([\d.]+)?\s*:\s*(?:([0-9a-f]+):\s*)?(.*)$')
+# 标题行中的样本数，如 "... for cycles:u (123 samples, percent: local period)"
+SAMPLES_RE = re.compile(r'\((\d+) samples')
+
+CACHE_DIR = 'annotate'
+HOT_FILE = 'hot_symbols.json'
+MAX_LINES = 5000   # 单个符号保留的反汇编行数上限
+HOT_LINES = 10     # 每个符号标出的最热指令行数
+
+
+def _run(args, timeout):
+    completed = subprocess.run(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=timeout)
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip()[-500:] or f"exit code {completed.returncode}")
+    return completed.stdout
+
+
+def parse_report(lines, limit):
+    """解析 perf report 的自身开销排行，只保留用户态符号（[.]），内核符号没有 vmlinux 无法反汇编"""
+    symbols = []
+    for line in lines:
+        match = REPORT_LINE_RE.match(line)
+        if not match or match.group(3) != '.' or match.group(4).startswith('0x'):
+            continue
+        symbols.append({
+            'symbol': match.group(4),
+            'dso': match.group(2),
+            'overhead': float(match.group(1))
+        })
+        if len(symbols) >= limit:
+            break
+    return symbols
+
+
+def parse_annotate(lines):
+    """解析 perf annotate --stdio 输出，返回每行的样本百分比和最热的指令行"""
+    samples = None
+    rows = []
+    truncated = False
+    for line in lines:
+        if samples is None and 'Percent' in line:
+            found = SAMPLES_RE.search(line)
+            samples = int(found.group(1)) if found else None
+            continue
+        match = ANNOTATE_LINE_RE.match(line)
+        if not match or line.startswith('-'):
+            continue
+        pct, addr, text = match.groups()
+        if not text.strip() and pct is None:
+            continue
+        if len(rows) >= MAX_LINES:
+            truncated = True
+            break
+        rows.append({
+            'pct': float(pct) if pct is not None else None,
+            'addr': addr,
+            'text': text.rstrip()
+        })
+    hot = sorted(
+        (i for i, row in enumerate(rows) if row['pct']),
+        key=lambda i: rows[i]['pct'], reverse=True
+    )[:HOT_LINES]
+    return {'samples': samples, 'lines': rows, 'hot_lines': hot, 'truncated': truncated}
+
+
+def _cache_file(step_dir, symbol):
+    # 符号名可能很长或包含 / 等字符，文件名用摘要
+    digest = hashlib.sha1(symbol.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(step_dir, CACHE_DIR, f"{digest}.json")
+
+
+def _write_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def _read_json(path):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class Annotator:
+    """按需生成某个步骤 perf.data 的符号注解，结果缓存在步骤目录的 annotate/ 下
+
+    perf.data 可能已经压缩，一次请求中只在缓存未命中时解压一次到临时文件。
+    """
+
+    def __init__(self, perf_data, top=10, timeout=120):
+        self.perf_data = perf_data
+        self.step_dir = os.path.dirname(perf_data)
+        self.top = top
+        self.timeout = timeout
+
+    def hot_symbols(self, perf_path):
+        """自身开销最高的 top 个用户态符号，perf_path() 返回可以直接读取的 perf.data 路径"""
+        hot_file = os.path.join(self.step_dir, CACHE_DIR, HOT_FILE)
+        cached = _read_json(hot_file)
+        if cached is not None and cached['limit'] >= self.top:
+            return cached['symbols'][:self.top]
+        output = _run([
+            'perf', 'report', '-i', perf_path(), '--stdio', '--no-children', '-q',
+            '--sort', 'dso,sym', '-F', 'overhead,dso,sym'
+        ], self.timeout)
+        symbols = parse_report(output.splitlines(), self.top)
+        _write_json(hot_file, {'limit': self.top, 'symbols': symbols})
+        return symbols
+
+    def annotate(self, symbol, perf_path, dso=None):
+        cache_file = _cache_file(self.step_dir, symbol)
+        cached = _read_json(cache_file)
+        if cached is not None:
+            return cached
+        args = ['perf', 'annotate', '-i', perf_path(), '--stdio', '--no-source']
+        if dso:
+            # 同名符号可能出现在多个 DSO 中，只注解热点列表中的那个
+            args += ['--dsos', dso]
+        output = _run(args + [symbol], self.timeout)
+        result = {'symbol': symbol, 'dso': dso, **parse_annotate(output.splitlines())}
+        _write_json(cache_file, result)
+        return result
+
+    def lookup(self, symbol=None, allow_any=False):
+        """返回热点符号列表和一个符号的注解
+
+        symbol 为空时注解最热的符号；不在热点列表中的符号需要 allow_any，
+        避免对大量冷符号逐个反汇编。
+        """
+        with contextlib.ExitStack() as stack:
+            materialized = []
+
+            def perf_path():
+                if not materialized:
+                    materialized.append(stack.enter_context(artifact_store.materialize(self.perf_data)))
+                return materialized[0]
+
+            symbols = self.hot_symbols(perf_path)
+            dsos = {item['symbol']: item['dso'] for item in symbols}
+            if symbol is None:
+                symbol = symbols[0]['symbol'] if symbols else None
+            elif symbol not in dsos and not allow_any:
+                raise ValueError(f"{symbol} is not among the top {self.top} hot symbols")
+            annotation = self.annotate(symbol, perf_path, dsos.get(symbol)) if symbol else None
+
+        for item in symbols:
+            item['cached'] = os.path.exists(_cache_file(self.step_dir, item['symbol']))
+        return {'symbols': symbols, 'annotation': annotation}
@@ -0,0 +1,122 @@
+import contextlib
+import gzip
+import io
+import os
+import re
+import shutil
+import tempfile
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# 有 zstandard 时用 zstd，否则用标准库 gzip
+SUFFIX = '.zst' if zstandard is not None else '.gz'
+SUFFIXES = ('.zst', '.gz')
+
+# 生成完成后很少再读取的大文件，压缩保存
+COMPRESSIBLE = (
+    'perf.data', 'perf.folded', 'perf_report.txt', 'perf_annotate.txt',
+    'valgrind.log', 'valgrind.xml', 'memcheck_report.txt', 'callgrind.out'
+)
+# 连续分析模式下 perf record --switch-output 切出的块
+COMPRESSIBLE_RE = re.compile(r'^perf\.data\.\d+$')
+
+CHUNK_SIZE = 1024 * 1024
+# 小文件压缩收益不大，保持原样
+MIN_SIZE = 4096
+
+
+def resolve(path):
+    """返回实际存在的文件路径（原文件或压缩后的文件），都不存在时返回 None"""
+    if os.path.exists(path):
+        return path
+    for suffix in SUFFIXES:
+        if os.path.exists(path + suffix):
+            return path + suffix
+    return None
+
+
+def exists(path):
+    return resolve(path) is not None
+
+
+def open_artifact(path, mode='rb'):
+    """打开产物文件，压缩过的文件边读边解压；mode 为 'r' 时按 UTF-8 文本读取"""
+    actual = resolve(path)
+    if actual is None:
+        raise FileNotFoundError(path)
+    if actual.endswith('.zst'):
+        if zstandard is None:
+            raise RuntimeError(f"zstandard is required to read {actual}")
+        raw = open(actual, 'rb')
+        stream = zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+        binary = io.BufferedReader(stream, CHUNK_SIZE)
+    elif actual.endswith('.gz'):
+        binary = gzip.open(actual, 'rb')
+    else:
+        binary = open(actual, 'rb')
+    if 'b' in mode:
+        return binary
+    return io.TextIOWrapper(binary, encoding='utf-8', errors='replace')
+
+
+def iter_chunks(path, chunk_size=CHUNK_SIZE):
+    """按块产出解压后的内容，用于 HTTP 流式返回"""
+    with open_artifact(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+@contextlib.contextmanager
+def materialize(path):
+    """需要真实文件路径的工具（如 perf report -i）使用：压缩过的文件解压到临时文件"""
+    actual = resolve(path)
+    if actual is None:
+        raise FileNotFoundError(path)
+    if actual == path:
+        yield path
+        return
+    fd, tmp = tempfile.mkstemp(prefix='artifact_', suffix='_' + os.path.basename(path))
+    try:
+        with os.fdopen(fd, 'wb') as out, open_artifact(actual, 'rb') as src:
+            shutil.copyfileobj(src, out, CHUNK_SIZE)
+        yield tmp
+    finally:
+        os.unlink(tmp)
+
+
+def compress_file(path):
+    """流式压缩单个文件，写完后替换原文件，返回 (原大小, 压缩后大小)"""
+    target = path + SUFFIX
+    tmp = target + '.tmp'
+    size = os.path.getsize(path)
+    with open(path, 'rb') as src, open(tmp, 'wb') as raw:
+        if zstandard is not None:
+            with zstandard.ZstdCompressor(level=3, threads=-1).stream_writer(raw, closefd=False) as out:
+                shutil.copyfileobj(src, out, CHUNK_SIZE)
+        else:
+            with gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=6) as out:
+                shutil.copyfileobj(src, out, CHUNK_SIZE)
+    os.replace(tmp, target)
+    os.unlink(path)
+    return size, os.path.getsize(target)
+
+
+def compress_tree(directory, names=COMPRESSIBLE):
+    """压缩目录下所有可压缩的产物，返回统计信息"""
+    stats = {'files': 0, 'bytes_before': 0, 'bytes_after': 0}
+    for root, _, files in os.walk(directory):
+        for name in files:
+            path = os.path.join(root, name)
+            if (name not in names and not COMPRESSIBLE_RE.match(name)) or os.path.getsize(path) < MIN_SIZE:
+                continue
+            before, after = compress_file(path)
+            stats['files'] += 1
+            stats['bytes_before'] += before
+            stats['bytes_after'] += after
+    return stats
@@ -0,0 +1,249 @@
+import json
+import re
+import subprocess
+
+from utils import artifact_store
+
+# 名称压缩: "(12) main" 定义编号，之后用 "(12)" 引用
+COMPRESSED_RE = re.compile(r'^\((\d+)\)(?: (.*))?$')
+# 各说明行使用的名称表，cfi/cfl 与 fl/fi/fe 共用文件名表
+NAME_TABLES = {
+    'ob': 'ob', 'cob': 'ob',
+    'fl': 'fl', 'fi': 'fl', 'fe': 'fl', 'cfi': 'fl', 'cfl': 'fl',
+    'fn': 'fn', 'cfn': 'fn'
+}
+
+TOP_FUNCTIONS = 20     # profiling_results 中的函数排行条数
+TABLE_FUNCTIONS = 200  # JSON 中的函数表条数
+NODE_THRESHOLD = 0.5   # 调用图只保留包含成本不低于总成本该百分比的函数
+EDGE_THRESHOLD = 0.1   # 以及成本不低于该百分比的调用边
+MAX_NODES = 60         # 调用图的节点数上限，保证 SVG 大小和 dot 布局时间有界
+MIN_NODES = 10         # 成本分散、没有函数超过阈值时至少保留的节点数
+
+
+def callgrind_command(cmd, output):
+    return f"valgrind --tool=callgrind --callgrind-out-file={output} {cmd}"
+
+
+def parse(lines, event=None):
+    """解析 callgrind.out，返回各函数的自身/包含成本和调用边
+
+    只统计一个事件，默认取 events: 中的第一个（通常是 Ir）。函数以 (目标文件, 函数名) 区分。
+    包含成本为自身成本加上调用其他函数的成本，直接递归不重复计算。
+    """
+    header = {'cmd': None, 'events': [], 'positions': ['line'], 'totals': None}
+    names = {'ob': {}, 'fl': {}, 'fn': {}}
+    functions = {}
+    calls = {}
+    state = {'ob': None, 'fl': None, 'fn': None, 'cob': None, 'cfn': None}
+    current = None
+    pending_call = None
+    index = 0
+
+    def resolve(spec, value):
+        match = COMPRESSED_RE.match(value)
+        if not match:
+            return value
+        table = names[NAME_TABLES[spec]]
+        if match.group(2) is not None:
+            table[match.group(1)] = match.group(2)
+        return table.get(match.group(1), value)
+
+    def function(key, file=None):
+        entry = functions.get(key)
+        if entry is None:
+            entry = functions[key] = {
+                'name': key[1], 'object': key[0], 'file': file,
+                'self': 0, 'inclusive': 0, 'calls': 0
+            }
+        elif file and not entry['file']:
+            entry['file'] = file
+        return entry
+
+    for line in lines:
+        line = line.rstrip('\n')
+        if not line or line[0] == '#':
+            continue
+        first = line[0]
+        if first.isdigit() or first in '+-*':
+            # 成本行: 位置列之后是各事件的成本，缺省为 0
+            fields = line.split()
+            costs = fields[len(header['positions']):]
+            value = int(costs[index]) if len(costs) > index else 0
+            if pending_call is not None:
+                callee, count = pending_call
+                edge = calls.setdefault((current, callee), [0, 0])
+                edge[0] += value
+                edge[1] += count
+                functions[callee]['calls'] += count
+                pending_call = None
+            elif current is not None:
+                functions[current]['self'] += value
+            continue
+
+        spec, sep, value = line.partition('=')
+        if sep and spec in NAME_TABLES:
+            name = resolve(spec, value)
+            if spec == 'fn':
+                state['fn'] = name
+                current = (state['ob'], name)
+                function(current, state['fl'])
+                state['cob'] = state['cfn'] = None
+            elif spec in ('ob', 'fl', 'cob', 'cfn'):
+                state[spec] = name
+            continue
+        if sep and spec == 'calls':
+            callee = (state['cob'] or state['ob'], state['cfn'])
+            function(callee)
+            pending_call = (callee, int(value.split()[0]))
+            state['cob'] = state['cfn'] = None
+            continue
+
+        key, sep, value = line.partition(':')
+        if not sep:
+            continue
+        value = value.strip()
+        if key == 'events':
+            header['events'] = value.split()
+            if event in header['events']:
+                index = header['events'].index(event)
+        elif key == 'positions':
+            header['positions'] = value.split()
+        elif key in ('totals', 'summary') and header['totals'] is None:
+            costs = value.split()
+            header['totals'] = int(costs[index]) if len(costs) > index else 0
+        elif key == 'cmd':
+            header['cmd'] = value
+
+    for (caller, callee), (cost, _) in calls.items():
+        if caller is not None and caller != callee:
+            functions[caller]['inclusive'] += cost
+    total = header['totals'] or sum(f['self'] for f in functions.values())
+    for entry in functions.values():
+        # 间接递归时包含成本可能重复计算，不超过总成本
+        entry['inclusive'] = min(entry['inclusive'] + entry['self'], total) if total else 0
+
+    events = header['events'] or ['Ir']
+    return {
+        'cmd': header['cmd'],
+        'events': events,
+        'event': events[index] if index < len(events) else events[0],
+        'total': total,
+        'functions': functions,
+        'calls': calls
+    }
+
+
+def _row(entry, total):
+    return {
+        'name': entry['name'],
+        'file': entry['file'],
+        'object': entry['object'],
+        'self': entry['self'],
+        'inclusive': entry['inclusive'],
+        'self_pct': entry['self'] / total * 100 if total else 0,
+        'inclusive_pct': entry['inclusive'] / total * 100 if total else 0,
+        'calls': entry['calls']
+    }
+
+
+def top_functions(profile, limit=TOP_FUNCTIONS, key='self'):
+    ranked = sorted(profile['functions'].values(), key=lambda f: f[key], reverse=True)
+    return [_row(entry, profile['total']) for entry in ranked[:limit]]
+
+
+def prune(profile, node_threshold=NODE_THRESHOLD, edge_threshold=EDGE_THRESHOLD, max_nodes=MAX_NODES):
+    """按成本阈值裁剪调用图，返回 {'nodes', 'edges', 'dropped_nodes'}"""
+    total = profile['total']
+    if not total:
+        return {'nodes': [], 'edges': [], 'dropped_nodes': 0}
+    ranked = sorted(profile['functions'].items(), key=lambda item: item[1]['inclusive'], reverse=True)
+    kept = [item for item in ranked[:max_nodes] if item[1]['inclusive'] * 100 >= node_threshold * total]
+    if len(kept) < MIN_NODES:
+        # 成本很分散时没有函数超过阈值，至少保留包含成本最高的几个
+        kept = ranked[:MIN_NODES]
+    ids = {key: f"n{i}" for i, (key, _) in enumerate(kept)}
+
+    nodes = [{'id': ids[key], **_row(entry, total)} for key, entry in kept]
+    edges = []
+    for (caller, callee), (cost, count) in profile['calls'].items():
+        if caller in ids and callee in ids and cost * 100 >= edge_threshold * total:
+            edges.append({
+                'source': ids[caller],
+                'target': ids[callee],
+                'cost': cost,
+                'pct': cost / total * 100,
+                'calls': count
+            })
+    edges.sort(key=lambda e: e['cost'], reverse=True)
+    return {'nodes': nodes, 'edges': edges, 'dropped_nodes': len(profile['functions']) - len(nodes)}
+
+
+def summarize(profile, top=TABLE_FUNCTIONS):
+    """界面使用的 JSON：函数成本表和裁剪后的调用图"""
+    return {
+        'cmd': profile['cmd'],
+        'events': profile['events'],
+        'event': profile['event'],
+        'total': profile['total'],
+        'function_count': len(profile['functions']),
+        'by_self': top_functions(profile, top, 'self'),
+        'by_inclusive': top_functions(profile, top, 'inclusive'),
+        'graph': prune(profile)
+    }
+
+
+def read_output(path, event=None):
+    with artifact_store.open_artifact(path, 'r') as f:
+        return parse(f, event)
+
+
+def write_json(summary, path):
+    with open(path, 'w') as f:
+        json.dump(summary, f)
+
+
+def _color(fraction):
+    """与 gprof2dot 类似的配色：成本占比从低到高由蓝到红"""
+    fraction = max(0.0, min(fraction, 1.0)) ** 0.5
+    hue = (1 - fraction) * 0.66
+    return f"{hue:.3f} 0.85 0.9"
+
+
+def _quote(text):
+    return '"' + str(text).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+
+
+def to_dot(summary):
+    """裁剪后的调用图转为 DOT 文本"""
+    lines = [
+        'digraph callgrind {',
+        '  graph [ranksep=0.25, fontname=Arial, nodesep=0.125];',
+        '  node [fontname=Arial, shape=box, style="filled,rounded", fontcolor=white, fontsize=10];',
+        '  edge [fontname=Arial, fontsize=9];'
+    ]
+    event = summary['event']
+    for node in summary['graph']['nodes']:
+        name = node['name'] if len(node['name']) <= 60 else node['name'][:57] + '...'
+        label = f"{name}\n{node['inclusive_pct']:.2f}%\n({node['self_pct']:.2f}%)\n{node['calls']}×"
+        tooltip = f"{event} self {node['self']} / inclusive {node['inclusive']}"
+        color = _color(node['inclusive_pct'] / 100)
+        lines.append(f"  {node['id']} [label={_quote(label)}, color={_quote(color)}, tooltip={_quote(tooltip)}];")
+    for edge in summary['graph']['edges']:
+        label = f"{edge['pct']:.2f}%\n{edge['calls']}×"
+        width = 1 + 4 * min(edge['pct'] / 100, 1) ** 0.5
+        color = _color(edge['pct'] / 100)
+        lines.append(f"  {edge['source']} -> {edge['target']} [label={_quote(label)}, "
+                     f"color={_quote(color)}, penwidth={width:.2f}];")
+    lines.append('}')
+    return '\n'.join(lines) + '\n'
+
+
+def render_svg(summary, svg_path, timeout=60):
+    """用 dot 布局裁剪后的调用图，节点数有上限，布局时间和 SVG 大小都有界"""
+    completed = subprocess.run(
+        ['dot', '-Tsvg', '-o', svg_path], input=to_dot(summary),
+        text=True, stderr=subprocess.PIPE, timeout=timeout
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip()[-500:] or 'dot failed')
@@ -0,0 +1,173 @@
+import gzip
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+READ_CHUNK = 64 * 1024
+HARNESS = 'HARNESS'
+
+logger = logging.getLogger('TestServer')
+
+
+class OutputCapture:
+    """后台读取子进程 stdout/stderr 并批量写入 output.log
+
+    读取线程只负责把管道读空、按行切分并打时间戳，写入线程按 flush_interval
+    批量落盘，被测程序不会因为日志写入而阻塞。超过速率限制或总大小上限的行
+    写入 gzip 压缩的溢出文件；超长行在 output.log 中截断，完整内容进入溢出文件。
+    """
+
+    def __init__(self, result_dir, flush_interval=0.2, rate_limit=1024 * 1024,
+                 max_log_bytes=64 * 1024 * 1024, max_line_bytes=4096, on_flush=None):
+        self.log_path = os.path.join(result_dir, 'output.log')
+        self.overflow_path = os.path.join(result_dir, 'output.overflow.log.gz')
+        self.flush_interval = flush_interval
+        self.rate_limit = rate_limit
+        self.max_log_bytes = max_log_bytes
+        self.max_line_bytes = max_line_bytes
+        # on_flush(lines, start_offset, end_offset) 在每批写入后调用，偏移为 output.log 的字节位置
+        self.on_flush = on_flush
+
+        self.queue = deque()
+        self.log_file = open(self.log_path, 'ab')
+        self.log_bytes = self.log_file.tell()
+        self.overflow_file = None
+        # 令牌桶：容量为 2 秒的额度
+        self.tokens = float(rate_limit) * 2
+        self.last_refill = time.monotonic()
+        self.spilling = False
+        self.stats = {'lines': 0, 'spilled': 0, 'truncated': 0}
+
+        self.closed = threading.Event()
+        self.writer = threading.Thread(target=self._write_loop, name='capture-writer', daemon=True)
+        self.writer.start()
+
+    def write_line(self, msg):
+        """写入测试框架自身的消息，不受速率限制"""
+        self.queue.append((time.time(), HARNESS, msg))
+
+    def attach(self, process):
+        """为子进程的 stdout/stderr 启动读取线程，返回线程列表"""
+        readers = []
+        for name, stream in (('STDOUT', process.stdout), ('STDERR', process.stderr)):
+            if stream is None:
+                continue
+            reader = threading.Thread(
+                target=self._read_stream,
+                args=(stream, name),
+                name=f"capture-{name.lower()}-{process.pid}",
+                daemon=True
+            )
+            reader.start()
+            readers.append(reader)
+        return readers
+
+    def _read_stream(self, stream, name):
+        fd = stream.fileno()
+        pending = b''
+        try:
+            while True:
+                chunk = os.read(fd, READ_CHUNK)
+                if not chunk:
+                    break
+                now = time.time()
+                lines = (pending + chunk).split(b'\n')
+                pending = lines.pop()
+                for line in lines:
+                    self.queue.append((now, name, line))
+                if len(pending) > READ_CHUNK:
+                    # 没有换行的大段输出，直接作为一行交给写入线程
+                    self.queue.append((now, name, pending))
+                    pending = b''
+        finally:
+            if pending:
+                self.queue.append((time.time(), name, pending))
+            stream.close()
+
+    def _allow(self, size):
+        now = time.monotonic()
+        self.tokens = min(self.tokens + (now - self.last_refill) * self.rate_limit, self.rate_limit * 2.0)
+        self.last_refill = now
+        if self.log_bytes + size > self.max_log_bytes or size > self.tokens:
+            return False
+        if self.spilling and self.tokens < self.rate_limit:
+            # 限流后至少攒够 1 秒的额度再恢复，避免在阈值附近来回切换
+            return False
+        self.tokens -= size
+        return True
+
+    def _spill(self, text, count=True):
+        if self.overflow_file is None:
+            self.overflow_file = gzip.open(self.overflow_path, 'at', encoding='utf-8')
+        self.overflow_file.write(text)
+        if count:
+            self.stats['spilled'] += 1
+
+    def _drain(self):
+        batch = []
+        while self.queue:
+            ts, name, line = self.queue.popleft()
+            if name == HARNESS:
+                batch.append(f"{line}\n")
+                continue
+
+            self.stats['lines'] += 1
+            text = line.rstrip(b'\r').decode('utf-8', errors='replace')
+            stamp = datetime.fromtimestamp(ts).strftime('%H:%M:%S.%f')[:-3]
+            entry = f"[{stamp}] [{name}] {text}\n"
+            if len(line) > self.max_line_bytes:
+                self._spill(entry, count=False)
+                self.stats['truncated'] += 1
+                # 按字节截断，被截开的多字节字符丢弃
+                head = line[:self.max_line_bytes].decode('utf-8', errors='ignore')
+                entry = f"[{stamp}] [{name}] {head} ...[truncated, {len(line)} bytes]\n"
+
+            # 速率和总大小上限按写入 output.log 的 UTF-8 字节数计算
+            size = len(entry.encode('utf-8'))
+            if self._allow(size):
+                if self.spilling:
+                    self.spilling = False
+                    batch.append(f"[capture] output resumed, skipped lines are in {os.path.basename(self.overflow_path)}\n")
+                batch.append(entry)
+                self.log_bytes += size
+            else:
+                if not self.spilling:
+                    self.spilling = True
+                    batch.append(f"[capture] output rate limited, spilling to {os.path.basename(self.overflow_path)}\n")
+                self._spill(entry)
+
+        if batch:
+            text = ''.join(batch)
+            start_offset = self.log_file.tell()
+            self.log_file.write(text.encode('utf-8'))
+            self.log_file.flush()
+            if self.on_flush is not None:
+                try:
+                    self.on_flush(text.splitlines(), start_offset, self.log_file.tell())
+                except Exception as e:
+                    logger.error(f"Error publishing captured output: {e}")
+
+    def _write_loop(self):
+        while not self.closed.wait(self.flush_interval):
+            try:
+                self._drain()
+            except Exception as e:
+                logger.error(f"Error writing captured output: {e}")
+
+    def close(self):
+        """停止写入线程，落盘剩余内容并关闭文件"""
+        self.closed.set()
+        self.writer.join()
+        if self.stats['spilled'] or self.stats['truncated']:
+            self.write_line(
+                f"[capture] {self.stats['lines']} lines captured, {self.stats['spilled']} spilled "
+                f"({self.stats['truncated']} truncated) to {os.path.basename(self.overflow_path)}"
+            )
+        self._drain()
+        self.log_file.close()
+        if self.overflow_file is not None:
+            self.overflow_file.close()
+        return self.stats
@@ -0,0 +1,139 @@
+import glob
+import os
+import re
+import shutil
+import threading
+
+NODE_ROOT = '/sys/devices/system/node'
+CPU_ROOT = '/sys/devices/system/cpu'
+
+
+def parse_cpulist(text):
+    """解析 "0-3,8,10-11" 形式的 CPU 列表"""
+    cpus = []
+    for part in text.strip().split(','):
+        if not part:
+            continue
+        if '-' in part:
+            start, end = part.split('-', 1)
+            cpus.extend(range(int(start), int(end) + 1))
+        else:
+            cpus.append(int(part))
+    return cpus
+
+
+def format_cpulist(cpus):
+    """把 CPU 列表压缩成 "0-3,8" 形式，便于日志和 taskset 使用"""
+    parts = []
+    cpus = sorted(cpus)
+    i = 0
+    while i < len(cpus):
+        j = i
+        while j + 1 < len(cpus) and cpus[j + 1] == cpus[j] + 1:
+            j += 1
+        parts.append(str(cpus[i]) if i == j else f"{cpus[i]}-{cpus[j]}")
+        i = j + 1
+    return ','.join(parts)
+
+
+def _read(path):
+    try:
+        with open(path, 'r') as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def read_numa_nodes():
+    """返回 {node: [cpu, ...]}，没有 NUMA 信息时所有 CPU 视为节点 0"""
+    nodes = {}
+    for path in glob.glob(os.path.join(NODE_ROOT, 'node[0-9]*')):
+        match = re.search(r'node(\d+)$', path)
+        text = _read(os.path.join(path, 'cpulist'))
+        if match and text and text.strip():
+            nodes[int(match.group(1))] = parse_cpulist(text)
+    return nodes
+
+
+def can_bind_memory(nodes):
+    """能否用 numactl 把内存绑定到这些节点：需要安装 numactl，且节点在 sysfs 中存在"""
+    if not nodes or shutil.which('numactl') is None:
+        return False
+    return all(os.path.isdir(os.path.join(NODE_ROOT, f"node{node}")) for node in nodes)
+
+
+def read_core_groups(cpus):
+    """按物理核心分组（超线程兄弟在同一组），读取不到拓扑时每个 CPU 自成一组"""
+    groups = {}
+    for cpu in cpus:
+        text = _read(os.path.join(CPU_ROOT, f"cpu{cpu}", 'topology', 'thread_siblings_list'))
+        siblings = tuple(c for c in parse_cpulist(text) if c in cpus) if text else (cpu,)
+        groups[siblings or (cpu,)] = True
+    return list(groups)
+
+
+class CpuAllocator:
+    """为并发运行的测试分配互不重叠的 CPU 集合
+
+    以物理核心为单位分配，同一核心的超线程不会分给两个测试；优先把一个测试
+    放在同一个 NUMA 节点内（选剩余核心最少但足够的节点），放不下时才跨节点。
+    reserved 中的 CPU 留给 agent 自身和采样线程；cores_per_run 不大于 0 时
+    按 max_runs 平分全部可用核心。
+    """
+
+    def __init__(self, cores_per_run=0, max_runs=1, reserved=()):
+        allowed = sorted(os.sched_getaffinity(0))
+        cores = read_core_groups(allowed)
+        # 预留 CPU 所在的整个物理核心都不参与分配
+        usable = [core for core in cores if not set(core) & set(reserved)] or cores
+        nodes = read_numa_nodes()
+        self.node_of = {}
+        for node, cpus in nodes.items():
+            for cpu in cpus:
+                self.node_of[cpu] = node
+        # 每个节点的空闲核心，核心为 CPU 元组
+        self.free = {}
+        for core in usable:
+            node = self.node_of.get(core[0], 0)
+            self.free.setdefault(node, []).append(core)
+        total = sum(len(cores) for cores in self.free.values())
+        if cores_per_run <= 0:
+            cores_per_run = total // max(max_runs, 1)
+        self.cores_per_run = max(min(int(cores_per_run), total), 1)
+        self.allocations = {}
+        self.lock = threading.Lock()
+
+    def allocate(self, key):
+        """为 key 分配 CPU，返回 {'cpus', 'numa_nodes'}，空闲核心不足时返回 None"""
+        need = self.cores_per_run
+        with self.lock:
+            fitting = [node for node, cores in self.free.items() if len(cores) >= need]
+            if fitting:
+                node = min(fitting, key=lambda n: (len(self.free[n]), n))
+                taken = {node: self.free[node][:need]}
+            else:
+                if sum(len(cores) for cores in self.free.values()) < need:
+                    return None
+                taken = {}
+                remaining = need
+                for node in sorted(self.free, key=lambda n: -len(self.free[n])):
+                    if remaining == 0:
+                        break
+                    part = self.free[node][:remaining]
+                    if part:
+                        taken[node] = part
+                        remaining -= len(part)
+            for node, cores in taken.items():
+                self.free[node] = self.free[node][len(cores):]
+            self.allocations[key] = taken
+
+        cpus = sorted(cpu for cores in taken.values() for core in cores for cpu in core)
+        return {'cpus': cpus, 'numa_nodes': sorted(taken)}
+
+    def release(self, key):
+        with self.lock:
+            taken = self.allocations.pop(key, None)
+            if not taken:
+                return
+            for node, cores in taken.items():
+                self.free[node] = sorted(self.free[node] + cores)
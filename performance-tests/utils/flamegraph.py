@@ -0,0 +1,402 @@
+import json
+import re
+import subprocess
+import sys
+import zlib
+from xml.sax.saxutils import escape
+
+from utils import artifact_store
+
+# perf script 样本头: "comm  pid/tid [cpu] time: period event:"，comm 中可能有空格
+HEADER_RE = re.compile(r'^(\S.*?)\s+(\d+)(?:/\d+)?\s')
+
+FRAME_HEIGHT = 16
+FONT_SIZE = 12
+FONT_WIDTH = 0.59
+
+
+def _frame_name(line):
+    """解析一行调用栈 "addr sym+off (dso)"，返回去掉偏移的函数名"""
+    parts = line.split(None, 1)
+    if len(parts) < 2:
+        return '[unknown]'
+    rest = parts[1]
+    dso = ''
+    if rest.startswith('('):
+        # 没有符号时只有 "(dso)"
+        dso = rest[1:-1]
+        rest = '[unknown]'
+    elif rest.endswith(')'):
+        idx = rest.rfind(' (')
+        if idx >= 0:
+            dso = rest[idx + 2:-1]
+            rest = rest[:idx]
+    idx = rest.rfind('+0x')
+    if idx > 0:
+        rest = rest[:idx]
+    if rest == '[unknown]' and dso and dso != '[unknown]':
+        return f"[{dso.rsplit('/', 1)[-1]}]"
+    return rest
+
+
+def _resolved_frame_name(resolver, pid, line):
+    """解析 -F ip,dso 输出的一行调用栈 "addr (dso)"，用符号缓存查找函数名"""
+    parts = line.split(None, 1)
+    dso = parts[1][1:-1] if len(parts) > 1 and parts[1].startswith('(') else '[unknown]'
+    try:
+        name = resolver.resolve(pid, int(parts[0], 16), dso)
+    except ValueError:
+        name = None
+    if name is not None:
+        return name
+    return f"[{dso.rsplit('/', 1)[-1]}]" if dso != '[unknown]' else '[unknown]'
+
+
+def collapse_perf_script(lines, resolver=None, event=None):
+    """逐行读取 perf script 输出，按调用栈聚合样本数
+
+    返回 {(root, ..., leaf): count}，帧名经过 intern，相同调用栈共用一个键。
+    行为与 stackcollapse-perf.pl 默认参数一致：进程名作为根帧，去掉符号偏移。
+    resolver 为 symcache.Resolver 时输入为 -F comm,pid,tid,event,ip,dso --show-mmap-events 的输出，
+    函数名由符号缓存解析。同时采样多个事件时用 event 只统计其中一个事件的样本。
+    """
+    # 样本头中的事件名，如 "cycles:"、"cache-misses:u:"
+    event_re = re.compile(rf'\s{re.escape(event)}(?::\w+)?:') if event else None
+    stacks = {}
+    frames_cache = {}
+    comm = None
+    pid = None
+    frames = []
+    intern = sys.intern
+
+    def finish():
+        if comm is not None and frames:
+            frames.append(comm)
+            key = tuple(reversed(frames))
+            stacks[key] = stacks.get(key, 0) + 1
+
+    for line in lines:
+        if not line or line == '\n':
+            finish()
+            comm = None
+            frames = []
+            continue
+        if line[0] == '#':
+            continue
+        if line[0] in ' \t':
+            stripped = line.strip()
+            if not stripped:
+                finish()
+                comm = None
+                frames = []
+                continue
+            if comm is None:
+                continue
+            if resolver is None:
+                name = frames_cache.get(stripped)
+                if name is None:
+                    # 同一地址的帧反复出现，按原始行缓存解析结果
+                    name = frames_cache[stripped] = intern(_frame_name(stripped))
+            else:
+                # 不同进程中同一地址可能属于不同的映射
+                name = frames_cache.get((pid, stripped))
+                if name is None:
+                    name = frames_cache[(pid, stripped)] = intern(_resolved_frame_name(resolver, pid, stripped))
+            frames.append(name)
+        else:
+            finish()
+            frames = []
+            if resolver is not None and 'PERF_RECORD_' in line:
+                resolver.add_mmap(line)
+                comm = None
+                continue
+            match = HEADER_RE.match(line)
+            if match and event_re is not None and not event_re.search(line):
+                match = None
+            comm = intern(match.group(1).replace(' ', '_')) if match else None
+            pid = int(match.group(2)) if match else None
+    finish()
+    return stacks
+
+
+def _collapse_script(args, resolver=None, event=None):
+    process = subprocess.Popen(
+        args,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+        errors='replace',
+        bufsize=1024 * 1024
+    )
+    try:
+        stacks = collapse_perf_script(process.stdout, resolver, event)
+    finally:
+        process.stdout.close()
+        process.wait()
+    return stacks
+
+
+def collapse_perf_data(perf_data, symcache_dir=None, event=None):
+    """运行 perf script 并流式折叠输出，不在磁盘上保留中间文本
+
+    指定 symcache_dir 时 perf script 只输出地址和 dso，由按 build-id 缓存的符号表解析函数名，
+    同一构建的重复运行不必每次重新符号化；没有解析出用户态符号或多数二进制文件已不存在、
+    已重新编译（与 perf.data 中记录的 build-id 不一致）时退回 perf 自己的符号化。
+    """
+    if symcache_dir:
+        from utils import symcache
+        resolver = symcache.Resolver(symcache.SymbolCache(symcache_dir), symcache.recorded_build_ids(perf_data))
+        stacks = _collapse_script([
+            'perf', 'script', '-i', perf_data, '-F', 'comm,pid,tid,event,ip,dso', '--show-mmap-events'
+        ], resolver, event)
+        if stacks and resolver.resolved and resolver.resolved >= resolver.missing and not resolver.mismatched:
+            return stacks
+    return _collapse_script(['perf', 'script', '-i', perf_data], event=event)
+
+
+def write_folded(stacks, path):
+    """按 flamegraph.pl 的折叠格式写出，每行 "a;b;c count" """
+    with open(path, 'w', encoding='utf-8') as f:
+        for key in sorted(stacks):
+            f.write(f"{';'.join(key)} {stacks[key]}\n")
+
+
+def read_folded(path):
+    """读取折叠格式文件（可以是压缩保存的），返回与 collapse_perf_script 相同的结构"""
+    stacks = {}
+    intern = sys.intern
+    with artifact_store.open_artifact(path, 'r') as f:
+        for line in f:
+            stack, _, count = line.rstrip('\n').rpartition(' ')
+            if not stack:
+                continue
+            try:
+                value = int(count)
+            except ValueError:
+                continue
+            key = tuple(intern(frame) for frame in stack.split(';'))
+            stacks[key] = stacks.get(key, 0) + value
+    return stacks
+
+
+def merge_frames(stacks, extra=None):
+    """按字典序遍历调用栈并合并相同前缀，依次产出 (name, depth, start, end, delta)
+
+    与 flamegraph.pl 相同，只保留当前栈上的帧，不构建整棵调用树；
+    子帧先于父帧产出，同层帧按名称排序，坐标单位为样本数。
+    extra 为 {调用栈: 数值} 时 delta 是该帧下所有调用栈数值之和，否则为 0。
+    """
+    # 栈中每项为 [name, start, delta]，delta 先记在叶子帧上，出栈时累加给父帧
+    open_frames = []
+    x = 0
+    prev = ()
+    for key in sorted(stacks):
+        common = 0
+        limit = min(len(prev), len(key))
+        while common < limit and prev[common] == key[common]:
+            common += 1
+        depth = len(open_frames)
+        while depth > common:
+            name, start, delta = open_frames.pop()
+            depth -= 1
+            if depth:
+                open_frames[-1][2] += delta
+            yield name, depth, start, x, delta
+        for frame in key[common:]:
+            open_frames.append([frame, x, 0])
+        if extra is not None and open_frames:
+            open_frames[-1][2] += extra.get(key, 0)
+        x += stacks[key]
+        prev = key
+    depth = len(open_frames)
+    while depth:
+        name, start, delta = open_frames.pop()
+        depth -= 1
+        if depth:
+            open_frames[-1][2] += delta
+        yield name, depth, start, x, delta
+
+
+def to_json(stacks, name='all', min_fraction=0.0):
+    """转换成 d3-flame-graph 使用的 {name, value, children} 结构
+
+    占比低于 min_fraction 的节点不输出。
+    """
+    total = sum(stacks.values())
+    threshold = total * min_fraction
+    root = {'name': name, 'value': total, 'children': []}
+    # 与 merge_frames 相同的遍历方式，栈中保存 (节点, 起始位置)
+    open_nodes = []
+    x = 0
+    prev = ()
+
+    def close():
+        node, start = open_nodes.pop()
+        node['value'] = x - start
+        if node['value'] >= threshold and node['value'] > 0:
+            parent = open_nodes[-1][0] if open_nodes else root
+            parent['children'].append(node)
+
+    for key in sorted(stacks):
+        common = 0
+        limit = min(len(prev), len(key))
+        while common < limit and prev[common] == key[common]:
+            common += 1
+        while len(open_nodes) > common:
+            close()
+        for frame in key[common:]:
+            open_nodes.append(({'name': frame, 'value': 0, 'children': []}, x))
+        x += stacks[key]
+        prev = key
+    while open_nodes:
+        close()
+    return root
+
+
+def write_json(stacks, path, name='all', min_fraction=0.0001):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(to_json(stacks, name, min_fraction), f, ensure_ascii=False)
+
+
+def _color(name, delta=0):
+    """按函数名哈希取暖色，同名函数颜色固定"""
+    h = zlib.crc32(name.encode('utf-8'))
+    r = 205 + (h & 0xff) * 50 // 255
+    g = ((h >> 8) & 0xff) * 230 // 255
+    b = ((h >> 16) & 0xff) * 55 // 255
+    return f"rgb({r},{g},{b})"
+
+
+def render_svg(stacks, path, title='Flame Graph', width=1200, min_width=0.1, color=_color, details=None,
+               extra=None):
+    """生成火焰图 SVG，宽度小于 min_width 像素的帧不绘制
+
+    color(name, delta) 返回填充色；details(name, value, delta) 返回悬停提示，
+    默认显示样本数和占比。delta 为 extra 在该帧下的累计值（见 merge_frames），
+    传给 color 时按已绘制帧中的最大绝对值归一化到 [-1, 1]。
+    """
+    total = sum(stacks.values())
+    pad = 10
+    top = FRAME_HEIGHT * 2 + pad
+    scale = (width - 2 * pad) / total if total else 0
+
+    rects = []
+    max_depth = 0
+    for name, depth, start, end, delta in merge_frames(stacks, extra):
+        w = (end - start) * scale
+        if w >= min_width:
+            rects.append((name, end - start, pad + start * scale, depth, w, delta))
+            max_depth = max(max_depth, depth)
+    # 父帧在子帧之后产出，倒序绘制让父帧在下层
+    rects.reverse()
+    delta_scale = max((abs(rect[5]) for rect in rects), default=0) if extra is not None else 0
+
+    height = top + (max_depth + 1) * FRAME_HEIGHT + pad * 2
+    out = [
+        '<?xml version="1.0" standalone="no"?>',
+        f'<svg version="1.1" width="{width}" height="{height}" viewBox="0 0 {width} {height}" '
+        f'xmlns="http://www.w3.org/2000/svg" font-family="Verdana" font-size="{FONT_SIZE}">',
+        f'<rect x="0" y="0" width="{width}" height="{height}" fill="#f8f8f8"/>',
+        f'<text x="{width / 2}" y="{FRAME_HEIGHT + 4}" text-anchor="middle" font-size="{FONT_SIZE + 5}">'
+        f'{escape(title)}</text>'
+    ]
+    for name, value, x, depth, w, delta in rects:
+        y = height - pad - (depth + 1) * FRAME_HEIGHT
+        if details is not None:
+            tip = details(name, value, delta)
+        else:
+            tip = f"{name} ({value} samples, {value * 100.0 / total:.2f}%)"
+        out.append(f'<g><title>{escape(tip)}</title>')
+        out.append(
+            f'<rect x="{x:.1f}" y="{y}" width="{w:.1f}" height="{FRAME_HEIGHT - 1}" '
+            f'fill="{color(name, delta / delta_scale if delta_scale else 0)}" rx="2" ry="2"/>'
+        )
+        chars = int(w / (FONT_SIZE * FONT_WIDTH))
+        if chars >= 3:
+            label = name if len(name) <= chars else name[:chars - 2] + '..'
+            out.append(f'<text x="{x + 3:.1f}" y="{y + FRAME_HEIGHT - 4}">{escape(label)}</text>')
+        out.append('</g>')
+    out.append('</svg>')
+
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(out))
+
+
+def diff_stacks(before, after):
+    """按样本总数归一化两组调用栈，返回 (形状, 差值)
+
+    形状取 after 的样本数，只在 before 中出现的调用栈宽度为 0，但仍计入父帧的差值；
+    差值为 after 样本数减去按比例缩放后的 before 样本数，正数表示变慢。
+    """
+    total_before = sum(before.values())
+    total_after = sum(after.values())
+    ratio = total_after / total_before if total_before else 0.0
+    shape = {}
+    deltas = {}
+    for key in set(before) | set(after):
+        count = after.get(key, 0)
+        shape[key] = count
+        deltas[key] = count - before.get(key, 0) * ratio
+    return shape, deltas
+
+
+def frame_shares(stacks):
+    """每个函数的自身占比和包含占比（百分比），递归调用只计一次"""
+    total = sum(stacks.values())
+    self_counts = {}
+    total_counts = {}
+    for key, count in stacks.items():
+        if not key:
+            continue
+        self_counts[key[-1]] = self_counts.get(key[-1], 0) + count
+        for name in set(key):
+            total_counts[name] = total_counts.get(name, 0) + count
+    if not total:
+        return {}
+    return {
+        name: (self_counts.get(name, 0) * 100.0 / total, total_counts[name] * 100.0 / total)
+        for name in total_counts
+    }
+
+
+def diff_table(before, after, limit=50):
+    """占比变化最大的函数，按自身占比变化的绝对值排序，limit 为 None 时返回全部"""
+    shares_before = frame_shares(before)
+    shares_after = frame_shares(after)
+    rows = []
+    for name in set(shares_before) | set(shares_after):
+        self_before, total_before = shares_before.get(name, (0.0, 0.0))
+        self_after, total_after = shares_after.get(name, (0.0, 0.0))
+        rows.append({
+            'name': name,
+            'self_before': self_before,
+            'self_after': self_after,
+            'self_delta': self_after - self_before,
+            'total_before': total_before,
+            'total_after': total_after,
+            'total_delta': total_after - total_before
+        })
+    rows.sort(key=lambda row: (-abs(row['self_delta']), -abs(row['total_delta']), row['name']))
+    return rows if limit is None else rows[:limit]
+
+
+def _diff_color(name, delta):
+    """归一化差值为正显示红色、为负显示蓝色，绝对值越大颜色越深"""
+    if not delta:
+        return 'rgb(250,250,250)'
+    fade = int(250 - 200 * min(abs(delta), 1.0))
+    return f"rgb(250,{fade},{fade})" if delta > 0 else f"rgb({fade},{fade},250)"
+
+
+def render_diff_svg(before, after, path, title='Differential Flame Graph', width=1200, min_width=0.1):
+    """生成差分火焰图：宽度为 after 的样本，红色表示占比增加，蓝色表示减少"""
+    shape, deltas = diff_stacks(before, after)
+    total = sum(shape.values())
+
+    def details(name, value, delta):
+        share = value * 100.0 / total if total else 0.0
+        change = delta * 100.0 / total if total else 0.0
+        return f"{name} ({value} samples, {share:.2f}%, {change:+.2f}%)"
+
+    render_svg(shape, path, title=title, width=width, min_width=min_width,
+               color=_diff_color, details=details, extra=deltas)
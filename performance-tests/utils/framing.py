@@ -0,0 +1,74 @@
+"""agent 与 backend 之间的消息帧格式
+
+每条消息 = 8 字节大端无符号长度 + UTF-8 编码的 JSON，不再受单次 recv 大小限制。
+同时提供阻塞 socket 与 asyncio stream 两套读写接口。
+"""
+import asyncio
+import json
+import struct
+
+HEADER = struct.Struct('!Q')
+
+
+class FramingError(Exception):
+    """连接在一条消息中途被关闭"""
+
+
+def encode_message(obj):
+    """序列化为带长度前缀的字节串"""
+    payload = json.dumps(obj).encode('utf-8')
+    return HEADER.pack(len(payload)) + payload
+
+
+def decode_payload(payload):
+    return json.loads(payload.decode('utf-8'))
+
+
+def _recv_exactly(sock, size):
+    """读满 size 字节，对端在消息开始前关闭时返回 None"""
+    buf = bytearray()
+    while len(buf) < size:
+        chunk = sock.recv(min(size - len(buf), 1024 * 1024))
+        if not chunk:
+            if buf:
+                raise FramingError(f"connection closed after {len(buf)}/{size} bytes")
+            return None
+        buf.extend(chunk)
+    return bytes(buf)
+
+
+def send_message(sock, obj):
+    sock.sendall(encode_message(obj))
+
+
+def recv_message(sock):
+    """从阻塞 socket 读取一条消息，连接正常关闭时返回 None"""
+    header = _recv_exactly(sock, HEADER.size)
+    if header is None:
+        return None
+    (length,) = HEADER.unpack(header)
+    payload = _recv_exactly(sock, length) if length else b''
+    if payload is None:
+        raise FramingError("connection closed before payload")
+    return decode_payload(payload)
+
+
+async def read_message(reader):
+    """从 asyncio StreamReader 读取一条消息，连接正常关闭时返回 None"""
+    try:
+        header = await reader.readexactly(HEADER.size)
+    except asyncio.IncompleteReadError as e:
+        if not e.partial:
+            return None
+        raise FramingError("connection closed inside header") from e
+    (length,) = HEADER.unpack(header)
+    try:
+        payload = await reader.readexactly(length)
+    except asyncio.IncompleteReadError as e:
+        raise FramingError(f"connection closed after {len(e.partial)}/{length} bytes") from e
+    return decode_payload(payload)
+
+
+async def write_message(writer, obj):
+    writer.write(encode_message(obj))
+    await writer.drain()
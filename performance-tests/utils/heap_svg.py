@@ -1,130 +1,122 @@
-import re
-import matplotlib.pyplot as plt
-import matplotlib.colors as mcolors
 import os
+import re
 
+from utils import artifact_store
+
+# HEAP SUMMARY / LEAK SUMMARY 中的行，如 "==1234==     in use at exit: 1,024 bytes in 3 blocks"
+SUMMARY_LINE_RE = re.compile(
+    r'^==(\d+)==\s+(in use at exit|total heap usage|definitely lost|indirectly lost|possibly lost|still reachable):\s*(.*)$'
+)
+# "5 allocs, 2 frees, 1,024 bytes allocated" 中的 1,024
+BYTES_RE = re.compile(r'([\d,]+)\s+bytes')
+
+FIELDS = (
+    'in_use_at_exit', 'total_allocated', 'still_reachable',
+    'definitely_lost', 'indirectly_lost', 'possibly_lost'
+)
+
+# 颜色映射
+COLOR_MAP = {
+    'in_use_at_exit': 'skyblue',
+    'total_allocated': 'lightgreen',
+    'still_reachable': 'limegreen',
+    'definitely_lost': 'red',
+    'indirectly_lost': 'orange',
+    'possibly_lost': 'purple'
+}
+
+
+def extract_memory_summary(lines):
+    """逐行提取每个 PID 的堆内存和泄漏信息，lines 为日志的行（可以是文件对象）
+
+    只对以 "==" 开头的行做锚定的单行匹配，耗时与日志大小成线性关系。
+    所有堆块都已释放时 valgrind 不输出 LEAK SUMMARY，对应的泄漏项为 0。
+    """
+    if isinstance(lines, str):
+        lines = lines.splitlines()
+    memory_info = {}
+    for line in lines:
+        if not line.startswith('=='):
+            continue
+        match = SUMMARY_LINE_RE.match(line)
+        if not match:
+            continue
+        pid, label, rest = match.groups()
+        info = memory_info.setdefault(pid, dict.fromkeys(FIELDS, 0))
+        found = BYTES_RE.search(rest)
+        value = int(found.group(1).replace(',', '')) if found else 0
+        if label == 'total heap usage':
+            info['total_allocated'] = value
+        else:
+            info[label.replace(' ', '_')] = value
+    return memory_info
 
-def extract_memory_summary(log):
-    """从Valgrind的日志中提取堆内存和泄漏相关信息"""
-    
-    # 正则表达式提取每个PID的内存使用和泄漏相关信息
-    heap_summary_pattern = r"==(\d+)==\s+HEAP SUMMARY:.*?in use at exit:\s*(\d{1,3}(?:,\d{3})*)\s+bytes.*?total heap usage:.*?(\d{1,3}(?:,\d{3})*)\s+allocs.*?(\d+)\s+frees.*?(\d{1,3}(?:,\d{3})*)\s+bytes allocated"
-    leak_summary_pattern = r"==(\d+)==\s+LEAK SUMMARY:.*?definitely lost:\s*(\d{1,3}(?:,\d{3})*)\s+bytes.*?indirectly lost:\s*(\d{1,3}(?:,\d{3})*)\s+bytes.*?possibly lost:\s*(\d{1,3}(?:,\d{3})*)\s+bytes.*?still reachable:\s*(\d{1,3}(?:,\d{3})*)\s+bytes"
 
-    # 匹配所有的HEAP SUMMARY和LEAK SUMMARY
-    heap_matches = re.findall(heap_summary_pattern, log, re.DOTALL)
-    leak_matches = re.findall(leak_summary_pattern, log, re.DOTALL)
+def read_memory_summary(log_path):
+    with artifact_store.open_artifact(log_path, 'r') as f:
+        return extract_memory_summary(f)
 
-    memory_info = {}
 
-    for heap_match, leak_match in zip(heap_matches, leak_matches):
-        pid = heap_match[0]
-        in_use_at_exit = int(heap_match[1].replace(',', ''))
-        total_allocated = int(heap_match[4].replace(',', ''))
-        still_reachable = int(leak_match[4].replace(',', ''))
-        definitely_lost = int(leak_match[1].replace(',', ''))
-        indirectly_lost = int(leak_match[2].replace(',', ''))
-        possibly_lost = int(leak_match[3].replace(',', ''))
-
-        # 将数据存入字典
-        memory_info[pid] = {
-            'in_use_at_exit': in_use_at_exit,
-            'total_allocated': total_allocated,
-            'still_reachable': still_reachable,
-            'definitely_lost': definitely_lost,
-            'indirectly_lost': indirectly_lost,
-            'possibly_lost': possibly_lost
-        }
+def from_memcheck(summary):
+    """--xml 模式下日志中没有 HEAP/LEAK SUMMARY，用 valgrind_xml 摘要中的泄漏统计代替
+
+    XML 中没有总分配量，total_allocated 为 0；退出时仍在使用的内存为各类泄漏之和。
+    """
+    leaks = {name: item['bytes'] for name, item in summary['leaks'].items()}
+    if not any(leaks.values()) or not summary.get('pid'):
+        return {}
+    info = dict.fromkeys(FIELDS, 0)
+    info.update(leaks)
+    info['in_use_at_exit'] = sum(leaks.values())
+    return {summary['pid']: info}
 
-    return memory_info
 
 def plot_memory_summary(memory_info, result_dir):
     """可视化内存使用信息，并保存为SVG"""
-    
-    # 颜色映射
-    color_map = {
-        'in_use_at_exit': 'skyblue',
-        'total_allocated': 'lightgreen',
-        'still_reachable': 'limegreen',
-        'definitely_lost': 'red',
-        'indirectly_lost': 'orange',
-        'possibly_lost': 'purple'
-    }
-
-    # 设置图表
-    fig, ax = plt.subplots(figsize=(10, 7))
+    # 在工作进程中调用，没有显示设备，使用非交互后端
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
 
-    # 设置PID列表
+    fig, ax = plt.subplots(figsize=(10, 7))
     pids = list(memory_info.keys())
 
-    # 设置堆叠的内存数据
-    in_use_at_exit = [memory_info[pid]['in_use_at_exit'] for pid in pids]
-    total_allocated = [memory_info[pid]['total_allocated'] for pid in pids]
-    still_reachable = [memory_info[pid]['still_reachable'] for pid in pids]
-    definitely_lost = [memory_info[pid]['definitely_lost'] for pid in pids]
-    indirectly_lost = [memory_info[pid]['indirectly_lost'] for pid in pids]
-    possibly_lost = [memory_info[pid]['possibly_lost'] for pid in pids]
-
-    # 绘制堆叠条形图
-    ax.bar(pids, in_use_at_exit, label="In Use at Exit", color=color_map['in_use_at_exit'])
-    ax.bar(pids, total_allocated, label="Total Allocated", bottom=in_use_at_exit, color=color_map['total_allocated'])
-    ax.bar(pids, still_reachable, label="Still Reachable", bottom=[i+j for i,j in zip(in_use_at_exit, total_allocated)], color=color_map['still_reachable'])
-    ax.bar(pids, definitely_lost, label="Definitely Lost", bottom=[i+j+k for i,j,k in zip(in_use_at_exit, total_allocated, still_reachable)], color=color_map['definitely_lost'])
-    ax.bar(pids, indirectly_lost, label="Indirectly Lost", bottom=[i+j+k+l for i,j,k,l in zip(in_use_at_exit, total_allocated, still_reachable, definitely_lost)], color=color_map['indirectly_lost'])
-    ax.bar(pids, possibly_lost, label="Possibly Lost", bottom=[i+j+k+l+m for i,j,k,l,m in zip(in_use_at_exit, total_allocated, still_reachable, definitely_lost, indirectly_lost)], color=color_map['possibly_lost'])
-
-    # 添加数字标签
-    for i, pid in enumerate(pids):
-        # 计算每个堆叠条形的顶部位置并添加数字
-        bottom = 0
-        for label, data in zip(
-            ["in_use_at_exit", "total_allocated", "still_reachable", "definitely_lost", "indirectly_lost", "possibly_lost"],
-            [in_use_at_exit, total_allocated, still_reachable, definitely_lost, indirectly_lost, possibly_lost]
-        ):
-            value = data[i]
-            ax.text(
-                pid, bottom + value / 2,  # text位置
-                str(value),               # 显示的文本
-                ha='center',              # 水平对齐方式
-                va='center',              # 垂直对齐方式
-                color='black'             # 字体颜色
-            )
-            bottom += value  # 更新顶部位置
+    # 绘制堆叠条形图，并在每段中间标注数值
+    bottoms = [0] * len(pids)
+    for field in FIELDS:
+        values = [memory_info[pid][field] for pid in pids]
+        ax.bar(pids, values, label=field.replace('_', ' ').title(), bottom=bottoms, color=COLOR_MAP[field])
+        for i, pid in enumerate(pids):
+            ax.text(pid, bottoms[i] + values[i] / 2, str(values[i]), ha='center', va='center', color='black')
+        bottoms = [b + v for b, v in zip(bottoms, values)]
 
     # 添加图例和标签
     ax.set_xlabel("PID")
     ax.set_ylabel("Memory (bytes)")
     ax.set_title("Memory Usage Summary by PID")
     ax.legend()
-
-    # 显示图表
     plt.xticks(rotation=45)
     plt.tight_layout()
-    #plt.draw()
 
-    save_svg = os.path.join(result_dir, "heap.svg")
     try:
-        plt.savefig(save_svg, format='svg')
-    except Exception as e:
-        print(f"======================ERROR saving fig {e} =================")
-    #plt.show()
+        fig.savefig(os.path.join(result_dir, "heap.svg"), format='svg')
+    finally:
+        plt.close(fig)
 
 
-def generate_memory_svg(result_dir):
+def generate_memory_svg(result_dir, memcheck_summary=None):
+    """根据 valgrind.log 生成 heap.svg，日志中没有摘要的 PID 使用 memcheck_summary 补充
 
-    #
-    log_data = ''
+    没有任何可画的数据时返回 False。
+    """
+    memory_info = {}
     log_path = os.path.join(result_dir, "valgrind.log")
-    # log_path = "/root/cpp_test/flask-vue/performance-tests/results/20250123_105003_11/profile/valgrind.log"
-    if os.path.exists(log_path):
-        with open(log_path, 'r') as f:
-            log_data = f.read()
-    else:
-        print(f"ERROR============not exits: {log_path}==========================")
-        return
-
-
-    memory_info = extract_memory_summary(log_data)
+    if artifact_store.exists(log_path):
+        memory_info = read_memory_summary(log_path)
+    if memcheck_summary:
+        for pid, info in from_memcheck(memcheck_summary).items():
+            memory_info.setdefault(pid, info)
+    if not memory_info:
+        return False
     plot_memory_summary(memory_info, result_dir)
-
-generate_memory_svg("/root/cpp_test/flask-vue/performance-tests/results/20250123_164950_11/profile")
+    return True
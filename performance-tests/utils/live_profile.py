@@ -0,0 +1,250 @@
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime
+
+from utils import artifact_store, flamegraph, postprocess
+
+LIVE_DIR = 'live'
+INDEX_FILE = 'index.json'
+AGGREGATE_FILE = 'aggregate.folded'
+# perf record --switch-output 切出的文件，后缀为切换时刻（年月日时分秒加百分之一秒）
+CHUNK_RE = re.compile(r'^perf\.data\.(\d{16})$')
+
+
+def chunk_time(name):
+    """切出时刻的时间戳（秒），perf 按本地时间命名"""
+    stamp = CHUNK_RE.match(name).group(1)
+    return datetime.strptime(stamp[:14], '%Y%m%d%H%M%S').timestamp() + int(stamp[14:]) / 100
+
+
+def list_windows(step_dir, started_at):
+    """按切出时刻排序的时间窗口，start/end 为相对 perf record 启动的秒数
+
+    窗口编号只由文件名决定，agent 和后台进程各自计算的结果一致。
+    """
+    names = sorted(name for name in os.listdir(step_dir) if CHUNK_RE.match(name))
+    windows = []
+    previous = 0.0
+    for index, name in enumerate(names):
+        end = max(chunk_time(name) - started_at, previous)
+        windows.append({'index': index, 'chunk': name, 'start': round(previous, 2), 'end': round(end, 2)})
+        previous = end
+    return windows
+
+
+def window_folded(live_dir, index):
+    return os.path.join(live_dir, f"window_{index:04d}.folded")
+
+
+def _write_folded(stacks, path):
+    # 读取方可能正在渲染，先写临时文件再改名
+    tmp = f"{path}.{os.getpid()}.tmp"
+    flamegraph.write_folded(stacks, tmp)
+    os.replace(tmp, path)
+
+
+def write_index(live_dir, index):
+    path = os.path.join(live_dir, INDEX_FILE)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(index, f)
+    os.replace(tmp, path)
+
+
+def read_index(live_dir):
+    try:
+        with open(os.path.join(live_dir, INDEX_FILE), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def merge_stacks(target, stacks):
+    for key, count in stacks.items():
+        target[key] = target.get(key, 0) + count
+    return target
+
+
+def collapse_chunk(chunk, folded_path, symcache_dir=None, event=None):
+    """折叠一个切出的 perf.data 块，写出该窗口的 folded 文件"""
+    stacks = flamegraph.collapse_perf_data(chunk, symcache_dir, event)
+    _write_folded(stacks, folded_path)
+    return stacks
+
+
+def finalize(step_dir, started_at, symcache_dir=None, event=None):
+    """运行结束后合并所有窗口，返回完整的调用栈；还没有折叠的块（最后一块）在这里折叠"""
+    live_dir = os.path.join(step_dir, LIVE_DIR)
+    os.makedirs(live_dir, exist_ok=True)
+    aggregate = {}
+    windows = list_windows(step_dir, started_at)
+    for window in windows:
+        folded = window_folded(live_dir, window['index'])
+        try:
+            if artifact_store.exists(folded):
+                stacks = flamegraph.read_folded(folded)
+            else:
+                stacks = collapse_chunk(os.path.join(step_dir, window['chunk']), folded, symcache_dir, event)
+        except Exception:
+            # 测试被终止时最后一块可能不完整，跳过该窗口
+            window['failed'] = True
+            stacks = {}
+        window['samples'] = sum(stacks.values())
+        merge_stacks(aggregate, stacks)
+    _write_folded(aggregate, os.path.join(live_dir, AGGREGATE_FILE))
+    # 运行中失败或还没合并的窗口在这里重新折叠，窗口数不变但内容可能变化，之前缓存的 SVG 都作废
+    for name in os.listdir(live_dir):
+        if name.endswith('.svg') and name.startswith(('current_', 'range_')):
+            os.unlink(os.path.join(live_dir, name))
+    write_index(live_dir, {
+        'started_at': started_at,
+        'running': False,
+        'windows': windows,
+        'samples': sum(aggregate.values())
+    })
+    return aggregate
+
+
+def render(live_dir, start=None, end=None, title='Flame Graph'):
+    """当前累计的火焰图，或与 [start, end]（相对启动的秒数）有重叠的窗口合并后的火焰图
+
+    同一组窗口、同样样本数的 SVG 只生成一次；finalize 重新折叠窗口后样本数变化，缓存自然失效。
+    """
+    index = read_index(live_dir)
+    if index is None or not index['windows']:
+        return None
+    windows = index['windows']
+    if start is None and end is None:
+        selected = windows
+        stacks = flamegraph.read_folded(os.path.join(live_dir, AGGREGATE_FILE))
+        name = f"current_{len(windows):04d}_{index['samples']}.svg"
+    else:
+        low = start if start is not None else 0
+        high = end if end is not None else windows[-1]['end']
+        selected = [w for w in windows if w['end'] > low and w['start'] < high]
+        if not selected:
+            return {'svg': None, 'windows': [], 'samples': 0, 'index': index}
+        stacks = None
+        samples = sum(w.get('samples', 0) for w in selected)
+        name = f"range_{selected[0]['index']:04d}-{selected[-1]['index']:04d}_{samples}.svg"
+
+    svg_path = os.path.join(live_dir, name)
+    if stacks is None:
+        stacks = {}
+        for window in selected:
+            if not window.get('failed'):
+                merge_stacks(stacks, flamegraph.read_folded(window_folded(live_dir, window['index'])))
+    if not stacks:
+        return {'svg': None, 'windows': [w['index'] for w in selected], 'samples': 0, 'index': index}
+    if not os.path.exists(svg_path):
+        flamegraph.render_svg(
+            stacks, svg_path,
+            title=f"{title} ({selected[0]['start']:.0f}s - {selected[-1]['end']:.0f}s)"
+        )
+        if name.startswith('current_'):
+            # 累计火焰图只保留最新的一份
+            for old in os.listdir(live_dir):
+                if old.startswith('current_') and old.endswith('.svg') and old != name:
+                    os.unlink(os.path.join(live_dir, old))
+    return {
+        'svg': svg_path,
+        'windows': [w['index'] for w in selected],
+        'samples': sum(stacks.values()),
+        'index': index
+    }
+
+
+class LiveProfile:
+    """连续分析模式下的增量火焰图
+
+    perf record --switch-output 在运行中按时间切出 perf.data.<时间戳>，后台线程发现新块后
+    提交到后处理进程池折叠为窗口的 folded 文件，再合并到累计的 aggregate.folded，
+    live/index.json 记录各窗口的时间范围和样本数。窗口按编号顺序合并，索引中只有连续的前缀，
+    按窗口编号缓存的 SVG 不会缺少中间的窗口。运行结束后由 finalize 合并出完整结果。
+    """
+
+    def __init__(self, step_dir, submit, symcache_dir=None, event=None, poll_interval=1.0):
+        self.step_dir = step_dir
+        self.live_dir = os.path.join(step_dir, LIVE_DIR)
+        # submit(名称, 产物路径, 函数, *参数) 提交后台任务并返回 future
+        self.submit = submit
+        self.symcache_dir = symcache_dir
+        self.event = event
+        self.poll_interval = poll_interval
+        self.started_at = None
+        self.aggregate = {}
+        self.windows = []
+        # 已折叠但前面还有窗口未完成的窗口
+        self.pending = {}
+        self.submitted = set()
+        self.lock = threading.Lock()
+        self.closed = False
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        os.makedirs(self.live_dir, exist_ok=True)
+        self.started_at = time.time()
+        self._write()
+        self.thread = threading.Thread(target=self._poll, name='live-profile', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """perf 退出后调用；之后的窗口（最后一块）由 finalize 处理，这里不再更新累计结果"""
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+        with self.lock:
+            self.closed = True
+
+    def _poll(self):
+        while not self.stop_event.wait(self.poll_interval):
+            try:
+                self._scan()
+            except OSError:
+                continue
+
+    def _scan(self):
+        for window in list_windows(self.step_dir, self.started_at):
+            if window['chunk'] in self.submitted:
+                continue
+            self.submitted.add(window['chunk'])
+            folded = window_folded(self.live_dir, window['index'])
+            future = self.submit(
+                f"live_{window['index']:04d}", folded, postprocess.perf_chunk,
+                os.path.join(self.step_dir, window['chunk']), folded, self.symcache_dir, self.event
+            )
+            future.add_done_callback(lambda f, w=window: self._merge(w, f))
+
+    def _merge(self, window, future):
+        with self.lock:
+            if self.closed:
+                return
+            if future.exception() is not None:
+                window['failed'] = True
+            self.pending[window['index']] = window
+            merged = False
+            while len(self.windows) in self.pending:
+                window = self.pending.pop(len(self.windows))
+                stacks = {}
+                if not window.get('failed'):
+                    stacks = flamegraph.read_folded(window_folded(self.live_dir, window['index']))
+                window['samples'] = sum(stacks.values())
+                self.windows.append(window)
+                merge_stacks(self.aggregate, stacks)
+                merged = True
+            if merged:
+                self._write()
+
+    def _write(self):
+        # 先写累计结果再写索引，读到的索引中的窗口都已合并
+        _write_folded(self.aggregate, os.path.join(self.live_dir, AGGREGATE_FILE))
+        write_index(self.live_dir, {
+            'started_at': self.started_at,
+            'running': True,
+            'windows': self.windows,
+            'samples': sum(self.aggregate.values())
+        })
@@ -0,0 +1,101 @@
+import logging
+import math
+import threading
+
+import requests
+
+logger = logging.getLogger('TestServer')
+
+# 推送给前端实时图表的列，完整数据仍在 metrics 目录中
+LIVE_COLUMNS = [
+    'host_cpu',
+    'host_memory',
+    'disk_read_bytes',
+    'disk_write_bytes',
+    'net_bytes_sent',
+    'net_bytes_recv',
+    'proc_cpu_percent',
+    'proc_rss'
+]
+
+
+class LivePublisher:
+    """把运行中测试的日志增量和采样数据批量推送给 backend
+
+    生产者（输出捕获、采样线程）只往内存里追加，后台线程每 interval 秒
+    合并成一次 HTTP 请求；推送失败直接丢弃，前端会退回按偏移拉取日志。
+    """
+
+    def __init__(self, api_url, interval=0.5, max_samples=20, max_lines=2000):
+        self.url = f"{api_url}/test-results/stream"
+        self.interval = interval
+        self.max_samples = max_samples
+        self.max_lines = max_lines
+        self.session = requests.Session()
+        self.session.trust_env = False
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._loop, name='live-push', daemon=True)
+        self.thread.start()
+
+    def _entry(self, result_dir):
+        entry = self.pending.get(result_dir)
+        if entry is None:
+            entry = {
+                'result_dir': result_dir,
+                'logs': [],
+                'start_offset': None,
+                'offset': None,
+                'truncated': False,
+                'samples': []
+            }
+            self.pending[result_dir] = entry
+        return entry
+
+    def publish_logs(self, result_dir, lines, start_offset, end_offset):
+        with self.lock:
+            entry = self._entry(result_dir)
+            if entry['start_offset'] is None:
+                entry['start_offset'] = start_offset
+            entry['offset'] = end_offset
+            if len(entry['logs']) + len(lines) > self.max_lines:
+                # 输出太多时只通知偏移，由前端自己按偏移拉取
+                entry['truncated'] = True
+                entry['logs'] = []
+            elif not entry['truncated']:
+                entry['logs'].extend(lines)
+
+    def publish_sample(self, result_dir, epoch_ms, row):
+        sample = {'timestamp': epoch_ms}
+        for name in LIVE_COLUMNS:
+            sample[name] = row.get(name)
+        with self.lock:
+            self._entry(result_dir)['samples'].append(sample)
+
+    def close(self):
+        """停止后台线程，剩余数据立即推送一次"""
+        self.stop_event.set()
+        self.thread.join()
+
+    def _loop(self):
+        while not self.stop_event.wait(self.interval):
+            self._flush()
+        self._flush()
+
+    def _flush(self):
+        with self.lock:
+            batch, self.pending = self.pending, {}
+        if not batch:
+            return
+        events = []
+        for entry in batch.values():
+            samples = entry['samples']
+            if len(samples) > self.max_samples:
+                step = math.ceil(len(samples) / self.max_samples)
+                entry['samples'] = samples[::step]
+            events.append(entry)
+        try:
+            self.session.post(self.url, json={'events': events}, timeout=2)
+        except Exception as e:
+            logger.debug(f"Live push failed: {e}")
@@ -0,0 +1,33 @@
+import os
+
+DEFAULT_MAX_BYTES = 1024 * 1024
+
+
+def read_log_delta(path, offset=0, max_bytes=DEFAULT_MAX_BYTES):
+    """从字节偏移 offset 开始读取新增的完整行
+
+    返回 (lines, next_offset, eof)。未以换行结尾的最后一行留到下次读取；
+    单行超过 max_bytes 时按 max_bytes 截断返回，避免游标卡住。
+    文件被截断或轮转（长度小于 offset）时从头开始读。
+    """
+    if not os.path.exists(path):
+        return [], offset, True
+
+    size = os.path.getsize(path)
+    if offset > size:
+        offset = 0
+
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        chunk = f.read(max_bytes)
+
+    end = chunk.rfind(b'\n')
+    if end >= 0:
+        chunk = chunk[:end + 1]
+    elif len(chunk) < max_bytes:
+        # 只有半行，等写完再读
+        return [], offset, True
+
+    next_offset = offset + len(chunk)
+    lines = chunk.decode('utf-8', errors='replace').splitlines()
+    return lines, next_offset, next_offset >= size
@@ -0,0 +1,109 @@
+import re
+
+from utils import artifact_store
+
+# 堆树节点行: "<缩进>n<子节点数>: <字节数> <描述>"
+NODE_RE = re.compile(r'^( *)n(\d+): (\d+) (.*)$')
+# 节点描述: "0x4005F4: foo (a.c:5)"，低于阈值的合并节点没有地址
+FRAME_RE = re.compile(r'^0x[0-9A-Fa-f]+: (.*?)(?: \((.*)\))?$')
+
+
+def massif_command(cmd, output):
+    """用 massif 包装命令，时间单位为毫秒，便于和采样的内存序列对齐"""
+    return f"valgrind --tool=massif --time-unit=ms --massif-out-file={output} {cmd}"
+
+
+def _site(nbytes, text, total):
+    match = FRAME_RE.match(text)
+    fn, location = (match.group(1), match.group(2)) if match else (text, None)
+    return {
+        'bytes': nbytes,
+        'pct': nbytes / total * 100 if total else None,
+        'fn': fn,
+        'location': location
+    }
+
+
+def parse(lines, top=10):
+    """解析 massif.out（--massif-out-file 的输出）
+
+    返回 {'cmd', 'time_unit', 'series', 'peak', 'top_sites'}：series 为每个快照的
+    堆大小，peak 为峰值快照，top_sites 为峰值快照中直接调用分配函数的位置，按字节数排序。
+    峰值快照没有标记时取堆最大的详细快照；堆树只保留顶层节点。
+    """
+    header = {}
+    series = []
+    snapshot = None
+    tree_kind = None
+    # 详细快照的顶层节点：{快照序号: [(字节数, 描述), ...]}
+    trees = {}
+    peak_index = None
+
+    for line in lines:
+        line = line.rstrip('\n')
+        if line.startswith('#'):
+            continue
+        if snapshot is None and ':' in line and not line.startswith('snapshot='):
+            key, _, value = line.partition(':')
+            header[key.strip()] = value.strip()
+            continue
+        if line.startswith('snapshot='):
+            snapshot = {'snapshot': int(line[9:])}
+            series.append(snapshot)
+            tree_kind = None
+            continue
+        if snapshot is None:
+            continue
+        if line.startswith('heap_tree='):
+            tree_kind = line[10:]
+            if tree_kind == 'peak':
+                peak_index = len(series) - 1
+            continue
+        if '=' in line and not line.startswith(' ') and not line.startswith('n'):
+            key, _, value = line.partition('=')
+            try:
+                snapshot[key] = float(value) if key == 'time' else int(value)
+            except ValueError:
+                pass
+            continue
+        if tree_kind in ('peak', 'detailed'):
+            match = NODE_RE.match(line)
+            # 缩进 1 为根节点（分配函数汇总）的直接子节点
+            if match and len(match.group(1)) == 1:
+                trees.setdefault(len(series) - 1, []).append((int(match.group(3)), match.group(4)))
+
+    points = []
+    for item in series:
+        heap = item.get('mem_heap_B', 0)
+        extra = item.get('mem_heap_extra_B', 0)
+        stacks = item.get('mem_stacks_B', 0)
+        points.append({
+            'time': item.get('time', 0),
+            'heap': heap,
+            'extra': extra,
+            'stacks': stacks,
+            'total': heap + extra + stacks
+        })
+
+    if peak_index is None and trees:
+        # 程序很快结束时 massif 可能没有标记峰值快照，取堆最大的详细快照
+        peak_index = max(trees, key=lambda i: points[i]['heap'])
+    peak = None
+    top_sites = []
+    if peak_index is not None:
+        peak = {'snapshot': series[peak_index]['snapshot'], **points[peak_index]}
+        sites = sorted(trees.get(peak_index, []), reverse=True)
+        top_sites = [_site(nbytes, text, peak['heap']) for nbytes, text in sites[:top]]
+
+    return {
+        'cmd': header.get('cmd'),
+        'time_unit': header.get('time_unit'),
+        'series': points,
+        'peak': peak,
+        'top_sites': top_sites
+    }
+
+
+def read_output(path, top=10):
+    with artifact_store.open_artifact(path, 'r') as f:
+        return parse(f, top)
@@ -0,0 +1,202 @@
+"""按列追加写入的性能指标文件
+
+<result_dir>/metrics/ 目录结构：
+    header.json   版本、起始 epoch 时间、采样周期、列名及类型
+    t.bin         相对 start_epoch 的毫秒偏移（int32）
+    <列名>.bin    每列一个 float64 数组
+
+每个采样只在各列文件末尾追加固定长度的数据，写入代价与测试时长无关；
+读取时用 mmap 直接按下标切片，不需要解析整个文件。
+"""
+import json
+import math
+import mmap
+import os
+from array import array
+
+VERSION = 1
+HEADER_FILE = 'header.json'
+TIME_COLUMN = 't'
+TIME_TYPECODE = 'i'
+VALUE_TYPECODE = 'd'
+
+
+def metrics_dir(result_dir):
+    return os.path.join(result_dir, 'metrics')
+
+
+def has_metrics(result_dir):
+    return os.path.exists(os.path.join(metrics_dir(result_dir), HEADER_FILE))
+
+
+class ColumnStats:
+    """各列的滚动统计（均值、最小、最大、最后值），可以合并多个区间"""
+
+    def __init__(self, columns):
+        self.count = 0
+        self.stats = {name: {'sum': 0.0, 'min': math.inf, 'max': -math.inf, 'last': None} for name in columns}
+
+    def add(self, values):
+        for name, value in values:
+            stat = self.stats[name]
+            stat['sum'] += value
+            if value < stat['min']:
+                stat['min'] = value
+            if value > stat['max']:
+                stat['max'] = value
+            stat['last'] = value
+        self.count += 1
+
+    def merge(self, other):
+        """合并另一个区间的统计，other 视为时间上在后"""
+        for name, stat in self.stats.items():
+            theirs = other.stats[name]
+            stat['sum'] += theirs['sum']
+            stat['min'] = min(stat['min'], theirs['min'])
+            stat['max'] = max(stat['max'], theirs['max'])
+            if theirs['last'] is not None:
+                stat['last'] = theirs['last']
+        self.count += other.count
+
+    def summary(self):
+        return {
+            'samples': self.count,
+            'columns': {
+                name: {
+                    'mean': stat['sum'] / self.count,
+                    'min': stat['min'],
+                    'max': stat['max'],
+                    'last': stat['last']
+                } if self.count else None
+                for name, stat in self.stats.items()
+            }
+        }
+
+
+class MetricsWriter:
+    """追加写入器，数据先进入内存缓冲，flush 时一次性写到各列文件末尾"""
+
+    def __init__(self, directory, columns, start_epoch, period):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.columns = list(columns)
+        header = {
+            'version': VERSION,
+            'start_epoch': start_epoch,
+            'period': period,
+            'columns': {TIME_COLUMN: TIME_TYPECODE, **{name: VALUE_TYPECODE for name in self.columns}}
+        }
+        with open(os.path.join(directory, HEADER_FILE), 'w') as f:
+            json.dump(header, f)
+
+        self.files = {}
+        self.buffers = {}
+        for name, typecode in header['columns'].items():
+            self.files[name] = open(os.path.join(directory, f"{name}.bin"), 'ab')
+            self.buffers[name] = array(typecode)
+        # 每列的滚动统计，测试结束时直接作为摘要上报，不再把整段序列留在内存里
+        self.stats = ColumnStats(self.columns)
+        # 进行中的统计区间（如单个测试步骤），名称 -> ColumnStats
+        self.windows = {}
+
+    @property
+    def count(self):
+        return self.stats.count
+
+    def append(self, offset_ms, row):
+        self.buffers[TIME_COLUMN].append(offset_ms)
+        values = []
+        for name in self.columns:
+            value = float(row.get(name, 0.0))
+            self.buffers[name].append(value)
+            values.append((name, value))
+        self.stats.add(values)
+        for window in self.windows.values():
+            window.add(values)
+
+    def begin_window(self, name):
+        self.windows[name] = ColumnStats(self.columns)
+
+    def end_window(self, name):
+        """结束统计区间，返回其 ColumnStats，区间不存在时返回 None"""
+        return self.windows.pop(name, None)
+
+    def flush(self):
+        for name, buf in self.buffers.items():
+            if buf:
+                buf.tofile(self.files[name])
+                self.files[name].flush()
+                self.buffers[name] = array(buf.typecode)
+
+    def close(self):
+        self.flush()
+        for f in self.files.values():
+            f.close()
+
+    def summary(self):
+        return self.stats.summary()
+
+
+class MetricsReader:
+    """通过 mmap 读取指标列，行数取各列长度的最小值（容忍写到一半的尾部）"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, HEADER_FILE)) as f:
+            self.header = json.load(f)
+        self.start_epoch = self.header['start_epoch']
+        self.period = self.header['period']
+        self.columns = [name for name in self.header['columns'] if name != TIME_COLUMN]
+        self._maps = {}
+
+    def _view(self, name):
+        if name not in self._maps:
+            typecode = self.header['columns'][name]
+            path = os.path.join(self.directory, f"{name}.bin")
+            itemsize = array(typecode).itemsize
+            size = os.path.getsize(path) // itemsize * itemsize
+            if size == 0:
+                self._maps[name] = (None, memoryview(b'').cast('B').cast(typecode))
+            else:
+                with open(path, 'rb') as f:
+                    mm = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+                self._maps[name] = (mm, memoryview(mm).cast(typecode))
+        return self._maps[name][1]
+
+    def __len__(self):
+        return min(len(self._view(name)) for name in self.header['columns'])
+
+    def column(self, name, start=0, stop=None, step=1):
+        stop = len(self) if stop is None else min(stop, len(self))
+        return self._view(name)[start:stop:step].tolist()
+
+    def timestamps(self, start=0, stop=None, step=1):
+        """采样时刻的 epoch 毫秒值"""
+        base = int(self.start_epoch * 1000)
+        return [base + offset for offset in self.column(TIME_COLUMN, start, stop, step)]
+
+    def index_at(self, epoch_ms):
+        """第一个不早于 epoch_ms 的采样下标（二分查找）"""
+        target = epoch_ms - int(self.start_epoch * 1000)
+        view = self._view(TIME_COLUMN)
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if view[mid] < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def close(self):
+        for mm, view in self._maps.values():
+            view.release()
+            if mm is not None:
+                mm.close()
+        self._maps = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,158 @@
+import re
+
+# 采样调用栈的方式：fp 开销最小但依赖帧指针，dwarf 栈准确但 perf.data 大，lbr 需要 Intel CPU 支持
+CALL_GRAPHS = ('fp', 'dwarf', 'lbr')
+# 采样范围：process 跟随被测命令及其子进程，per-thread 按线程采样（不占用每个 CPU 的缓冲区），system 采集全部 CPU
+SCOPES = ('process', 'per-thread', 'system')
+# 可选的采样事件
+EVENTS = (
+    'cycles', 'instructions', 'cache-misses', 'cache-references', 'branch-misses',
+    'page-faults', 'context-switches', 'cpu-clock', 'task-clock'
+)
+# --max-size 的格式，如 "512M"、"2G"
+SIZE_RE = re.compile(r'^\d+[BKMG]?$')
+# --switch-output 按时间切出，如 "30s"、"5m"
+SWITCH_OUTPUT_RE = re.compile(r'^\d+[smhd]$')
+
+# 命名的 perf record 配置，profiling_config 中用 perf_profile 选择，perf_options 覆盖单项
+PROFILES = {
+    'default': {
+        'description': '99 Hz 帧指针调用栈，开销小',
+        'frequency': 99,
+        'call_graph': 'fp',
+        'events': ['cycles'],
+        'scope': 'process',
+        'max_size': None,
+        'switch_output': None
+    },
+    'low-overhead': {
+        'description': '49 Hz 低频采样，适合对开销敏感的基准',
+        'frequency': 49,
+        'call_graph': 'fp',
+        'events': ['cycles'],
+        'scope': 'process',
+        'max_size': None,
+        'switch_output': None
+    },
+    'accurate-stacks': {
+        'description': 'DWARF 展开调用栈，适合没有帧指针的构建，perf.data 较大',
+        'frequency': 99,
+        'call_graph': 'dwarf',
+        'events': ['cycles'],
+        'scope': 'process',
+        'max_size': '1G',
+        'switch_output': None
+    },
+    'lbr': {
+        'description': 'LBR 调用栈，开销小且不依赖帧指针，需要 CPU 支持',
+        'frequency': 499,
+        'call_graph': 'lbr',
+        'events': ['cycles'],
+        'scope': 'process',
+        'max_size': None,
+        'switch_output': None
+    },
+    'cache-misses': {
+        'description': '按缓存未命中事件采样',
+        'frequency': 499,
+        'call_graph': 'fp',
+        'events': ['cache-misses'],
+        'scope': 'process',
+        'max_size': None,
+        'switch_output': None
+    },
+    'page-faults': {
+        'description': '按缺页事件采样，定位内存首次访问',
+        'frequency': 99,
+        'call_graph': 'fp',
+        'events': ['page-faults'],
+        'scope': 'process',
+        'max_size': None,
+        'switch_output': None
+    },
+    'system-wide': {
+        'description': '采集所有 CPU，包括被测命令之外的进程和中断',
+        'frequency': 99,
+        'call_graph': 'fp',
+        'events': ['cycles'],
+        'scope': 'system',
+        'max_size': '2G',
+        'switch_output': None
+    },
+    'continuous': {
+        'description': '长时间运行时每 30 秒切出一块，运行中即可查看累计和各时间窗口的火焰图',
+        'frequency': 99,
+        'call_graph': 'fp',
+        'events': ['cycles'],
+        'scope': 'process',
+        'max_size': None,
+        'switch_output': '30s'
+    }
+}
+DEFAULT_PROFILE = 'default'
+DWARF_STACK_SIZE = 8192  # dwarf 模式每个样本复制的栈字节数
+
+
+def resolve_profile(profiling_config):
+    """根据 profiling_config 得到实际使用的 perf record 配置，非法配置抛出 ValueError
+
+    没有 perf_profile 的旧用例使用 default，perf_frequency 作为采样频率。
+    """
+    config = profiling_config or {}
+    name = config.get('perf_profile') or DEFAULT_PROFILE
+    if name not in PROFILES:
+        raise ValueError(f"Unknown perf profile: {name}")
+    profile = {key: value for key, value in PROFILES[name].items() if key != 'description'}
+    if not config.get('perf_profile') and config.get('perf_frequency'):
+        profile['frequency'] = config['perf_frequency']
+    for key, value in (config.get('perf_options') or {}).items():
+        if key in profile and value not in (None, '', []):
+            profile[key] = value
+
+    try:
+        profile['frequency'] = int(profile['frequency'])
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid perf frequency: {profile['frequency']}")
+    if not 1 <= profile['frequency'] <= 100000:
+        raise ValueError(f"Invalid perf frequency: {profile['frequency']}")
+    if profile['call_graph'] not in CALL_GRAPHS:
+        raise ValueError(f"Invalid call graph mode: {profile['call_graph']}")
+    if profile['scope'] not in SCOPES:
+        raise ValueError(f"Invalid perf scope: {profile['scope']}")
+    events = profile['events']
+    if isinstance(events, str):
+        events = [events]
+    unknown = [event for event in events if event not in EVENTS]
+    if unknown or not events:
+        raise ValueError(f"Invalid perf events: {', '.join(unknown) or 'empty'}")
+    profile['events'] = list(events)
+    if profile['max_size'] is not None:
+        profile['max_size'] = str(profile['max_size']).upper()
+        if not SIZE_RE.match(profile['max_size']):
+            raise ValueError(f"Invalid perf max size: {profile['max_size']}")
+    if profile['switch_output'] is not None:
+        profile['switch_output'] = str(profile['switch_output']).lower()
+        if not SWITCH_OUTPUT_RE.match(profile['switch_output']):
+            raise ValueError(f"Invalid perf switch output interval: {profile['switch_output']}")
+    return {'name': name, **profile}
+
+
+def record_command(cmd, output, profile):
+    """按配置生成 perf record 命令"""
+    args = ['perf record', f"-F {profile['frequency']}", f"-e {','.join(profile['events'])}"]
+    if profile['call_graph'] == 'dwarf':
+        args.append(f"--call-graph dwarf,{DWARF_STACK_SIZE}")
+    else:
+        args.append(f"--call-graph {profile['call_graph']}")
+    if profile['scope'] == 'system':
+        args.append('-a')
+    elif profile['scope'] == 'per-thread':
+        args.append('--per-thread')
+    if profile['max_size']:
+        # 超过上限时 perf 停止写入，测试本身继续运行
+        args.append(f"--max-size={profile['max_size']}")
+    if profile['switch_output']:
+        # 连续分析模式，按时间切出 perf.data.<时间戳>，见 live_profile
+        args.append(f"--switch-output={profile['switch_output']}")
+    args.append(f"-o {output} -- {cmd}")
+    return ' '.join(args)
@@ -0,0 +1,74 @@
+import re
+
+# 默认采集的计数器，不支持的事件 perf 会输出 <not supported>，解析时记为 None
+EVENTS = (
+    'cycles', 'instructions', 'branches', 'branch-misses',
+    'cache-references', 'cache-misses', 'LLC-loads', 'LLC-load-misses',
+    'context-switches', 'cpu-migrations', 'page-faults', 'task-clock'
+)
+
+# 事件名可能带 PMU 前缀和修饰符，如 "cpu_core/cycles/"、"cpu_core/cycles/u"、"instructions:u"
+EVENT_RE = re.compile(r'^(?:[\w.-]+/)?([^/:]+)(?::\w+)?/?(?::?\w+)?$')
+
+# 派生指标：名称 -> (分子, 分母, 倍数)
+DERIVED = {
+    'ipc': ('instructions', 'cycles', 1),
+    'branch_miss_rate': ('branch-misses', 'branches', 100),
+    'cache_miss_rate': ('cache-misses', 'cache-references', 100),
+    'llc_miss_rate': ('LLC-load-misses', 'LLC-loads', 100),
+    'branch_mpki': ('branch-misses', 'instructions', 1000),
+    'cache_mpki': ('cache-misses', 'instructions', 1000)
+}
+
+
+def stat_command(cmd, output, events=EVENTS):
+    """用 perf stat 包装命令，CSV 格式的计数结果写入 output"""
+    return f"perf stat -x, -o {output} -e {','.join(events)} -- {cmd}"
+
+
+def _event_name(raw):
+    match = EVENT_RE.match(raw.strip())
+    return match.group(1) if match else raw.strip()
+
+
+def parse_output(lines):
+    """解析 perf stat -x, 的输出
+
+    每行格式为 "值,单位,事件,运行时间,运行占比,..."；混合架构上同一事件按 PMU
+    分多行输出，这里累加。返回 {'counters', 'running_pct', 'derived'}，
+    running_pct 小于 100 说明该事件被复用，值是按比例估算的。
+    """
+    counters = {}
+    running_pct = {}
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        fields = line.split(',')
+        if len(fields) < 3:
+            continue
+        name = _event_name(fields[2])
+        try:
+            value = float(fields[0])
+        except ValueError:
+            # <not supported> / <not counted>
+            counters.setdefault(name, None)
+            continue
+        counters[name] = (counters.get(name) or 0) + value
+        if len(fields) > 4 and fields[4]:
+            try:
+                pct = float(fields[4])
+            except ValueError:
+                continue
+            running_pct[name] = min(running_pct.get(name, 100.0), pct)
+
+    derived = {}
+    for key, (numerator, denominator, scale) in DERIVED.items():
+        top, bottom = counters.get(numerator), counters.get(denominator)
+        derived[key] = top / bottom * scale if top is not None and bottom else None
+    return {'counters': counters, 'running_pct': running_pct, 'derived': derived}
+
+
+def read_output(path):
+    with open(path, 'r', errors='replace') as f:
+        return parse_output(f)
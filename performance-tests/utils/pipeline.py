@@ -0,0 +1,107 @@
+from utils import stats
+
+SETUP = 'setup'
+WARMUP = 'warmup'
+MEASURE = 'measure'
+TEARDOWN = 'teardown'
+KINDS = (SETUP, WARMUP, MEASURE, TEARDOWN)
+
+
+class Step:
+    """测试用例中的一行命令"""
+
+    def __init__(self, index, kind, command):
+        self.index = index
+        self.kind = kind
+        self.command = command
+
+    @property
+    def measured(self):
+        return self.kind == MEASURE
+
+    def to_dict(self):
+        return {'index': self.index, 'kind': self.kind, 'command': self.command}
+
+
+def parse_steps(command):
+    """把多行命令解析为步骤列表
+
+    每行可以带 "setup:"、"warmup:"、"measure:"、"teardown:" 前缀，
+    不带前缀的行视为被测步骤；空行和以 # 开头的行忽略。
+    """
+    steps = []
+    for line in command.split('\n'):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        kind = MEASURE
+        prefix, sep, rest = line.partition(':')
+        if sep and prefix.strip().lower() in KINDS:
+            kind = prefix.strip().lower()
+            line = rest.strip()
+            if not line:
+                continue
+        steps.append(Step(len(steps) + 1, kind, line))
+    return steps
+
+
+class IterationPlan:
+    """被测步骤的重复执行方式，来自测试用例的 parameters
+
+    - warmup_iterations: 正式计时前执行的次数，不计入统计
+    - iterations: 固定执行次数
+    - target_ci_pct: 自适应模式，耗时均值的置信区间半宽不超过该百分比时停止，
+      次数限制在 min_iterations 与 max_iterations 之间
+    """
+
+    def __init__(self, warmup=0, iterations=1, target_ci_pct=None,
+                 min_iterations=5, max_iterations=50, confidence=0.95):
+        self.warmup = max(int(warmup), 0)
+        self.iterations = max(int(iterations), 1)
+        self.target_ci_pct = float(target_ci_pct) if target_ci_pct else None
+        self.min_iterations = max(int(min_iterations), 2)
+        self.max_iterations = max(int(max_iterations), self.min_iterations)
+        self.confidence = float(confidence)
+
+    @classmethod
+    def from_parameters(cls, parameters):
+        """没有任何迭代参数时返回 None，保持单次执行"""
+        parameters = parameters or {}
+        keys = ('warmup_iterations', 'iterations', 'target_ci_pct')
+        if not any(parameters.get(key) for key in keys):
+            return None
+        return cls(
+            warmup=parameters.get('warmup_iterations') or 0,
+            iterations=parameters.get('iterations') or 1,
+            target_ci_pct=parameters.get('target_ci_pct'),
+            min_iterations=parameters.get('min_iterations') or 5,
+            max_iterations=parameters.get('max_iterations') or 50,
+            confidence=parameters.get('confidence') or 0.95
+        )
+
+    @property
+    def mode(self):
+        return 'adaptive' if self.target_ci_pct else 'fixed'
+
+    def done(self, wall_times):
+        """根据已完成迭代的耗时判断是否停止"""
+        n = len(wall_times)
+        if self.target_ci_pct is None:
+            return n >= self.iterations
+        if n >= self.max_iterations:
+            return True
+        if n < self.min_iterations:
+            return False
+        ci_pct = stats.summarize(wall_times, self.confidence)['ci_pct']
+        return ci_pct is None or ci_pct <= self.target_ci_pct
+
+    def to_dict(self):
+        return {
+            'mode': self.mode,
+            'warmup_iterations': self.warmup,
+            'iterations': self.iterations if self.mode == 'fixed' else None,
+            'target_ci_pct': self.target_ci_pct,
+            'min_iterations': self.min_iterations if self.mode == 'adaptive' else None,
+            'max_iterations': self.max_iterations if self.mode == 'adaptive' else None,
+            'confidence': self.confidence
+        }
@@ -0,0 +1,197 @@
+import json
+import multiprocessing
+import os
+import subprocess
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from utils import artifact_store
+
+PENDING = 'pending'
+READY = 'ready'
+FAILED = 'failed'
+
+MANIFEST = 'artifacts.json'
+
+
+def _init_worker(cpus, nice):
+    """工作进程降低优先级，并绑定到预留 CPU，避免和正在运行的测试抢核"""
+    try:
+        os.nice(nice)
+    except OSError:
+        pass
+    allowed = [cpu for cpu in cpus if cpu in os.sched_getaffinity(0)]
+    if allowed:
+        os.sched_setaffinity(0, allowed)
+
+
+# 以下为在工作进程中执行的任务，参数和返回值都需要能被 pickle
+
+def perf_flamegraph(perf_data, step_dir, title, symcache_dir=None, event=None):
+    """折叠 perf script 输出，生成 perf.folded、火焰图 SVG 和 JSON
+
+    symcache_dir 为跨运行的符号表缓存；采样了多个事件时只用 event 的样本。
+    """
+    from utils import flamegraph
+    stacks = flamegraph.collapse_perf_data(perf_data, symcache_dir, event)
+    flamegraph.write_folded(stacks, os.path.join(step_dir, 'perf.folded'))
+    flamegraph.render_svg(stacks, os.path.join(step_dir, 'flamegraph.svg'), title=title)
+    flamegraph.write_json(stacks, os.path.join(step_dir, 'flamegraph.json'))
+    return {'samples': sum(stacks.values())}
+
+
+def perf_chunk(chunk, folded_path, symcache_dir=None, event=None):
+    """连续分析模式下折叠一个切出的 perf.data 块"""
+    from utils import live_profile
+    stacks = live_profile.collapse_chunk(chunk, folded_path, symcache_dir, event)
+    return {'samples': sum(stacks.values())}
+
+
+def live_flamegraph(step_dir, title, started_at, symcache_dir=None, event=None):
+    """连续分析模式结束后合并所有窗口，生成与普通模式相同的 perf.folded、火焰图 SVG 和 JSON"""
+    from utils import flamegraph, live_profile
+    stacks = live_profile.finalize(step_dir, started_at, symcache_dir, event)
+    flamegraph.write_folded(stacks, os.path.join(step_dir, 'perf.folded'))
+    flamegraph.render_svg(stacks, os.path.join(step_dir, 'flamegraph.svg'), title=title)
+    flamegraph.write_json(stacks, os.path.join(step_dir, 'flamegraph.json'))
+    return {'samples': sum(stacks.values())}
+
+
+def shell_to_file(cmd, output):
+    """执行命令并把标准输出写入 output，失败时抛出异常"""
+    with open(output, 'w') as f:
+        completed = subprocess.run(cmd, shell=True, stdout=f, stderr=subprocess.PIPE, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip()[-500:] or f"exit code {completed.returncode}")
+    return {}
+
+
+def callgrind_graph(callgrind_json, svg_path):
+    """用裁剪后的调用图生成 SVG，节点数有上限，dot 布局很快"""
+    import json
+    from utils import callgrind
+    with open(callgrind_json, 'r') as f:
+        summary = json.load(f)
+    if not summary['graph']['nodes']:
+        raise RuntimeError('no functions above the cost threshold')
+    callgrind.render_svg(summary, svg_path)
+    return {'nodes': len(summary['graph']['nodes']), 'edges': len(summary['graph']['edges'])}
+
+
+def memcheck_report(valgrind_xml, step_dir):
+    """一次解析 valgrind XML，生成文本报告、错误摘要 JSON、错误调用图和 heap.svg"""
+    from utils import heap_svg
+    from utils import valgrind_xml as parser
+    summary = parser.process(valgrind_xml, os.path.join(step_dir, 'memcheck_report.txt'))
+    parser.write_summary(summary, os.path.join(step_dir, 'memcheck.json'))
+    info = {
+        'errors': summary['errors'],
+        'groups': summary['total_groups'],
+        'truncated': summary['truncated'],
+        'heap': heap_svg.generate_memory_svg(step_dir, summary)
+    }
+    try:
+        info['graph'] = parser.render_graph(summary, os.path.join(step_dir, 'memcheck_graph.svg'))
+    except Exception as e:
+        # 调用图依赖 graphviz，失败不影响报告
+        info['graph'] = False
+        info['graph_error'] = str(e)
+    return info
+
+
+def heap_graph(step_dir):
+    from utils import heap_svg
+    if not heap_svg.generate_memory_svg(step_dir):
+        raise RuntimeError('no heap summary in valgrind log')
+    return {}
+
+
+class PostProcessor:
+    """性能分析产物的后台生成
+
+    任务在有界的进程池中执行，测试在被测进程退出后即可上报完成。每个结果的
+    profile/artifacts.json 记录各产物的状态（pending / ready / failed），
+    供 backend 查询。步骤被 seal 且其任务全部结束后，再提交一个压缩原始数据的任务。
+    """
+
+    def __init__(self, max_workers=2, cpus=(), nice=10):
+        # 测试服务器是多线程的，用 spawn 启动工作进程，避免 fork 时复制锁状态
+        self.executor = ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(list(cpus), nice)
+        )
+        self.lock = threading.Lock()
+        # (profile_dir, 分组) -> 未完成的任务数；分组为名称中 "/" 之前的部分，即 step_N
+        self.outstanding = {}
+        # (profile_dir, 分组) -> 待压缩的目录
+        self.sealed = {}
+        self.group_lock = threading.Lock()
+
+    def submit(self, profile_dir, name, path, fn, *args):
+        """提交一个产物任务，name 在同一 profile 目录内唯一
+
+        path 为产物文件，一个任务生成多个文件时传入列表，第一个为主产物，
+        全部记录在清单的 outputs 中。
+        """
+        key = (profile_dir, name.split('/', 1)[0])
+        with self.group_lock:
+            self.outstanding[key] = self.outstanding.get(key, 0) + 1
+        outputs = list(path) if isinstance(path, (list, tuple)) else [path]
+        self._update(profile_dir, name, {
+            'status': PENDING, 'path': outputs[0], 'outputs': outputs, 'submitted_at': time.time()
+        })
+        future = self.executor.submit(fn, *args)
+        future.add_done_callback(lambda f: self._finish(profile_dir, name, f))
+        return future
+
+    def seal(self, profile_dir, group, directory):
+        """该分组不会再提交新任务，已提交的任务全部结束后压缩 directory 中的原始数据"""
+        with self.group_lock:
+            self.sealed[(profile_dir, group)] = directory
+        self._compress_when_idle((profile_dir, group))
+
+    def _finish(self, profile_dir, name, future):
+        error = future.exception()
+        if error is None:
+            fields = {'status': READY, 'info': future.result() or {}}
+        else:
+            fields = {'status': FAILED, 'error': str(error)}
+        fields['finished_at'] = time.time()
+        self._update(profile_dir, name, fields)
+
+        key = (profile_dir, name.split('/', 1)[0])
+        with self.group_lock:
+            self.outstanding[key] -= 1
+            if self.outstanding[key] == 0:
+                del self.outstanding[key]
+        self._compress_when_idle(key)
+
+    def _compress_when_idle(self, key):
+        with self.group_lock:
+            if key in self.outstanding or key not in self.sealed:
+                return
+            directory = self.sealed.pop(key)
+        profile_dir, group = key
+        self.submit(profile_dir, f"{group}/compress", directory, artifact_store.compress_tree, directory)
+
+    def _update(self, profile_dir, name, fields):
+        """合并更新清单中的一项，先写临时文件再替换，读取方不会看到半个文件"""
+        with self.lock:
+            manifest = read_manifest(profile_dir)
+            manifest.setdefault(name, {}).update(fields)
+            path = os.path.join(profile_dir, MANIFEST)
+            tmp = f"{path}.tmp"
+            with open(tmp, 'w') as f:
+                json.dump(manifest, f)
+            os.replace(tmp, path)
+
+
+def read_manifest(profile_dir):
+    try:
+        with open(os.path.join(profile_dir, MANIFEST), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
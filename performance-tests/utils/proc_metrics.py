@@ -0,0 +1,176 @@
+import os
+
+CLK_TCK = os.sysconf('SC_CLK_TCK')
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+
+
+def read_stat(pid):
+    """解析 /proc/<pid>/stat，进程不存在时返回 None"""
+    try:
+        with open(f"/proc/{pid}/stat", 'rb') as f:
+            stat = f.read()
+    except OSError:
+        return None
+    # comm 字段可能包含空格，从最后一个 ')' 之后开始切分，fields[0] 是 state
+    fields = stat[stat.rfind(b')') + 2:].split()
+    if fields[0] in (b'Z', b'X'):
+        return None
+    return {
+        'ppid': int(fields[1]),
+        'minor_faults': int(fields[7]),
+        'major_faults': int(fields[9]),
+        'cpu_user': int(fields[11]) / CLK_TCK,
+        'cpu_system': int(fields[12]) / CLK_TCK,
+        'num_threads': int(fields[17]),
+        'start_time': int(fields[19]),
+        'rss': int(fields[21]) * PAGE_SIZE
+    }
+
+
+def read_io(pid):
+    """/proc/<pid>/io 中实际落盘的读写字节数，无权限时返回 0"""
+    read_bytes = write_bytes = 0
+    try:
+        with open(f"/proc/{pid}/io", 'rb') as f:
+            for line in f:
+                if line.startswith(b'read_bytes:'):
+                    read_bytes = int(line.split()[1])
+                elif line.startswith(b'write_bytes:'):
+                    write_bytes = int(line.split()[1])
+    except OSError:
+        pass
+    return read_bytes, write_bytes
+
+
+def count_fds(pid):
+    try:
+        return len(os.listdir(f"/proc/{pid}/fd"))
+    except OSError:
+        return 0
+
+
+def read_pss(pid):
+    """从 smaps_rollup 读取 PSS（字节），代价较高，由调用方控制频率"""
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", 'rb') as f:
+            for line in f:
+                if line.startswith(b'Pss:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def list_children(pid):
+    """通过 /proc/<pid>/task/*/children 获取直接子进程，内核不支持时返回 None"""
+    children = []
+    try:
+        tids = os.listdir(f"/proc/{pid}/task")
+    except OSError:
+        return children
+    for tid in tids:
+        try:
+            with open(f"/proc/{pid}/task/{tid}/children", 'rb') as f:
+                children.extend(int(child) for child in f.read().split())
+        except FileNotFoundError:
+            if not os.path.exists(f"/proc/{pid}/task/{tid}"):
+                continue
+            return None
+        except OSError:
+            continue
+    return children
+
+
+def _scan_children(root_pids):
+    """遍历 /proc 按 ppid 建立进程树，用于不支持 children 文件的内核"""
+    by_parent = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        stat = read_stat(entry)
+        if stat is not None:
+            by_parent.setdefault(stat['ppid'], []).append(int(entry))
+    tree = []
+    stack = list(root_pids)
+    while stack:
+        pid = stack.pop()
+        tree.append(pid)
+        stack.extend(by_parent.get(pid, []))
+    return tree
+
+
+def walk_tree(root_pids):
+    """返回根进程及其所有后代的 pid 列表"""
+    tree = []
+    stack = list(root_pids)
+    while stack:
+        pid = stack.pop()
+        children = list_children(pid)
+        if children is None:
+            return _scan_children(root_pids)
+        tree.append(pid)
+        stack.extend(children)
+    return tree
+
+
+class ProcessTreeSampler:
+    """对一组根进程及其全部子进程采样
+
+    累计型计数（CPU 时间、缺页、I/O 字节）按 (pid, 启动时间) 记住最后一次读数，
+    子进程退出后其贡献不会从总量中消失。
+    """
+
+    COUNTERS = ('cpu_user', 'cpu_system', 'minor_faults', 'major_faults', 'read_bytes', 'write_bytes')
+
+    def __init__(self):
+        self.counters = {}
+        self.pss = {}
+        self.prev_cpu = None
+        self.prev_time = None
+
+    def sample(self, root_pids, now, with_pss=False):
+        """返回这棵进程树当前的聚合指标，now 为单调时钟时间"""
+        rss = threads = fds = alive = 0
+        pss_seen = {}
+        for pid in walk_tree(root_pids):
+            stat = read_stat(pid)
+            if stat is None:
+                continue
+            key = (pid, stat['start_time'])
+            read_bytes, write_bytes = read_io(pid)
+            self.counters[key] = {
+                'cpu_user': stat['cpu_user'],
+                'cpu_system': stat['cpu_system'],
+                'minor_faults': stat['minor_faults'],
+                'major_faults': stat['major_faults'],
+                'read_bytes': read_bytes,
+                'write_bytes': write_bytes
+            }
+            rss += stat['rss']
+            threads += stat['num_threads']
+            fds += count_fds(pid)
+            alive += 1
+            pss_seen[key] = read_pss(pid) if with_pss else self.pss.get(key, 0)
+        self.pss = pss_seen
+
+        totals = dict.fromkeys(self.COUNTERS, 0)
+        for counters in self.counters.values():
+            for key in self.COUNTERS:
+                totals[key] += counters[key]
+
+        cpu_total = totals['cpu_user'] + totals['cpu_system']
+        cpu_percent = 0.0
+        if self.prev_time is not None and now > self.prev_time:
+            cpu_percent = max(cpu_total - self.prev_cpu, 0.0) / (now - self.prev_time) * 100
+        self.prev_cpu = cpu_total
+        self.prev_time = now
+
+        return {
+            'cpu_percent': cpu_percent,
+            **totals,
+            'rss': rss,
+            'pss': sum(pss_seen.values()),
+            'num_threads': threads,
+            'num_fds': fds,
+            'num_procs': alive
+        }
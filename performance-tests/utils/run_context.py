@@ -0,0 +1,61 @@
+import os
+import shlex
+
+from utils import perf_record
+from utils.cpu_alloc import can_bind_memory, format_cpulist
+from utils.pipeline import IterationPlan
+
+PROFILING_TOOLS = ('perf', 'perfstat', 'valgrind', 'massif', 'callgrind')
+
+
+class RunContext:
+    """单次测试运行的状态
+
+    性能分析开关、CPU 绑定等都属于某一次运行，并发运行的测试互不覆盖。
+    """
+
+    def __init__(self, test_id, command, timestamp, result_dir, enable_profiling=False, profiling_config=None,
+                 parameters=None):
+        self.test_id = test_id
+        self.command = command
+        self.timestamp = timestamp
+        self.result_dir = result_dir
+        self.profile_dir = os.path.join(result_dir, 'profile')
+        self.enable_profiling = bool(enable_profiling)
+        self.profiling_config = profiling_config or {}
+        # tools 可以是单个工具名或工具名列表
+        tools = self.profiling_config.get('tools') or []
+        if isinstance(tools, str):
+            tools = [tools]
+        self.profiling_tools = {name: name in tools for name in PROFILING_TOOLS}
+        # 实际使用的 perf record 配置，记录在结果中；配置非法时抛出 ValueError
+        self.perf_profile = perf_record.resolve_profile(self.profiling_config) if self.profiling_tools['perf'] else None
+        # 连续分析模式下运行中的增量火焰图目录：{profile_key: live 目录}
+        self.live_dirs = {}
+        self.parameters = parameters or {}
+        # 没有迭代参数时为 None，被测步骤只执行一次
+        self.iteration_plan = IterationPlan.from_parameters(self.parameters)
+        # allocate 之后为 {'cpus', 'numa_nodes'}，未绑定时为 None
+        self.placement = None
+        self.status = 'queued'
+        self.cancelled = False
+
+    def set_placement(self, placement):
+        self.placement = placement
+        if placement:
+            placement['cpulist'] = format_cpulist(placement['cpus'])
+            # 内存绑定到分配的节点需要 numactl；为 None 时只限制了 CPU，内存仍可能分配在其他节点
+            nodes = placement['numa_nodes']
+            placement['membind'] = format_cpulist(nodes) if can_bind_memory(nodes) else None
+
+    def wrap_command(self, cmd):
+        """实际执行的命令，绑定了内存节点时用 numactl 启动，子进程继承内存策略"""
+        if self.placement and self.placement.get('membind'):
+            return f"numactl --membind={self.placement['membind']} -- /bin/sh -c {shlex.quote(cmd)}"
+        return cmd
+
+    def preexec(self):
+        """在子进程 exec 之前执行：新建进程组，并绑定到分配的 CPU"""
+        os.setsid()
+        if self.placement:
+            os.sched_setaffinity(0, self.placement['cpus'])
@@ -0,0 +1,198 @@
+import logging
+import threading
+import time
+
+import psutil
+
+from utils.metrics_store import ColumnStats, MetricsWriter
+from utils.proc_metrics import ProcessTreeSampler
+
+logger = logging.getLogger('TestServer')
+
+MIN_PERIOD = 0.01
+
+HOST_COLUMNS = [
+    'host_cpu',
+    'host_memory',
+    'disk_read_bytes',
+    'disk_write_bytes',
+    'net_bytes_sent',
+    'net_bytes_recv'
+]
+PROCESS_FIELDS = [
+    'cpu_percent',
+    'cpu_user',
+    'cpu_system',
+    'minor_faults',
+    'major_faults',
+    'read_bytes',
+    'write_bytes',
+    'rss',
+    'pss',
+    'num_threads',
+    'num_fds',
+    'num_procs'
+]
+SAMPLER_COLUMNS = ['drift', 'overhead', 'missed']
+COLUMNS = HOST_COLUMNS + [f"proc_{field}" for field in PROCESS_FIELDS] + SAMPLER_COLUMNS
+
+
+class RunSeries:
+    """单个测试在采样线程中的状态，数据直接追加到 metrics 目录"""
+
+    def __init__(self, root_pids, directory, period, disk_io, net_io, on_sample=None):
+        self.root_pids = root_pids
+        self.directory = directory
+        self.tree = ProcessTreeSampler()
+        self.disk_io_start = disk_io
+        self.net_io_start = net_io
+        self.start_monotonic = time.monotonic()
+        self.start_epoch = time.time()
+        self.writer = MetricsWriter(directory, COLUMNS, self.start_epoch, period)
+        self.on_sample = on_sample
+        # 被测步骤区间的合并统计，作为测试结果的指标摘要
+        self.measured = ColumnStats(COLUMNS)
+        # 当前 tick 采到但还未写入的一行，tick 结束补上调度偏差后追加
+        self.row = None
+
+
+class Sampler:
+    """所有运行中测试共用的一个采样线程
+
+    按固定 tick 调度（不随采样耗时漂移），每个 tick 读取一次主机指标，
+    再依次读取每个活动测试的进程树。错过的 tick 直接跳过并计数。
+    """
+
+    def __init__(self, period=0.05, flush_interval=1.0, pss_interval=1.0):
+        self.period = max(float(period), MIN_PERIOD)
+        self.flush_every = max(int(round(flush_interval / self.period)), 1)
+        self.pss_every = max(int(round(pss_interval / self.period)), 1)
+        self.runs = {}
+        self.lock = threading.Lock()
+        # 采样线程在整个 tick 内持有，unregister 等当前 tick 结束后再关闭写入器
+        self.tick_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread = None
+
+    def register(self, key, root_pids, directory, on_sample=None):
+        """开始采样，root_pids 为返回当前根进程 pid 列表的函数
+
+        on_sample(epoch_ms, row) 在每行写入后于采样线程中调用，需保持轻量。
+        """
+        series = RunSeries(root_pids, directory, self.period,
+                           psutil.disk_io_counters(), psutil.net_io_counters(), on_sample)
+        with self.lock:
+            self.runs[key] = series
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._loop, name='sampler', daemon=True)
+                self.thread.start()
+        self.wakeup.set()
+        return series
+
+    def unregister(self, key):
+        """停止采样、关闭文件并返回各列摘要，key 不存在时返回 None
+
+        columns 为整个运行期间的统计，measured 只包含被测步骤区间。
+        """
+        with self.tick_lock, self.lock:
+            series = self.runs.pop(key, None)
+        if series is None:
+            return None
+        series.writer.close()
+        return {
+            'metrics_dir': series.directory,
+            'period': self.period,
+            **series.writer.summary(),
+            'measured': series.measured.summary()
+        }
+
+    def begin_window(self, key, name):
+        """开始一个统计区间，返回区间起点（epoch 毫秒）"""
+        with self.tick_lock, self.lock:
+            series = self.runs.get(key)
+            if series is not None:
+                series.writer.begin_window(name)
+        return int(time.time() * 1000)
+
+    def end_window(self, key, name, measured=False):
+        """结束统计区间并返回摘要；measured 为 True 时计入测试结果的指标摘要"""
+        with self.tick_lock, self.lock:
+            series = self.runs.get(key)
+            window = series.writer.end_window(name) if series is not None else None
+            if window is None:
+                return None
+            if measured:
+                series.measured.merge(window)
+        return {'end_ms': int(time.time() * 1000), **window.summary()}
+
+    def _loop(self):
+        next_tick = time.monotonic()
+        tick = 0
+        while True:
+            with self.lock:
+                runs = list(self.runs.values())
+            if not runs:
+                # 没有运行中的测试时挂起，注册新测试后从当前时刻重新对齐 tick
+                self.wakeup.wait()
+                self.wakeup.clear()
+                next_tick = time.monotonic()
+                continue
+
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+            with self.tick_lock:
+                with self.lock:
+                    runs = list(self.runs.values())
+                started = time.monotonic()
+                drift = started - next_tick
+                try:
+                    self._sample(runs, started, tick)
+                except Exception as e:
+                    logger.error(f"Sampler tick failed: {e}", exc_info=True)
+                overhead = time.monotonic() - started
+
+                tick += 1
+                next_tick += self.period
+                missed = 0
+                lag = time.monotonic() - next_tick
+                if lag > 0:
+                    missed = int(lag // self.period) + 1
+                    next_tick += missed * self.period
+
+                for series in runs:
+                    if series.row is None:
+                        continue
+                    series.row.update(drift=drift, overhead=overhead, missed=missed)
+                    offset_ms = int((started - series.start_monotonic) * 1000)
+                    series.writer.append(offset_ms, series.row)
+                    if series.on_sample is not None:
+                        try:
+                            series.on_sample(int(series.start_epoch * 1000) + offset_ms, series.row)
+                        except Exception as e:
+                            logger.debug(f"Sample callback failed: {e}")
+                    series.row = None
+                    if tick % self.flush_every == 0:
+                        series.writer.flush()
+
+    def _sample(self, runs, now, tick):
+        cpu_percent = psutil.cpu_percent(interval=None)
+        memory_percent = psutil.virtual_memory().percent
+        disk_io = psutil.disk_io_counters()
+        net_io = psutil.net_io_counters()
+        with_pss = tick % self.pss_every == 0
+
+        for series in runs:
+            row = {
+                'host_cpu': cpu_percent,
+                'host_memory': memory_percent,
+                'disk_read_bytes': disk_io.read_bytes - series.disk_io_start.read_bytes,
+                'disk_write_bytes': disk_io.write_bytes - series.disk_io_start.write_bytes,
+                'net_bytes_sent': net_io.bytes_sent - series.net_io_start.bytes_sent,
+                'net_bytes_recv': net_io.bytes_recv - series.net_io_start.bytes_recv
+            }
+            process = series.tree.sample(series.root_pids(), now, with_pss)
+            for field in PROCESS_FIELDS:
+                row[f"proc_{field}"] = process[field]
+            series.row = row
@@ -0,0 +1,125 @@
+import math
+
+# 双侧 t 分布临界值，按自由度 1..30 排列，超过 30 时使用正态近似
+T_TABLE = {
+    0.90: [6.314, 2.920, 2.353, 2.132, 2.015, 1.943, 1.895, 1.860, 1.833, 1.812,
+           1.796, 1.782, 1.771, 1.761, 1.753, 1.746, 1.740, 1.734, 1.729, 1.725,
+           1.721, 1.717, 1.714, 1.711, 1.708, 1.706, 1.703, 1.701, 1.699, 1.697],
+    0.95: [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+           2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+           2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042],
+    0.99: [63.657, 9.925, 5.841, 4.604, 4.032, 3.707, 3.499, 3.355, 3.250, 3.169,
+           3.106, 3.055, 3.012, 2.977, 2.947, 2.921, 2.898, 2.878, 2.861, 2.845,
+           2.831, 2.819, 2.807, 2.797, 2.787, 2.779, 2.771, 2.763, 2.756, 2.750]
+}
+Z_VALUES = {0.90: 1.645, 0.95: 1.960, 0.99: 2.576}
+
+
+def t_critical(df, confidence=0.95):
+    """双侧 t 临界值，不支持的置信度按 0.95 处理"""
+    if confidence not in T_TABLE:
+        confidence = 0.95
+    if df < 1:
+        return math.inf
+    table = T_TABLE[confidence]
+    if df <= len(table):
+        return table[df - 1]
+    # 自由度较大时 t 分布接近正态，在 30 与无穷之间按 1/df 插值
+    return Z_VALUES[confidence] + (table[-1] - Z_VALUES[confidence]) * len(table) / df
+
+
+def median(values):
+    ordered = sorted(values)
+    n = len(ordered)
+    if n == 0:
+        return None
+    mid = n // 2
+    return ordered[mid] if n % 2 else (ordered[mid - 1] + ordered[mid]) / 2
+
+
+def summarize(values, confidence=0.95):
+    """样本统计：均值、中位数、标准差、最值以及均值的置信区间
+
+    ci_pct 为置信区间半宽占均值的百分比，用于判断迭代次数是否足够。
+    """
+    n = len(values)
+    if n == 0:
+        return None
+    mean = sum(values) / n
+    stddev = math.sqrt(sum((v - mean) ** 2 for v in values) / (n - 1)) if n > 1 else 0.0
+    half_width = t_critical(n - 1, confidence) * stddev / math.sqrt(n) if n > 1 else math.inf
+    return {
+        'n': n,
+        'mean': mean,
+        'median': median(values),
+        'stddev': stddev,
+        'min': min(values),
+        'max': max(values),
+        'confidence': confidence,
+        'ci_low': mean - half_width if n > 1 else None,
+        'ci_high': mean + half_width if n > 1 else None,
+        'ci_pct': half_width / abs(mean) * 100 if n > 1 and mean else None
+    }
+
+
+ITERATION_METRICS = ('wall_time', 'cpu_time', 'max_rss')
+
+
+def iteration_stats(iterations, confidence=0.95):
+    """每次迭代的耗时、CPU 时间和峰值 RSS 的统计"""
+    return {
+        metric: summarize([it[metric] for it in iterations], confidence)
+        for metric in ITERATION_METRICS
+    }
+
+
+def normal_sf(z):
+    """标准正态分布的上尾概率"""
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def mann_whitney_u(a, b):
+    """Mann-Whitney U 检验（双侧，正态近似，含结校正与连续性校正）
+
+    返回 (U, p)，U 为样本 a 的秩和统计量；任一样本为空时返回 (None, None)。
+    """
+    n1, n2 = len(a), len(b)
+    if n1 == 0 or n2 == 0:
+        return None, None
+    pooled = sorted([(v, 0) for v in a] + [(v, 1) for v in b])
+    rank_sum = 0.0
+    tie_term = 0
+    i = 0
+    while i < len(pooled):
+        j = i
+        while j + 1 < len(pooled) and pooled[j + 1][0] == pooled[i][0]:
+            j += 1
+        # 并列值取平均秩
+        rank = (i + j) / 2 + 1
+        rank_sum += rank * sum(1 for k in range(i, j + 1) if pooled[k][1] == 0)
+        tied = j - i + 1
+        tie_term += tied ** 3 - tied
+        i = j + 1
+    u = rank_sum - n1 * (n1 + 1) / 2
+    n = n1 + n2
+    mean_u = n1 * n2 / 2
+    var_u = n1 * n2 / 12 * ((n + 1) - tie_term / (n * (n - 1)))
+    if var_u <= 0:
+        return u, 1.0
+    z = (abs(u - mean_u) - 0.5) / math.sqrt(var_u)
+    return u, min(2 * normal_sf(max(z, 0.0)), 1.0)
+
+
+def prediction_test(value, values, confidence=0.95):
+    """单个新值是否落在历史样本的预测区间之外
+
+    只有一次测量时 U 检验没有检验力，改用 t 预测区间；返回 (区间下限, 区间上限)，
+    历史样本少于 2 个时返回 None。
+    """
+    n = len(values)
+    if n < 2:
+        return None
+    mean = sum(values) / n
+    stddev = math.sqrt(sum((v - mean) ** 2 for v in values) / (n - 1))
+    half_width = t_critical(n - 1, confidence) * stddev * math.sqrt(1 + 1 / n)
+    return mean - half_width, mean + half_width
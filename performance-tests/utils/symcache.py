@@ -0,0 +1,331 @@
+import bisect
+import gzip
+import hashlib
+import json
+import os
+import re
+import struct
+import subprocess
+
+# 符号表格式变化时修改，旧缓存自动失效
+VERSION = 1
+HASH_CHUNK = 1024 * 1024
+# nm 输出中的函数符号类型
+FUNCTION_TYPES = set('tTwWiI')
+# "0000000000401126 000000000000001b T hot_loop\t/src/a.c:12"，-S 的大小列可能没有
+NM_LINE_RE = re.compile(r'^([0-9a-fA-F]+) (?:([0-9a-fA-F]+) )?(\S) (.+?)(?:\t(\S+:\d+))?$')
+# perf script --show-mmap-events 的映射记录:
+# "PERF_RECORD_MMAP2 123/123: [0x55d4c8a00000(0x1000) @ 0x1000 fd:01 1234 0]: r-xp /usr/bin/prog"
+MMAP_RE = re.compile(
+    r'PERF_RECORD_MMAP2? (-?\d+)/-?\d+: \[0x([0-9a-f]+)\(0x([0-9a-f]+)\) @ (0x[0-9a-f]+|\d+)[^\]]*\]: \S+ (.+)$'
+)
+# perf buildid-list 的输出: "<build-id> <路径>"
+BUILDID_LINE_RE = re.compile(r'^([0-9a-f]{8,})\s+(\S.*)$')
+
+PT_LOAD = 1
+PT_NOTE = 4
+NT_GNU_BUILD_ID = 3
+ET_EXEC = 2
+
+
+def read_elf(path):
+    """读取 ELF 头中的类型、LOAD 段和 build-id，不是 ELF 文件时返回 None
+
+    LOAD 段为 [(文件偏移, 虚拟地址, 文件内大小)]，用于把映射内的文件偏移换算为符号地址。
+    """
+    try:
+        with open(path, 'rb') as f:
+            ident = f.read(16)
+            if len(ident) < 16 or ident[:4] != b'\x7fELF':
+                return None
+            is64 = ident[4] == 2
+            endian = '<' if ident[5] == 1 else '>'
+            if is64:
+                header = struct.unpack(endian + 'HHIQQQIHHHHHH', f.read(48))
+            else:
+                header = struct.unpack(endian + 'HHIIIIIHHHHHH', f.read(36))
+            e_type, phoff, phentsize, phnum = header[0], header[4], header[8], header[9]
+
+            segments = []
+            notes = []
+            for index in range(phnum):
+                f.seek(phoff + index * phentsize)
+                if is64:
+                    p_type, _, p_offset, p_vaddr, _, p_filesz, _, _ = struct.unpack(endian + 'IIQQQQQQ', f.read(56))
+                else:
+                    p_type, p_offset, p_vaddr, _, p_filesz, _, _, _ = struct.unpack(endian + 'IIIIIIII', f.read(32))
+                if p_type == PT_LOAD:
+                    segments.append((p_offset, p_vaddr, p_filesz))
+                elif p_type == PT_NOTE:
+                    notes.append((p_offset, p_filesz))
+
+            build_id = None
+            for offset, size in notes:
+                f.seek(offset)
+                data = f.read(size)
+                pos = 0
+                while pos + 12 <= len(data) and build_id is None:
+                    namesz, descsz, note_type = struct.unpack(endian + 'III', data[pos:pos + 12])
+                    name_end = pos + 12 + ((namesz + 3) & ~3)
+                    desc = data[name_end:name_end + descsz]
+                    if note_type == NT_GNU_BUILD_ID and data[pos + 12:pos + 12 + namesz].rstrip(b'\0') == b'GNU':
+                        build_id = desc.hex()
+                    pos = name_end + ((descsz + 3) & ~3)
+                if build_id:
+                    break
+    except (OSError, struct.error):
+        return None
+    return {'type': e_type, 'segments': segments, 'build_id': build_id}
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def parse_nm(lines):
+    """解析 nm -n -S -l 的输出，返回按地址排序的函数符号 [(地址, 大小, 名称, 源码位置)]"""
+    symbols = []
+    for line in lines:
+        match = NM_LINE_RE.match(line.rstrip('\n'))
+        if not match or match.group(3) not in FUNCTION_TYPES:
+            continue
+        symbols.append((
+            int(match.group(1), 16),
+            int(match.group(2), 16) if match.group(2) else 0,
+            match.group(4),
+            match.group(5)
+        ))
+    symbols.sort(key=lambda item: item[0])
+    return symbols
+
+
+def _nm(path, dynamic=False):
+    args = ['nm', '-n', '-S', '-C', '--defined-only']
+    args += ['-D'] if dynamic else ['-l']
+    completed = subprocess.run(args + [path], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                               text=True, errors='replace')
+    return parse_nm(completed.stdout.splitlines()) if completed.returncode == 0 else []
+
+
+class SymbolTable:
+    """一个二进制文件的函数符号和 LOAD 段，按地址二分查找"""
+
+    def __init__(self, data):
+        self.key = data['key']
+        self.type = data['type']
+        self.segments = data['segments']
+        self.starts = [item[0] for item in data['symbols']]
+        self.symbols = data['symbols']
+
+    def vaddr(self, file_offset):
+        """映射内的文件偏移换算为 ELF 虚拟地址"""
+        for offset, vaddr, size in self.segments:
+            if offset <= file_offset < offset + size:
+                return file_offset - offset + vaddr
+        return None
+
+    def lookup(self, address):
+        """地址所在的函数 (名称, 源码位置)，不在任何函数内时返回 None"""
+        index = bisect.bisect_right(self.starts, address) - 1
+        if index < 0:
+            return None
+        start, size, name, location = self.symbols[index]
+        if size and address >= start + size:
+            return None
+        return name, location
+
+
+class SymbolCache:
+    """跨运行的符号表缓存，以 ELF build-id（没有时用文件 sha256）为键
+
+    每个二进制文件只在第一次遇到时运行 nm，之后同一构建的运行直接读取
+    cache_dir 下的 <键>.json.gz。进程内再按 (路径, 大小, 修改时间) 缓存，不重复读取。
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.tables = {}
+
+    def identity(self, path, elf=None):
+        elf = elf or read_elf(path)
+        if elf is None:
+            return None
+        if elf['build_id']:
+            return f"b-{elf['build_id']}"
+        return f"h-{file_hash(path)}"
+
+    def table(self, path):
+        """path 的符号表，不是可读的 ELF 文件时返回 None"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        local_key = (path, stat.st_size, stat.st_mtime_ns)
+        if local_key in self.tables:
+            return self.tables[local_key]
+
+        table = None
+        elf = read_elf(path)
+        key = self.identity(path, elf) if elf else None
+        if key:
+            cache_file = os.path.join(self.cache_dir, f"{key}.json.gz")
+            data = self._load(cache_file)
+            if data is None:
+                symbols = _nm(path) or _nm(path, dynamic=True)
+                data = {
+                    'version': VERSION,
+                    'key': key,
+                    'path': path,
+                    'type': elf['type'],
+                    'segments': elf['segments'],
+                    'symbols': symbols
+                }
+                self._store(cache_file, data)
+            table = SymbolTable(data)
+        self.tables[local_key] = table
+        return table
+
+    def _load(self, cache_file):
+        try:
+            with gzip.open(cache_file, 'rt') as f:
+                data = json.load(f)
+        except (OSError, ValueError, EOFError):
+            return None
+        return data if data.get('version') == VERSION else None
+
+    def _store(self, cache_file, data):
+        # 多个后台进程可能同时写同一个键，先写临时文件再改名
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp = f"{cache_file}.{os.getpid()}.tmp"
+        with gzip.open(tmp, 'wt') as f:
+            json.dump(data, f)
+        os.replace(tmp, cache_file)
+
+
+def recorded_build_ids(perf_data, timeout=60):
+    """perf.data 中记录的各 dso 的 build-id {路径: build-id}，读取失败时返回空字典"""
+    try:
+        completed = subprocess.run(['perf', 'buildid-list', '-i', perf_data], stdout=subprocess.PIPE,
+                                   stderr=subprocess.DEVNULL, text=True, errors='replace', timeout=timeout)
+    except (OSError, subprocess.TimeoutExpired):
+        return {}
+    if completed.returncode != 0:
+        return {}
+    build_ids = {}
+    for line in completed.stdout.splitlines():
+        match = BUILDID_LINE_RE.match(line.strip())
+        if match:
+            build_ids[match.group(2)] = match.group(1)
+    return build_ids
+
+
+def _kallsyms():
+    """内核符号，kptr_restrict 限制下地址全为 0 时不可用"""
+    symbols = []
+    try:
+        with open('/proc/kallsyms', 'r') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 3 and parts[1] in FUNCTION_TYPES:
+                    symbols.append((int(parts[0], 16), 0, parts[2], None))
+    except OSError:
+        return None
+    if not symbols or not any(item[0] for item in symbols):
+        return None
+    symbols.sort(key=lambda item: item[0])
+    return SymbolTable({'key': 'kernel', 'type': None, 'segments': [], 'symbols': symbols})
+
+
+class Resolver:
+    """根据 perf script 的 mmap 记录把 (pid, ip, dso) 解析为函数名
+
+    用户态地址先按进程的映射换算为文件偏移，再按 LOAD 段换算为符号地址；
+    fork 出的子进程没有自己的映射记录，按 dso 在所有进程的映射中查找。
+    build_ids 为 perf.data 中记录的 {路径: build-id}，磁盘上的文件与记录不一致
+    （录制后重新编译）时不使用该文件的符号，计为 missing，由调用方退回 perf 的符号化。
+    """
+
+    def __init__(self, cache, build_ids=None):
+        self.cache = cache
+        self.build_ids = build_ids or {}
+        # 与记录的 build-id 不一致的 dso
+        self.mismatched = set()
+        self.checked = {}
+        self.maps = {}
+        self.maps_by_dso = {}
+        self.kernel = False
+        # 用户态帧的解析情况，缺少二进制文件（已删除或重新编译）的帧多时调用方应退回 perf 的符号化
+        self.resolved = 0
+        self.missing = 0
+
+    def add_mmap(self, line):
+        match = MMAP_RE.search(line)
+        if not match:
+            return
+        pid = int(match.group(1))
+        start = int(match.group(2), 16)
+        mapping = (start, start + int(match.group(3), 16), int(match.group(4), 0), match.group(5).strip())
+        self.maps.setdefault(pid, []).append(mapping)
+        self.maps_by_dso.setdefault(mapping[3], []).append(mapping)
+
+    def _mapping(self, pid, ip, dso):
+        # 后出现的映射覆盖先前的（exec 之后地址可能重用）
+        for mapping in reversed(self.maps.get(pid, ())):
+            if mapping[0] <= ip < mapping[1] and mapping[3] == dso:
+                return mapping
+        for mapping in reversed(self.maps_by_dso.get(dso, ())):
+            if mapping[0] <= ip < mapping[1]:
+                return mapping
+        return None
+
+    def _matches_record(self, dso):
+        """dso 在磁盘上的 build-id 与 perf.data 中记录的一致，没有记录时视为一致"""
+        matched = self.checked.get(dso)
+        if matched is None:
+            recorded = self.build_ids.get(dso)
+            matched = True
+            if recorded:
+                elf = read_elf(dso)
+                on_disk = elf['build_id'] if elf else None
+                # perf 记录的 build-id 可能补零到 20 字节，按前缀比较
+                matched = bool(on_disk) and (recorded.startswith(on_disk) or on_disk.startswith(recorded))
+            if not matched:
+                self.mismatched.add(dso)
+            self.checked[dso] = matched
+        return matched
+
+    def resolve(self, pid, ip, dso):
+        """返回函数名，无法解析时返回 None"""
+        if dso.startswith('[kernel'):
+            if self.kernel is False:
+                self.kernel = _kallsyms()
+            found = self.kernel.lookup(ip) if self.kernel else None
+            return found[0] if found else None
+        if dso.startswith('['):
+            return None
+        if not self._matches_record(dso):
+            self.missing += 1
+            return None
+        table = self.cache.table(dso)
+        if table is None:
+            self.missing += 1
+            return None
+        mapping = self._mapping(pid, ip, dso)
+        if mapping is not None:
+            address = table.vaddr(ip - mapping[0] + mapping[2])
+        elif table.type == ET_EXEC:
+            # 非 PIE 可执行文件按固定地址加载
+            address = ip
+        else:
+            return None
+        if address is None:
+            return None
+        found = table.lookup(address)
+        if found is None:
+            return None
+        self.resolved += 1
+        return found[0]
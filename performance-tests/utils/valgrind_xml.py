@@ -0,0 +1,266 @@
+import json
+import xml.etree.ElementTree as ET
+
+# 内存泄漏类错误，汇总时按泄漏类型累计字节数
+LEAK_KINDS = {
+    'Leak_DefinitelyLost': 'definitely_lost',
+    'Leak_IndirectlyLost': 'indirectly_lost',
+    'Leak_PossiblyLost': 'possibly_lost',
+    'Leak_StillReachable': 'still_reachable'
+}
+
+MAX_FRAMES = 12        # 每个调用栈保留的帧数，与 valgrind 默认的 --num-callers 一致
+MAX_GROUPS = 20000     # 去重后保留的调用栈数上限，超出的错误只计入总数
+SUMMARY_GROUPS = 200   # JSON 摘要中保留的调用栈数
+GRAPH_GROUPS = 30      # 调用图中画出的调用栈数
+CHUNK_SIZE = 1024 * 1024
+
+
+class _TopLevelTarget:
+    """XMLParser 的 target，只为根元素的直接子元素建树，每个子元素结束时交给 handler
+
+    处理完的子元素不再被引用，内存占用与文件大小无关。
+    """
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.depth = 0
+        self.builder = None
+
+    def start(self, tag, attrib):
+        self.depth += 1
+        if self.depth == 2:
+            self.builder = ET.TreeBuilder()
+        if self.depth >= 2:
+            self.builder.start(tag, attrib)
+
+    def end(self, tag):
+        if self.depth >= 2:
+            element = self.builder.end(tag)
+            if self.depth == 2:
+                self.builder = None
+                self.handler(element)
+        self.depth -= 1
+
+    def data(self, data):
+        if self.depth >= 2:
+            self.builder.data(data)
+
+    def close(self):
+        return self.depth
+
+
+def _text(element, path):
+    found = element.find(path)
+    return found.text.strip() if found is not None and found.text else None
+
+
+def _frames(error):
+    """错误中第一个调用栈的帧，辅助调用栈（auxwhat 之后的）不参与去重"""
+    stack = error.find('stack')
+    if stack is None:
+        return []
+    frames = []
+    for frame in stack.findall('frame')[:MAX_FRAMES]:
+        frames.append({
+            'fn': _text(frame, 'fn'),
+            'file': _text(frame, 'file'),
+            'line': _text(frame, 'line'),
+            'obj': _text(frame, 'obj'),
+            'ip': _text(frame, 'ip')
+        })
+    return frames
+
+
+def frame_label(frame):
+    label = frame['fn'] or frame['ip'] or '???'
+    if frame['file']:
+        label += f" ({frame['file']}"
+        if frame['line']:
+            label += f":{frame['line']}"
+        label += ")"
+    elif frame['obj']:
+        label += f" (in {frame['obj']})"
+    return label
+
+
+def _write_error(f, kind, what, frames):
+    f.write(f"\n==ERROR== {kind}\n")
+    if what:
+        f.write(f"==ERROR== {what}\n")
+    if frames:
+        f.write("==ERROR== Stack trace:\n")
+        for frame in frames:
+            f.write(f"==ERROR==    at {frame_label(frame)}\n")
+    f.write("\n")
+
+
+def process(xml_file, text_file):
+    """一次遍历 valgrind --xml 输出，写出文本报告，返回按调用栈去重的摘要
+
+    边读边解析，每个顶层元素处理完即丢弃，内存占用与错误数量无关
+    （只保留去重后的调用栈）。valgrind 被中途终止时 XML 不完整，
+    已解析的部分照常输出，摘要中 truncated 为 True。
+    """
+    summary = {
+        'pid': None,
+        'tool': None,
+        'command': None,
+        'status': None,
+        'truncated': False,
+        'errors': 0,
+        'unique_errors': 0,
+        'by_kind': {},
+        'leaks': {name: {'bytes': 0, 'blocks': 0} for name in LEAK_KINDS.values()},
+        'groups': [],
+        'total_groups': 0,
+        'ungrouped': 0
+    }
+    groups = {}
+    # 非泄漏错误的 unique -> 调用栈，最后按 errorcounts 修正出现次数
+    unique_groups = {}
+
+    def add_error(error):
+        unique = _text(error, 'unique')
+        kind = _text(error, 'kind') or 'Unknown'
+        what = _text(error, 'what') or _text(error, 'xwhat/text')
+        leaked_bytes = int(_text(error, 'xwhat/leakedbytes') or 0)
+        leaked_blocks = int(_text(error, 'xwhat/leakedblocks') or 0)
+        frames = _frames(error)
+
+        summary['unique_errors'] += 1
+        summary['errors'] += 1
+        by_kind = summary['by_kind'].setdefault(kind, {'count': 0, 'bytes': 0, 'blocks': 0})
+        by_kind['count'] += 1
+        by_kind['bytes'] += leaked_bytes
+        by_kind['blocks'] += leaked_blocks
+        if kind in LEAK_KINDS:
+            leak = summary['leaks'][LEAK_KINDS[kind]]
+            leak['bytes'] += leaked_bytes
+            leak['blocks'] += leaked_blocks
+
+        key = (kind, tuple((fr['fn'], fr['file'], fr['line'], fr['obj']) for fr in frames))
+        group = groups.get(key)
+        if group is None:
+            if len(groups) >= MAX_GROUPS:
+                summary['ungrouped'] += 1
+                return kind, what, frames
+            group = groups[key] = {
+                'kind': kind,
+                'what': what,
+                'count': 0,
+                'bytes': 0,
+                'blocks': 0,
+                'frames': frames
+            }
+        group['count'] += 1
+        group['bytes'] += leaked_bytes
+        group['blocks'] += leaked_blocks
+        if unique and kind not in LEAK_KINDS:
+            unique_groups[unique] = group
+        return kind, what, frames
+
+    def apply_counts(element):
+        # errorcounts 给出非泄漏错误的实际出现次数（同一错误只输出一次）
+        for pair in element.findall('pair'):
+            group = unique_groups.get(_text(pair, 'unique'))
+            count = int(_text(pair, 'count') or 1)
+            if group is not None and count > 1:
+                group['count'] += count - 1
+                summary['errors'] += count - 1
+                summary['by_kind'][group['kind']]['count'] += count - 1
+
+    with open(text_file, 'w') as f:
+        def handle(element):
+            tag = element.tag
+            if tag == 'preamble':
+                for line in element.findall('line'):
+                    if line.text:
+                        f.write(f"{line.text}\n")
+                f.write("\n")
+            elif tag == 'pid':
+                summary['pid'] = element.text.strip() if element.text else None
+            elif tag == 'tool':
+                summary['tool'] = element.text.strip() if element.text else None
+            elif tag == 'args':
+                argv = [_text(element, 'argv/exe')] + [
+                    arg.text for arg in element.findall('argv/arg') if arg.text
+                ]
+                if argv[0]:
+                    summary['command'] = ' '.join(argv)
+                    f.write(f"Command: {summary['command']}\n\n")
+            elif tag == 'status':
+                state, time = _text(element, 'state'), _text(element, 'time')
+                summary['status'] = state
+                if state and time:
+                    f.write(f"Status: {state} in {time}\n\n")
+            elif tag == 'error':
+                _write_error(f, *add_error(element))
+            elif tag == 'errorcounts':
+                apply_counts(element)
+
+        target = _TopLevelTarget(handle)
+        parser = ET.XMLParser(target=target)
+        try:
+            with open(xml_file, 'rb') as xml:
+                for chunk in iter(lambda: xml.read(CHUNK_SIZE), b''):
+                    parser.feed(chunk)
+            parser.close()
+        except ET.ParseError:
+            # 根元素没有结束说明文件被截断；结束标签之后的多余内容忽略
+            summary['truncated'] = target.depth > 0 or summary['pid'] is None
+
+        if not summary['unique_errors']:
+            f.write("No memory leaks or errors detected.\n")
+
+    ranked = sorted(groups.values(), key=lambda g: (g['bytes'], g['count']), reverse=True)
+    summary['total_groups'] = len(ranked)
+    summary['groups'] = ranked[:SUMMARY_GROUPS]
+    return summary
+
+
+def write_summary(summary, json_file):
+    with open(json_file, 'w') as f:
+        json.dump(summary, f)
+
+
+def render_graph(summary, svg_file, limit=GRAPH_GROUPS):
+    """用摘要中排名靠前的调用栈生成错误调用图
+
+    相同的帧合并为一个节点，边上标注经过的错误次数。没有错误时返回 False。
+    """
+    groups = summary['groups'][:limit]
+    if not groups:
+        return False
+    import graphviz
+
+    dot = graphviz.Digraph(comment='Memory Error Analysis')
+    dot.attr(rankdir='TB')
+    frame_ids = {}
+    edges = {}
+    for index, group in enumerate(groups):
+        error_id = f"error_{index}"
+        label = group['kind']
+        if group['what']:
+            label += f"\n{group['what'][:120]}"
+        if group['count'] > 1:
+            label += f"\n(x{group['count']})"
+        dot.node(error_id, label, shape='box', style='filled', fillcolor='red', fontcolor='white')
+
+        previous = error_id
+        for frame in group['frames']:
+            name = frame_label(frame)
+            if name not in frame_ids:
+                frame_ids[name] = f"frame_{len(frame_ids)}"
+                dot.node(frame_ids[name], name.replace(' (', '\n('), shape='box',
+                         style='filled', fillcolor='lightblue')
+            edge = (previous, frame_ids[name])
+            edges[edge] = edges.get(edge, 0) + group['count']
+            previous = frame_ids[name]
+
+    for (tail, head), count in edges.items():
+        dot.edge(tail, head, label=str(count) if count > 1 else None)
+
+    base = svg_file[:-4] if svg_file.endswith('.svg') else svg_file
+    dot.render(base, format='svg', cleanup=True)
+    return True